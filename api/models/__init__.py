@@ -1,8 +1,13 @@
 from .employee import Employee
 from .project import Project
 from .task import Task
+from .task_time_delta import TaskTimeDelta
 from .time_log import TimeLog
+from .time_rollup import HourlyTimeRollup, DailyTimeRollup
 from .employer import Employer
 from .activation_token import ActivationToken
+from .screenshot_blob import ScreenshotBlob
+from .outbox_email import OutboxEmail
+from .screenshot_upload_claim import ScreenshotUploadClaim
 
-__all__ = ['Employee', 'Project', 'Task', 'TimeLog', 'Employer', 'ActivationToken']
+__all__ = ['Employee', 'Project', 'Task', 'TaskTimeDelta', 'TimeLog', 'HourlyTimeRollup', 'DailyTimeRollup', 'Employer', 'ActivationToken', 'ScreenshotBlob', 'OutboxEmail', 'ScreenshotUploadClaim']
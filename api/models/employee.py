@@ -32,6 +32,7 @@ class Employee(db.Model):
 
     # Device tracking
     latest_mac_address = db.Column(db.String(32), nullable=True)  # Store latest MAC address used for login
+    device_generation: int = db.Column(db.Integer, default=0, nullable=False)  # Bumped on every login, carried in the JWT
     
     # Relationships
     projects = db.relationship('Project', secondary=project_employee, back_populates='employees')
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import List, Optional
+from database import db
+
+
+class OutboxEmail(db.Model):
+    """
+    Transactional email waiting to be sent, or its delivery record.
+
+    Request handlers add rows in the same transaction as the change they announce; the email
+    outbox (api/service/email/outbox.py) sends pending rows in the background and records the
+    outcome. status: 'pending' -> 'sending' -> 'sent', or back to 'pending' with a later
+    next_attempt_at after a temporary failure, or 'failed' for good.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('idx_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        {'schema': 'mercor'}
+    )
+    id: int = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    # What the email is for, e.g. 'activation' or 'password_reset'
+    kind: Optional[str] = db.Column(db.String(50), nullable=True)
+    # From address; EMAIL_FROM when not set
+    sender: Optional[str] = db.Column(db.String(255), nullable=True)
+    recipients: List[str] = db.Column(db.JSON, nullable=False)
+    cc: Optional[List[str]] = db.Column(db.JSON, nullable=True)
+    bcc: Optional[List[str]] = db.Column(db.JSON, nullable=True)
+    subject: str = db.Column(db.String(255), nullable=False)
+    body: str = db.Column(db.Text, nullable=False)
+    is_html: bool = db.Column(db.Boolean, nullable=False, default=False)
+    status: str = db.Column(db.String(20), nullable=False, default='pending')
+    attempts: int = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at: datetime = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # When a sender claimed the row ('sending'); rows claimed too long ago are retried
+    claimed_at: Optional[datetime] = db.Column(db.DateTime, nullable=True)
+    last_error: Optional[str] = db.Column(db.Text, nullable=True)
+    created_at: datetime = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at: Optional[datetime] = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from database import db
+
+
+class ScreenshotBlob(db.Model):
+    """
+    Content-addressed screenshot stored once per tenant (employer) and shared by every time log
+    whose screenshot has the same bytes. ref_count is the number of time logs pointing at it; a row
+    released to zero stays until its stored blobs are purged after the releasing commit
+    (see api/service/screenshot_blobs.py).
+    """
+    __tablename__ = 'screenshot_blobs'
+    __table_args__ = (
+        db.UniqueConstraint('employer_id', 'content_hash', name='uq_screenshot_blobs_employer_hash'),
+        {'schema': 'mercor'}
+    )
+    id: int = db.Column(db.Integer, primary_key=True)
+    # Employer of the time log's project, 0 for projects without one (not a foreign key for that reason)
+    employer_id: int = db.Column(db.Integer, nullable=False, default=0)
+    # sha256 hex digest of the screenshot bytes as uploaded by the agent
+    content_hash: str = db.Column(db.String(64), nullable=False)
+    container_name: str = db.Column(db.String(63), nullable=False)
+    file_path: str = db.Column(db.String(255), nullable=False)
+    image_url: str = db.Column(db.String(512), nullable=False)
+    thumbnail_urls: Optional[Dict[str, str]] = db.Column(db.JSON, nullable=True)
+    # Every blob stored for this screenshot (image and thumbnails), deleted with the last reference
+    blob_names: List[str] = db.Column(db.JSON, nullable=False)
+    size: int = db.Column(db.BigInteger, nullable=False)
+    perceptual_hash: Optional[int] = db.Column(db.BigInteger, nullable=True)
+    ref_count: int = db.Column(db.Integer, nullable=False, default=1)
+    created_at: datetime = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def time_log_values(self) -> Dict[str, object]:
+        """Screenshot columns of a time log referencing this blob"""
+        return {
+            'screenshot_blob_id': self.id,
+            'file_path': self.file_path,
+            'image_url': self.image_url,
+            'thumbnail_urls': self.thumbnail_urls,
+            'perceptual_hash': self.perceptual_hash
+        }
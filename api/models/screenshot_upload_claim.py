@@ -0,0 +1,14 @@
+from datetime import datetime
+from database import db
+
+
+class ScreenshotUploadClaim(db.Model):
+    """
+    A direct screenshot upload attached to a time log. The blob name is the primary key, so an
+    upload_token can be claimed only once (see api/service/direct_uploads.py).
+    """
+    __tablename__ = 'screenshot_upload_claims'
+    __table_args__ = {'schema': 'mercor'}
+    blob_name: str = db.Column(db.String(64), primary_key=True)
+    employee_id: int = db.Column(db.Integer, db.ForeignKey('mercor.employees.id'), nullable=False)
+    claimed_at: datetime = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
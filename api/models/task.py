@@ -1,7 +1,11 @@
 from datetime import datetime
-from typing import List
+from typing import List, Dict, Optional
+from flask import current_app
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import column_property
 from database import db
 from .base import task_employee
+from .task_time_delta import TaskTimeDelta
 
 class Task(db.Model):
     __tablename__ = 'tasks'
@@ -20,8 +24,80 @@ class Task(db.Model):
     created_at: datetime = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at: datetime = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     minutes_spent = db.Column(db.Integer, default=0)  # Total minutes spent on the task
+    # Exact total: folded counter plus deltas not yet folded (see TASK_COUNTER_MODE)
+    total_minutes_spent = column_property(
+        func.coalesce(minutes_spent, 0) + select(func.coalesce(func.sum(TaskTimeDelta.seconds), 0))
+        .where(TaskTimeDelta.task_id == id)
+        .correlate_except(TaskTimeDelta)
+        .scalar_subquery()
+    )
     
     # Relationships
     project = db.relationship('Project', back_populates='tasks')
     employees = db.relationship('Employee', secondary=task_employee, back_populates='tasks')
     time_logs  = db.relationship('TimeLog', back_populates='task')
+
+    @staticmethod
+    def apply_minutes_deltas(deltas: Dict[int, float]) -> None:
+        """
+        Add logged durations to one or more tasks without a read-modify-write.
+
+        With TASK_COUNTER_MODE 'atomic' (default) the counters are incremented in SQL with a
+        single grouped UPDATE. With 'delta' the durations are appended to task_time_deltas so
+        concurrent writers never lock the task row; fold_minutes_deltas() merges them later.
+
+        Args:
+            deltas: Mapping of task id to the duration (seconds) to add to minutes_spent
+        """
+        deltas = {task_id: int(round(delta)) for task_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        if current_app.config.get('TASK_COUNTER_MODE', 'atomic') == 'delta':
+            db.session.execute(
+                insert(TaskTimeDelta),
+                [{'task_id': task_id, 'seconds': seconds} for task_id, seconds in deltas.items()]
+            )
+            return
+        Task._increment_minutes(deltas)
+
+    @staticmethod
+    def fold_minutes_deltas(limit: Optional[int] = None) -> int:
+        """
+        Move pending task_time_deltas rows into tasks.minutes_spent and commit.
+
+        Rows are removed with DELETE ... RETURNING, so each delta is counted exactly once even
+        when several workers fold concurrently.
+
+        Args:
+            limit: Maximum number of delta rows to fold in this call (all pending rows if None)
+
+        Returns:
+            The number of delta rows folded
+        """
+        stmt = delete(TaskTimeDelta)
+        if limit:
+            oldest = select(TaskTimeDelta.id).order_by(TaskTimeDelta.id).limit(limit).scalar_subquery()
+            stmt = stmt.where(TaskTimeDelta.id.in_(oldest))
+        try:
+            rows = db.session.execute(stmt.returning(TaskTimeDelta.task_id, TaskTimeDelta.seconds)).all()
+            totals: Dict[int, int] = {}
+            for task_id, seconds in rows:
+                totals[task_id] = totals.get(task_id, 0) + seconds
+            Task._increment_minutes(totals)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(rows)
+
+    @staticmethod
+    def _increment_minutes(deltas: Dict[int, int]) -> None:
+        """Increment minutes_spent for several tasks in a single UPDATE statement"""
+        if not deltas:
+            return
+        db.session.execute(
+            update(Task)
+            .where(Task.id.in_(list(deltas)))
+            .values(minutes_spent=func.coalesce(Task.minutes_spent, 0) + case(deltas, value=Task.id, else_=0))
+            .execution_options(synchronize_session=False)
+        )
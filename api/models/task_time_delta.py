@@ -0,0 +1,18 @@
+from datetime import datetime
+from database import db
+
+class TaskTimeDelta(db.Model):
+    """
+    Append-only log of durations added to tasks.
+    Writers insert here instead of updating the hot tasks row; pending rows are
+    periodically folded into Task.minutes_spent by Task.fold_minutes_deltas().
+    """
+    __tablename__ = 'task_time_deltas'
+    __table_args__ = (
+        db.Index('idx_task_time_deltas_task_id', 'task_id'),
+        {'schema': 'mercor'}
+    )
+    id: int = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    task_id: int = db.Column(db.Integer, db.ForeignKey('mercor.tasks.id', ondelete='CASCADE'), nullable=False)
+    seconds: int = db.Column(db.Integer, nullable=False)
+    created_at: datetime = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, Optional
 from database import db
 
 class TimeLog(db.Model):
@@ -8,14 +8,20 @@ class TimeLog(db.Model):
     Stores time log data and (optionally) screenshot metadata and file info for each time log entry.
     """
     __tablename__ = 'time_logs'
+    # On PostgreSQL the table is range-partitioned by start_time month (see api/service/time_log_partitions.py),
+    # so its primary key is (id, start_time) and every unique index must include start_time. The mapper uses
+    # that key too; the DDL keeps id alone (SQLite only autoincrements a single-column key) until the table is
+    # converted to a partitioned one. Look time logs up by id with TimeLog.find.
     __table_args__ = (
-        db.Index('idx_time_logs_employee_id', 'employee_id'),
-        db.Index('idx_time_logs_project_id', 'project_id'),
         db.Index('idx_time_logs_task_id', 'task_id'),
-        db.Index('idx_time_logs_start_time', 'start_time'),
-        db.Index('idx_time_logs_end_time', 'end_time'),
-        db.Index('idx_time_logs_screenshot_permission', 'is_screenshot_permission_enabled'),
-        db.Index('idx_time_logs_captured_at', 'captured_at'),
+        # Recent activity per project, ordered by start_time
+        db.Index('idx_time_logs_project_start', 'project_id', 'start_time'),
+        # Keyset pagination of a project's/task's logs on (start_time DESC, id DESC)
+        db.Index('idx_time_logs_project_task_start', 'project_id', 'task_id', 'start_time', 'id'),
+        # An employee's logs of a day (screenshot similarity index)
+        db.Index('idx_time_logs_employee_start', 'employee_id', 'start_time'),
+        # Client-generated keys (device + sequence) make agent retries idempotent; a retry resends the same start_time
+        db.Index('idx_time_logs_employee_idempotency_key', 'employee_id', 'idempotency_key', 'start_time', unique=True),
         {'schema': 'mercor'}
     )
     id: int = db.Column(db.Integer, primary_key=True)
@@ -26,12 +32,22 @@ class TimeLog(db.Model):
     # Screenshot fields (optional)
     file_path: str = db.Column(db.String(255), nullable=True)
     image_url: str = db.Column(db.String(512), nullable=True)
+    # Thumbnail width (as a string) -> URL, set when the screenshot was processed
+    thumbnail_urls: Optional[Dict[str, str]] = db.Column(db.JSON, nullable=True)
     captured_at: datetime = db.Column(db.DateTime, nullable=True)
+    # Shared content-addressed blob of the screenshot (None for screenshots stored under their own name)
+    screenshot_blob_id: Optional[int] = db.Column(db.Integer, db.ForeignKey('mercor.screenshot_blobs.id'), nullable=True)
+    # 64-bit dHash of the screenshot (signed), set when the screenshot was processed
+    perceptual_hash: Optional[int] = db.Column(db.BigInteger, nullable=True)
+    # Background upload state: None (no screenshot), 'pending', 'uploaded' or 'failed'
+    screenshot_status: Optional[str] = db.Column(db.String(20), nullable=True)
+    screenshot_attempts: int = db.Column(db.Integer, default=0, nullable=False)
 
     # Tracking permissions and network info
     is_screenshot_permission_enabled: bool = db.Column(db.Boolean, default=True, nullable=False)
     ip_address: str = db.Column(db.String(45), nullable=True)
     mac_address: str = db.Column(db.String(17), nullable=True)
+    idempotency_key: Optional[str] = db.Column(db.String(128), nullable=True)
 
     # Foreign Keys
     employee_id: int = db.Column(db.Integer, db.ForeignKey('mercor.employees.id'), nullable=False)
@@ -42,3 +58,22 @@ class TimeLog(db.Model):
     employee = db.relationship('Employee', back_populates='time_logs')
     project = db.relationship('Project', back_populates='time_logs')
     task = db.relationship('Task', back_populates='time_logs')
+
+    __mapper_args__ = {'primary_key': [id, start_time]}
+
+    @staticmethod
+    def find(time_log_id: int) -> Optional['TimeLog']:
+        """Return the time log with this id (its primary key also includes start_time)"""
+        return TimeLog.query.filter(TimeLog.id == time_log_id).first()
+
+    @staticmethod
+    def find_by_idempotency_keys(employee_id: int, keys: Iterable[str]) -> Dict[str, 'TimeLog']:
+        """Return the time logs already stored for the given employee's idempotency keys, keyed by idempotency key"""
+        keys = {key for key in keys if key}
+        if not keys:
+            return {}
+        time_logs = TimeLog.query.filter(
+            TimeLog.employee_id == employee_id,
+            TimeLog.idempotency_key.in_(keys)
+        ).all()
+        return {time_log.idempotency_key: time_log for time_log in time_logs}
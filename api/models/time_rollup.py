@@ -0,0 +1,37 @@
+from datetime import date, datetime
+from database import db
+
+
+class HourlyTimeRollup(db.Model):
+    """
+    Logged seconds per (project, task, employee, hour), maintained incrementally at ingest.
+    Time logs are bucketed by their start_time, like the dashboards always did.
+    """
+    __tablename__ = 'time_rollups_hourly'
+    __table_args__ = (
+        db.Index('idx_time_rollups_hourly_employer_bucket', 'employer_id', 'bucket_start'),
+        {'schema': 'mercor'}
+    )
+    project_id: int = db.Column(db.Integer, db.ForeignKey('mercor.projects.id', ondelete='CASCADE'), primary_key=True)
+    task_id: int = db.Column(db.Integer, db.ForeignKey('mercor.tasks.id', ondelete='CASCADE'), primary_key=True)
+    employee_id: int = db.Column(db.Integer, db.ForeignKey('mercor.employees.id', ondelete='CASCADE'), primary_key=True)
+    bucket_start: datetime = db.Column(db.DateTime, primary_key=True)
+    employer_id: int = db.Column(db.Integer, nullable=True)
+    seconds: int = db.Column(db.BigInteger, nullable=False, default=0)
+    log_count: int = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyTimeRollup(db.Model):
+    """Logged seconds per (project, task, employee, day), maintained incrementally at ingest."""
+    __tablename__ = 'time_rollups_daily'
+    __table_args__ = (
+        db.Index('idx_time_rollups_daily_employer_day', 'employer_id', 'day'),
+        {'schema': 'mercor'}
+    )
+    project_id: int = db.Column(db.Integer, db.ForeignKey('mercor.projects.id', ondelete='CASCADE'), primary_key=True)
+    task_id: int = db.Column(db.Integer, db.ForeignKey('mercor.tasks.id', ondelete='CASCADE'), primary_key=True)
+    employee_id: int = db.Column(db.Integer, db.ForeignKey('mercor.employees.id', ondelete='CASCADE'), primary_key=True)
+    day: date = db.Column(db.Date, primary_key=True)
+    employer_id: int = db.Column(db.Integer, nullable=True)
+    seconds: int = db.Column(db.BigInteger, nullable=False, default=0)
+    log_count: int = db.Column(db.Integer, nullable=False, default=0)
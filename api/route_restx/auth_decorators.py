@@ -1,9 +1,11 @@
 from functools import wraps
 from typing import Callable, List, Union, Dict, Any, TypeVar, cast
-from flask import jsonify
-from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
 from flask_restx import abort
+from werkzeug.exceptions import Unauthorized
 from api.models.employee import Employee
+from .request_memo import load_entity, verify_jwt_once
 
 F = TypeVar('F', bound=Callable[..., Any])
 
@@ -11,19 +13,30 @@ def check_mac_address(fn: F) -> F:
     """
     Decorator to ensure JWT mac_address matches employee's latest_mac_address in DB.
     If mismatch, returns code 'Re-login' for FE to redirect to login.
+    The binding is read through the device binding cache, so the common case needs no query.
     """
     @wraps(fn)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
         identity = get_jwt()
         if identity and identity.get('role') == 'employee':
-            employee = Employee.query.get(identity['id'])
-            if not employee or not employee.latest_mac_address:
-                abort(401, 'Re-login', code='Re-login')
-            if identity.get('mac_address') != employee.latest_mac_address:
-                abort(401, 'Re-login', code='Re-login')
+            bindings = current_app.extensions.get('device_bindings')
+            if bindings is not None:
+                binding = bindings.get(identity['id'], identity.get('device_generation', 0))
+                latest_mac_address = binding[1] if binding else None
+            else:
+                employee = load_entity(Employee, identity['id'])
+                latest_mac_address = employee.latest_mac_address if employee else None
+            if not latest_mac_address or identity.get('mac_address') != latest_mac_address:
+                _abort_relogin()
         return fn(*args, **kwargs)
     return cast(F, wrapper)
 
+def _abort_relogin() -> None:
+    """Respond 401 with {'code': 'Re-login'} (flask_restx.abort reserves the 'code' keyword for the status)"""
+    error = Unauthorized('Re-login')
+    error.data = {'code': 'Re-login', 'message': 'Re-login'}
+    raise error
+
 def role_required(allowed_roles: Union[str, List[str]]) -> Callable[[F], F]:
     """
     A decorator that checks if the user has any of the required roles.
@@ -43,8 +56,8 @@ def role_required(allowed_roles: Union[str, List[str]]) -> Callable[[F], F]:
     def decorator(fn: F) -> F:
         @wraps(fn)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
-            # First verify the JWT is valid
-            verify_jwt_in_request()
+            # First verify the JWT is valid (once per request, jwt_required may have done it already)
+            verify_jwt_once()
             
             
             # Get the identity from JWT
@@ -1,3 +1,4 @@
+from flask import current_app
 from flask_restx import Namespace, Resource, fields, abort
 from typing import Dict, Any, Optional, Tuple, Union
 from api.models.employee import Employee
@@ -127,15 +128,20 @@ class EmployeeLogin(Resource):
         # Check if employee is active
         if not employee.active:
             abort(403, 'Your account is deactivated. Please contact admin.')
-        # Update latest_mac_address
+        # Update latest_mac_address; the new device generation invalidates tokens issued for other devices
         employee.latest_mac_address = mac_address
+        employee.device_generation = (employee.device_generation or 0) + 1
         db.session.commit()
-        # Generate tokens with identity containing role and mac_address
+        bindings = current_app.extensions.get('device_bindings')
+        if bindings is not None:
+            bindings.remember(employee.id, employee.device_generation, mac_address)
+        # Generate tokens with identity containing role, mac_address and device_generation
         identity: Dict[str, Any] = {
             'id': employee.id,
             'role': 'employee',
             'username': employee.username,
-            'mac_address': mac_address
+            'mac_address': mac_address,
+            'device_generation': employee.device_generation
         }
         access_token: str = create_access_token(
             identity=str(employee.id),
@@ -3,9 +3,13 @@ from api.models.employee import Employee
 from database import db
 from flask_jwt_extended import jwt_required, get_jwt
 from api.route_restx.auth_decorators import role_required, employee_required, employer_required, check_mac_address
+from api.route_restx.request_memo import load_entity_or_404
+from api.route_restx.conditional_get import claims_scope, conditional_get, path_scope
 from api.models.project import Project
 from api.models.task import Task
 from api.models.employee import task_employee
+from api.service.assignments import AssignmentError, assign, unassign
+from constants import ASSIGNMENT_MAX_IDS
 
 api = Namespace('employees', description='Employee operations')
 
@@ -35,6 +39,12 @@ taskAssignment_model = api.model('TaskAssignment', {
     'employee_id': fields.Integer(required=True, description='Employee ID to assign to')
 })
 
+bulkAssignment_model = api.model('BulkAssignment', {
+    'employee_ids': fields.List(fields.Integer, required=True, description='Employees to assign or unassign'),
+    'project_ids': fields.List(fields.Integer, description='Projects, with all of their tasks'),
+    'task_ids': fields.List(fields.Integer, description='Individual tasks')
+})
+
 # Task summary model for nested responses
 task_summary_model = api.model('TaskSummary', {
     'id': fields.Integer(readOnly=True),
@@ -98,15 +108,22 @@ class EmployeeList(Resource):
         
         return employee, 201
 
+def authorize_own_employee(claims, kwargs):
+    """Employees may only read their own records; checked before conditional_get may answer 304"""
+    if claims.get('role', claims.get('type')) == 'employee' and claims['id'] != kwargs['employee_id']:
+        abort(403, 'You can only access your own employee records')
+
+
 @api.route('/<int:employee_id>')
 @api.param('employee_id', 'The employee identifier')
 @api.response(404, 'Employee not found')
 class EmployeeResource(Resource):
-    @api.marshal_with(detailed_employee_model)
     @jwt_required()  # Any authenticated user can access, but we'll check permissions inside
+    @conditional_get(path_scope('employee', 'employee_id'), authorize=authorize_own_employee)
+    @api.marshal_with(detailed_employee_model)
     def get(self, employee_id):
         """Get a specific employee by ID"""
-        employee : Employee = Employee.query.get_or_404(employee_id)
+        employee : Employee = load_entity_or_404(Employee, employee_id)
         
         # Get the identity of the current user
         identity = get_jwt()
@@ -131,9 +148,9 @@ class EmployeeResource(Resource):
                 'title': t.name,
                 'status': t.status,
                 'hourly_rate': t.project.hourly_rate,
-                'total_hours': t.minutes_spent / 60,
+                'total_hours': t.total_minutes_spent / 60,
                 'project_id': t.project.id,
-                'total_cost': (t.minutes_spent / 60) * t.project.hourly_rate
+                'total_cost': (t.total_minutes_spent / 60) * t.project.hourly_rate
             } for t in employee.tasks]
         }
 
@@ -165,7 +182,7 @@ class EmployeeResource(Resource):
     
     def _update_employee(self, employee_id: int) -> Employee:
         """Helper method for put and patch operations"""
-        employee = Employee.query.get_or_404(employee_id)
+        employee = load_entity_or_404(Employee, employee_id)
         data = api.payload
         
         if data.get('name'):
@@ -191,7 +208,7 @@ class EmployeeResource(Resource):
     @role_required('admin')  # Only admins can delete employees
     def delete(self, employee_id: int) -> tuple[str, int]:
         """Delete an employee (Admin only)"""
-        employee = Employee.query.get_or_404(employee_id)
+        employee = load_entity_or_404(Employee, employee_id)
         db.session.delete(employee)
         db.session.commit()
         return '', 204
@@ -201,11 +218,12 @@ class EmployeeResource(Resource):
 @api.param('employee_id', 'The employee identifier')
 @api.response(404, 'Employee not found')
 class EmployeeProjects(Resource):
-    @api.marshal_list_with(project_summary_model)
     @jwt_required()  # Any authenticated user can access, but we'll check permissions inside
+    @conditional_get(path_scope('employee', 'employee_id'), authorize=authorize_own_employee)
+    @api.marshal_list_with(project_summary_model)
     def get(self, employee_id):
         """Get all projects for an employee"""
-        employee = Employee.query.get_or_404(employee_id)
+        employee = load_entity_or_404(Employee, employee_id)
         
         # Get the identity of the current user
         identity = get_jwt()
@@ -230,11 +248,8 @@ class EmployeeProjects(Resource):
     @role_required(['admin', 'employer'])
     def post(self, employee_id):
         """Assign a project to an employee (Admin or the employee themselves)"""
-        # Check permissions        
-        project_id = api.payload['project_id'] 
-        
         # Find the employee
-        employee = Employee.query.get_or_404(employee_id)
+        employee = load_entity_or_404(Employee, employee_id)
         
         # Get the project ID from the request
         if not api.payload or 'project_id' not in api.payload:
@@ -242,37 +257,24 @@ class EmployeeProjects(Resource):
         
         project_id = api.payload['project_id']
         
-        # Import needed models
-        from api.models.project import Project
-        from api.models.task import Task
-        
         # Find the project
-        project = Project.query.get_or_404(project_id)
-        
-        # Check if the employee is already assigned to this project
-        if project in employee.projects:
-            return {'message': f'Employee already assigned to project {project.name}'}, 200
+        project = load_entity_or_404(Project, project_id)
         
         try:
-            # Assign the project to the employee
-            employee.projects.append(project)
-            
-            # Assign all tasks from this project to the employee as well
-            tasks = Task.query.filter_by(project_id=project_id).all()
-            for task in tasks:
-                if task not in employee.tasks:
-                    employee.tasks.append(task)
-            
+            # Assign the project and all of its tasks to the employee
+            assigned = assign([employee_id], project_ids=[project.id])
             db.session.commit()
-            
-            return {
-                'message': f'Project {project.name} successfully assigned to {employee.name}',
-                'tasks_assigned': len(tasks)
-            }, 201
         except Exception as e:
             db.session.rollback()
             abort(500, f'Failed to assign project: {str(e)}')
 
+        if not assigned['project_assignments']:
+            return {'message': f'Employee already assigned to project {project.name}'}, 200
+        return {
+            'message': f'Project {project.name} successfully assigned to {employee.name}',
+            'tasks_assigned': assigned['tasks']
+        }, 201
+
     @api.doc(description='Unassign a project from an employee')
     @api.response(204, 'Project successfully unassigned')
     @api.response(403, 'Forbidden')
@@ -287,35 +289,37 @@ class EmployeeProjects(Resource):
             project_id = api.args['project_id']
         if not project_id:
             abort(400, 'Project ID is required to unassign')
-        from api.models.project import Project
-        employee = Employee.query.get_or_404(employee_id)
-        project = Project.query.get_or_404(project_id)
+        load_entity_or_404(Employee, employee_id)
+        project = load_entity_or_404(Project, project_id)
         # Only allow if the current user is the employer who owns this project or admin
         identity = get_jwt()
         if identity.get('role', identity.get('type')) == 'employer' and project.employer_id != identity['id']:
             abort(403, 'You do not have permission to unassign this project')
-        if project not in employee.projects:
-            abort(404, 'Employee is not assigned to this project')
         try:
-            employee.projects.remove(project)
-            # Optionally, also remove all tasks from this project from the employee
-            employee.tasks = [t for t in employee.tasks if t.project_id != project_id]
-            db.session.commit()
-            return '', 204
+            # Also removes the employee from all tasks of this project
+            removed = unassign([employee_id], project_ids=[project.id])
+            if removed['project_assignments']:
+                db.session.commit()
+            else:
+                db.session.rollback()
         except Exception as e:
             db.session.rollback()
             abort(500, f'Failed to unassign project: {str(e)}')
+        if not removed['project_assignments']:
+            abort(404, 'Employee is not assigned to this project')
+        return '', 204
 
 
 @api.route('/<int:employee_id>/tasks')
 @api.param('employee_id', 'The employee identifier')
 @api.response(404, 'Employee not found')
 class EmployeeTasks(Resource):
-    @api.marshal_list_with(task_summary_model)
     @jwt_required()
+    @conditional_get(path_scope('employee', 'employee_id'), authorize=authorize_own_employee)
+    @api.marshal_list_with(task_summary_model)
     def get(self, employee_id):
         """Get all tasks for an employee"""
-        employee = Employee.query.get_or_404(employee_id)
+        employee = load_entity_or_404(Employee, employee_id)
         
         # Get the identity of the current user
         identity = get_jwt()
@@ -329,9 +333,9 @@ class EmployeeTasks(Resource):
             'title': t.name,
             'status': t.status,
             'hourly_rate': t.project.hourly_rate if t.project else None,
-            'total_hours': t.minutes_spent / 60 if t.minutes_spent else 0,
+            'total_hours': t.total_minutes_spent / 60 if t.total_minutes_spent else 0,
             'project_id': t.project_id,
-            'total_cost': (t.minutes_spent / 60) * t.project.hourly_rate if t.minutes_spent and t.project else 0
+            'total_cost': (t.total_minutes_spent / 60) * t.project.hourly_rate if t.total_minutes_spent and t.project else 0
         } for t in employee.tasks]
 
     # New endpoint to assign a task to an employee
@@ -346,7 +350,7 @@ class EmployeeTasks(Resource):
     def post(self, employee_id):
         """Assign a task to an employee (Admin or the employee themselves)"""                
         # Find the employee
-        employee = Employee.query.get_or_404(employee_id)
+        employee = load_entity_or_404(Employee, employee_id)
         
         # Get the task ID from the request
         if not api.payload or 'task_id' not in api.payload:
@@ -354,33 +358,24 @@ class EmployeeTasks(Resource):
         
         task_id = api.payload['task_id']
         
-        # Import needed models
-        from api.models.task import Task
-        
         # Find the task
-        task = Task.query.get_or_404(task_id)
-        
-        # Check if the employee is already assigned to this task
-        if task in employee.tasks:
-            return {'message': f'Employee already assigned to task {task.name}'}, 200
-        
-        # Check if the employee is assigned to the project of this task
-        if task.project not in employee.projects:
-            employee.projects.append(task.project)
+        task = load_entity_or_404(Task, task_id)
         
         try:
-            # Assign the task to the employee
-            employee.tasks.append(task)
+            # Assign the task, and its project if needed, to the employee
+            assigned = assign([employee_id], task_ids=[task.id])
             db.session.commit()
-            
-            return {
-                'message': f'Task {task.name} successfully assigned to {employee.name}',
-                'project': task.project.name
-            }, 201
         except Exception as e:
             db.session.rollback()
             abort(500, f'Failed to assign task: {str(e)}')
 
+        if not assigned['task_assignments']:
+            return {'message': f'Employee already assigned to task {task.name}'}, 200
+        return {
+            'message': f'Task {task.name} successfully assigned to {employee.name}',
+            'project': task.project.name
+        }, 201
+
     @api.doc(description='Unassign a task from an employee')
     @api.response(204, 'Task successfully unassigned')
     @api.response(403, 'Forbidden')
@@ -395,22 +390,77 @@ class EmployeeTasks(Resource):
             task_id = api.args['task_id']
         if not task_id:
             abort(400, 'Task ID is required to unassign')
-        from api.models.task import Task
-        employee = Employee.query.get_or_404(employee_id)
-        task = Task.query.get_or_404(task_id)
+        load_entity_or_404(Employee, employee_id)
+        task = load_entity_or_404(Task, task_id)
         # Only allow if the current user is the employer who owns this task's project or admin
         identity = get_jwt()
         if identity.get('role', identity.get('type')) == 'employer' and task.project.employer_id != identity['id']:
             abort(403, 'You do not have permission to unassign this task')
-        if task not in employee.tasks:
-            abort(404, 'Employee is not assigned to this task')
         try:
-            employee.tasks.remove(task)
-            db.session.commit()
-            return '', 204
+            removed = unassign([employee_id], task_ids=[task.id])
+            if removed['task_assignments']:
+                db.session.commit()
+            else:
+                db.session.rollback()
         except Exception as e:
             db.session.rollback()
             abort(500, f'Failed to unassign task: {str(e)}')
+        if not removed['task_assignments']:
+            abort(404, 'Employee is not assigned to this task')
+        return '', 204
+
+
+@api.route('/assignments')
+class EmployeeAssignments(Resource):
+    @api.doc(description='Assign many employees to many projects (with all their tasks) and tasks (with their projects)')
+    @api.expect(bulkAssignment_model)
+    @api.response(200, 'Assignments written')
+    @api.response(400, 'Validation Error')
+    @role_required(['admin', 'employer'])
+    def post(self):
+        """Assign employees to projects and tasks in bulk; existing assignments are kept"""
+        employee_ids, project_ids, task_ids, employer_id = _bulk_assignment_args()
+        try:
+            assigned = assign(employee_ids, project_ids, task_ids, employer_id=employer_id)
+        except AssignmentError as e:
+            db.session.rollback()
+            abort(400, str(e))
+        db.session.commit()
+        return assigned, 200
+
+    @api.doc(description='Unassign many employees from many projects (with all their tasks) and tasks')
+    @api.expect(bulkAssignment_model)
+    @api.response(200, 'Assignments removed')
+    @api.response(400, 'Validation Error')
+    @role_required(['admin', 'employer'])
+    def delete(self):
+        """Unassign employees from projects and tasks in bulk"""
+        employee_ids, project_ids, task_ids, employer_id = _bulk_assignment_args()
+        try:
+            removed = unassign(employee_ids, project_ids, task_ids, employer_id=employer_id)
+        except AssignmentError as e:
+            db.session.rollback()
+            abort(400, str(e))
+        db.session.commit()
+        return removed, 200
+
+
+def _bulk_assignment_args():
+    """(employee ids, project ids, task ids, employer id) of a bulk assignment; employers may only use their own projects"""
+    payload = api.payload if isinstance(api.payload, dict) else {}
+    ids = {}
+    for key in ('employee_ids', 'project_ids', 'task_ids'):
+        values = payload.get(key) or []
+        if not isinstance(values, list) or not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+            abort(400, f'{key} must be a list of integers')
+        if len(values) > ASSIGNMENT_MAX_IDS:
+            abort(400, f'At most {ASSIGNMENT_MAX_IDS} {key} per request')
+        ids[key] = values
+    if not ids['employee_ids'] or not (ids['project_ids'] or ids['task_ids']):
+        abort(400, 'employee_ids and at least one project or task id are required')
+    identity = get_jwt()
+    employer_id = identity['id'] if identity.get('role', identity.get('type')) == 'employer' else None
+    return ids['employee_ids'], ids['project_ids'], ids['task_ids'], employer_id
 
 
 @api.route('/projects')
@@ -455,6 +505,7 @@ class EmployeeTasks(Resource):
     # Get projects and tasks for an employee when employee calls this endpoint
     @api.doc(description='Get projects and tasks for an employee')
     @role_required(['employee'])
+    @conditional_get(claims_scope('employee'))
     @api.response(200, 'Success')
     @api.response(403, 'Not authorized')
     def get(self):
@@ -473,9 +524,9 @@ class EmployeeTasks(Resource):
                 'project_name': task.project.name,
                 'project_hourly_rate': float(task.project.hourly_rate) if task.project.hourly_rate else None,
                 'project_employee_count': len(task.project.employees),
-                'task_spent_time_in_minutes': task.minutes_spent,
-                'task_spent_time_in_minutes_real': task.minutes_spent / 60,
-                'task_spent_time_in_hours': task.minutes_spent / 60,
+                'task_spent_time_in_minutes': task.total_minutes_spent,
+                'task_spent_time_in_minutes_real': task.total_minutes_spent / 60,
+                'task_spent_time_in_hours': task.total_minutes_spent / 60,
             })
         return full_tasks
 
@@ -1,11 +1,22 @@
+from flask import current_app, request
 from flask_restx import Namespace, Resource, fields, abort
+from api.models.employee import Employee
 from api.models.employer import Employer
 from api.models.project import Project
 from api.models.task import Task
 from api.models.time_log import TimeLog
-from database import db
+from api.models.time_rollup import DailyTimeRollup
+from api.models.base import project_employee, task_employee
+from database import db, pool_stats
+from sqlalchemy import func
 from flask_jwt_extended import get_jwt, jwt_required, get_jwt_identity
 from .auth_decorators import employer_required, admin_required
+from .pagination import MAX_PAGE_SIZE, page_size_arg
+from .request_memo import load_entity
+from .conditional_get import claims_scope, conditional_get, path_scope
+from api.service.assignments import AssignmentError, unassign
+from api.service.dashboard_cache import dashboard_cached
+from api.service.read_replica import replica_reads
 from datetime import datetime, timedelta
 
 api = Namespace('employers', description='Employer operations')
@@ -81,16 +92,24 @@ def get_authorized_employer():
     if not claims or 'role' not in claims or claims['role'] != 'employer':
         abort(403, 'This operation is only available to employers')
         
-    employer = Employer.query.get(claims['id'])
+    employer = load_entity(Employer, claims['id'])
     if not employer:
         abort(404, 'Employer account not found')
         
     return employer
 
+def authorize_employer_project(claims, kwargs):
+    """Ownership check of a project endpoint, run before conditional_get may answer 304"""
+    employer = get_authorized_employer()
+    project = load_entity(Project, kwargs['project_id'])
+    if project is None or project.employer_id != employer.id:
+        abort(404, 'Project not found or access denied')
+
 @api.route('/profile')
 class EmployerProfile(Resource):
     @jwt_required()
     @employer_required
+    @conditional_get(claims_scope('employer'))
     @api.marshal_with(employer_model)
     @api.response(200, 'Success')
     @api.response(403, 'Not authorized')
@@ -134,9 +153,12 @@ class EmployerProfile(Resource):
 class EmployerProjects(Resource):
     @jwt_required()
     @employer_required
+    @conditional_get(claims_scope('employer'))
+    @dashboard_cached('projects')
     @api.marshal_list_with(project_model)
     @api.response(200, 'Success')
     @api.response(403, 'Not authorized')
+    @replica_reads
     def get(self):
         """Get all projects for the employer"""
         employer = get_authorized_employer()
@@ -198,10 +220,12 @@ class EmployerProjects(Resource):
 class EmployerProjectDetail(Resource):
     @jwt_required()
     @employer_required
+    @conditional_get(path_scope('project', 'project_id'), authorize=authorize_employer_project)
     @api.marshal_with(project_detail_model)
     @api.response(200, 'Success')
     @api.response(403, 'Not authorized')
     @api.response(404, 'Project not found')
+    @replica_reads
     def get(self, project_id):
         """Get details of a specific project"""
         employer = get_authorized_employer()
@@ -289,10 +313,12 @@ class EmployerProjectDetail(Resource):
 @api.param('project_id', 'The project identifier')
 class ProjectTasks(Resource):
     @jwt_required()
+    @conditional_get(path_scope('project', 'project_id'), authorize=authorize_employer_project)
     @api.marshal_list_with(task_model)
     @api.response(200, 'Success')
     @api.response(403, 'Not authorized')
     @api.response(404, 'Project not found')
+    @replica_reads
     def get(self, project_id):
         """Get all tasks for a project"""
         employer = get_authorized_employer()
@@ -394,45 +420,114 @@ class ProjectTaskDetail(Resource):
         
         return '', 204
     
+# Sort keys accepted by the employee roster
+EMPLOYEE_SORT_KEYS = ('name', 'total_seconds', 'total_cost')
+
 @api.route('/employees')
 class EmployerEmployees(Resource):
     @jwt_required()
     @employer_required
+    @conditional_get(claims_scope('employer'))
+    @dashboard_cached('employees')
+    @api.doc(params={
+        'page': 'Page number, starting at 1',
+        'page_size': f'Number of employees per page (max {MAX_PAGE_SIZE})',
+        'sort_by': f'One of {", ".join(EMPLOYEE_SORT_KEYS)} (default name)',
+        'order': 'asc or desc (default asc for name, desc otherwise)'
+    })
     @api.response(200, 'Success')
+    @api.response(400, 'Invalid sort')
     @api.response(403, 'Not authorized')
+    @replica_reads
     def get(self):
+        """
+        Employees on the employer's projects, a page at a time, with their tasks of this employer.
+        A task's total_seconds is its lifetime total (tasks.minutes_spent); an employee's totals and
+        cost add up their tasks', cost billing whole hours per task.
+        """
         claims = get_jwt()
         employer_id = claims['id']
-        projects = Project.query.filter_by(employer_id=employer_id).all()  
-        employees = []
-        employee_ids = set()
-        for project in projects:
-            for employee in project.employees:
-                if employee.id not in employee_ids:
-                    employee_ids.add(employee.id)
-                    tasks: list[Task] = Task.query.join(Task.employees).filter_by(id=employee.id).all()
-                    total_seconds = sum(task.minutes_spent for task in tasks)
-                    total_cost = sum((task.minutes_spent // 3600) * task.project.hourly_rate for task in tasks)
-                    # make total seconds to pretty form of x hours and y minutes
-                    employees.append({
-                        'id': employee.id,
-                        'name': employee.name,
-                        'email': employee.email,
-                        'username': employee.username,
-                        'total_seconds': total_seconds,
-                        'total_cost': float(total_cost),
-                        'tasks': [{
-                            'id': task.id,
-                            'name': task.name,
-                            'status': task.status,
-                            'total_seconds': task.minutes_spent,
-                            'project_id': task.project_id,
-                            'project_name': task.project.name,
-                            'project_hourly_rate': float(task.project.hourly_rate) if task.project.hourly_rate else None,
-                        } for task in tasks]
-                    })
-        
-        return employees
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = page_size_arg(request.args.get('page_size', type=int), default=20)
+        sort_by = request.args.get('sort_by', 'name')
+        if sort_by not in EMPLOYEE_SORT_KEYS:
+            abort(400, f'sort_by must be one of {", ".join(EMPLOYEE_SORT_KEYS)}')
+        order = request.args.get('order', 'asc' if sort_by == 'name' else 'desc')
+        if order not in ('asc', 'desc'):
+            abort(400, 'order must be asc or desc')
+
+        # Employees assigned to any of this employer's projects
+        roster = db.session.query(project_employee.c.employee_id.label('employee_id')).join(
+            Project, Project.id == project_employee.c.project_id
+        ).filter(Project.employer_id == employer_id).distinct().subquery()
+
+        # Each assigned task of this employer with its lifetime logged seconds (tasks.minutes_spent holds seconds,
+        # counted for all employees of the task, as this endpoint always has)
+        task_seconds = db.session.query(
+            task_employee.c.employee_id.label('employee_id'),
+            task_employee.c.task_id.label('task_id'),
+            Project.hourly_rate.label('hourly_rate'),
+            Task.total_minutes_spent.label('seconds')
+        ).join(
+            Task, Task.id == task_employee.c.task_id
+        ).join(
+            Project, Project.id == Task.project_id
+        ).filter(Project.employer_id == employer_id).subquery()
+
+        # Cost is billed per whole hour logged on each task
+        totals = db.session.query(
+            task_seconds.c.employee_id,
+            func.sum(task_seconds.c.seconds).label('total_seconds'),
+            func.sum((task_seconds.c.seconds // 3600) * func.coalesce(task_seconds.c.hourly_rate, 0)).label('total_cost')
+        ).group_by(task_seconds.c.employee_id).subquery()
+
+        total_seconds = func.coalesce(totals.c.total_seconds, 0)
+        total_cost = func.coalesce(totals.c.total_cost, 0)
+        sort_column = {'name': Employee.name, 'total_seconds': total_seconds, 'total_cost': total_cost}[sort_by]
+        sort_column = sort_column.desc() if order == 'desc' else sort_column.asc()
+
+        total = db.session.query(func.count()).select_from(roster).scalar()
+        rows = db.session.query(Employee, total_seconds, total_cost).join(
+            roster, roster.c.employee_id == Employee.id
+        ).outerjoin(
+            totals, totals.c.employee_id == Employee.id
+        ).order_by(sort_column, Employee.id).limit(page_size).offset((page - 1) * page_size).all()
+
+        # Tasks of the employees on this page, in one query
+        employee_tasks: dict[int, list] = {employee.id: [] for employee, _, _ in rows}
+        if employee_tasks:
+            task_rows = db.session.query(Task, Project, task_seconds.c.employee_id, task_seconds.c.seconds).join(
+                task_seconds, task_seconds.c.task_id == Task.id
+            ).join(
+                Project, Project.id == Task.project_id
+            ).filter(task_seconds.c.employee_id.in_(employee_tasks)).order_by(Task.id).all()
+            for task, project, employee_id, seconds in task_rows:
+                employee_tasks[employee_id].append({
+                    'id': task.id,
+                    'name': task.name,
+                    'status': task.status,
+                    'total_seconds': int(seconds),
+                    'project_id': task.project_id,
+                    'project_name': project.name,
+                    'project_hourly_rate': float(project.hourly_rate) if project.hourly_rate else None,
+                })
+
+        employees = [{
+            'id': employee.id,
+            'name': employee.name,
+            'email': employee.email,
+            'username': employee.username,
+            'total_seconds': int(employee_seconds),
+            'total_cost': float(employee_cost),
+            'tasks': employee_tasks[employee.id]
+        } for employee, employee_seconds, employee_cost in rows]
+
+        return {
+            'employees': employees,
+            'total': total,
+            'page': page,
+            'page_size': page_size
+        }
 
 @api.route('/employees/<int:employee_id>/tasks/<task_id>')
 class EmployerEmployees(Resource):
@@ -449,12 +544,14 @@ class EmployerEmployees(Resource):
             abort(404, 'Task not found')
         if task.project.employer_id != employer_id:
             abort(403, 'You are not authorized to delete this task')
-        # Check if employee is assigned to the task
-        employee = task.employees.filter_by(id=employee_id).first()
-        if employee is None:
+        # Remove employee from task, if assigned
+        try:
+            removed = unassign([employee_id], task_ids=[task.id])['task_assignments']
+        except AssignmentError:
+            removed = 0
+        if not removed:
+            db.session.rollback()
             abort(404, 'Employee not assigned to this task')
-        # Remove employee from task
-        task.employees.remove(employee)
         db.session.commit()
         return {'message': 'Employee removed from task successfully'}, 200
     
@@ -462,8 +559,11 @@ class EmployerEmployees(Resource):
 class EmployerSummary(Resource):
     @jwt_required()
     @employer_required
+    @conditional_get(claims_scope('employer'))
+    @dashboard_cached('summary')
     @api.response(200, 'Success')
     @api.response(403, 'Not authorized')
+    @replica_reads
     def get(self):
         claims = get_jwt()
         employer_id = claims['id']
@@ -472,21 +572,28 @@ class EmployerSummary(Resource):
         # Recent top 5 activities from timeLog from employees
         # Total cost of projects
         # Total time spent on projects
-        projects = Project.query.filter_by(employer_id=employer_id).all()
-        # join through projects to get all tasks under this employer
-        project_ids = [project.id for project in projects]
-        tasks = Task.query.filter(Task.project_id.in_(project_ids)).all()
-        
-        # employee count
-        emp_ids = set()
-        for task in tasks:
-            for employee in task.employees:
-                emp_ids.add(employee.id)
-        
-        employee_count = len(emp_ids)
-                
+        # Three statements regardless of how many projects, tasks or logs the employer has
+
+        # project wise time spent, from the daily rollups
+        project_rows = db.session.query(
+            Project.id, Project.hourly_rate, func.coalesce(func.sum(DailyTimeRollup.seconds), 0)
+        ).outerjoin(
+            DailyTimeRollup, DailyTimeRollup.project_id == Project.id
+        ).filter(Project.employer_id == employer_id).group_by(Project.id, Project.hourly_rate).all()
+
+        # task and employee counts
+        tasks_count, employee_count = db.session.query(
+            func.count(func.distinct(Task.id)), func.count(func.distinct(task_employee.c.employee_id))
+        ).join(
+            Project, Project.id == Task.project_id
+        ).outerjoin(
+            task_employee, task_employee.c.task_id == Task.id
+        ).filter(Project.employer_id == employer_id).one()
+
         # recent activities
-        recent_activities = TimeLog.query.filter(TimeLog.project_id.in_(project_ids)).order_by(TimeLog.start_time.desc()).limit(5).all()
+        recent_activities = TimeLog.query.join(
+            Project, Project.id == TimeLog.project_id
+        ).filter(Project.employer_id == employer_id).order_by(TimeLog.start_time.desc()).limit(5).all()
         recent_activities = [
             {
                 'id': activity.id,
@@ -499,24 +606,22 @@ class EmployerSummary(Resource):
             }
             for activity in recent_activities
         ]
-        
-        # total cost of tasks
-        total_cost = int(sum(task.project.hourly_rate * task.minutes_spent // 3600 for task in tasks))
-        
-        # total time spent on tasks
-        total_time = int(sum(task.minutes_spent for task in tasks))
-        
+
         # project wise time and money spent
         project_wise_time = {}
         project_wise_cost = {}
-        for project in projects:
-            project_wise_time[project.id] = int(sum(task.minutes_spent for task in project.tasks))
-            project_wise_cost[project.id] = int(sum(task.project.hourly_rate * task.minutes_spent // 3600 for task in project.tasks))
+        for project_id, hourly_rate, seconds in project_rows:
+            project_wise_time[project_id] = int(seconds)
+            project_wise_cost[project_id] = int((hourly_rate or 0) * int(seconds) // 3600)
+        
+        # total time and cost across projects
+        total_time = sum(project_wise_time.values())
+        total_cost = sum(project_wise_cost.values())
         
         return {
-            'projects_count': len(projects),
+            'projects_count': len(project_rows),
             'employees_count': employee_count,
-            'tasks_count': len(tasks),
+            'tasks_count': tasks_count,
             'recent_activities': recent_activities,
             'total_cost': total_cost,
             'total_time': total_time,
@@ -529,32 +634,50 @@ class EmployerSummary(Resource):
 class EmployerDaySummary(Resource):
     @jwt_required()
     @employer_required
+    @conditional_get(claims_scope('employer'))
+    @dashboard_cached('day-summary')
     @api.response(200, 'Success')
     @api.response(403, 'Not authorized')
+    @replica_reads
     def get(self):
         claims = get_jwt()
         employer_id = claims['id']
         
-        start_time = (datetime.now() - timedelta(days=7)).date()
-        end_time = datetime.now()
+        start_day = (datetime.now() - timedelta(days=7)).date()
         
-        # Fetching summary for this employer, How many projects, employees and tasks
-        # Recent top 5 activities from timeLog from employees
-        # Total cost of projects
-        # Total time spent on projects
-        projects = Project.query.filter_by(employer_id=employer_id).all()
-        # join through projects to get all tasks under this employer
-        project_ids = [project.id for project in projects]
-                    
-        # recent activities
-        recent_activities = TimeLog.query.filter(TimeLog.project_id.in_(project_ids)).filter(TimeLog.start_time.between(start_time, end_time)).all()
-        
-        # day wise sum of duration of timelog object
-        day_wise_duration = {}
-        for activity in recent_activities:
-            day = activity.start_time.strftime('%Y-%m-%d')
-            if day not in day_wise_duration:
-                day_wise_duration[day] = 0
-            day_wise_duration[day] += activity.duration
+        # day wise sum of logged seconds, from the daily rollups
+        day_totals = db.session.query(DailyTimeRollup.day, func.sum(DailyTimeRollup.seconds)).filter(
+            DailyTimeRollup.employer_id == employer_id,
+            DailyTimeRollup.day >= start_day
+        ).group_by(DailyTimeRollup.day).order_by(DailyTimeRollup.day).all()
+        
+        day_wise_duration = {day.strftime('%Y-%m-%d'): int(seconds or 0) for day, seconds in day_totals}
                 
-        return day_wise_duration
\ No newline at end of file
+        return day_wise_duration
+
+
+@api.route('/dashboard-cache')
+class EmployerDashboardCache(Resource):
+    @jwt_required()
+    @admin_required
+    @api.response(200, 'Success')
+    @api.response(403, 'Not authorized')
+    def get(self):
+        """Hit/miss counters of the dashboard response cache (this worker)"""
+        cache = current_app.extensions.get('dashboard_cache')
+        return cache.stats() if cache else {'backend': None}
+
+
+@api.route('/database-stats')
+class EmployerDatabaseStats(Resource):
+    @jwt_required()
+    @admin_required
+    @api.response(200, 'Success')
+    @api.response(403, 'Not authorized')
+    def get(self):
+        """Connection pools (checkout waits, timeouts) and read replica routing of this worker"""
+        replica = current_app.extensions.get('read_replica')
+        return {
+            'pools': pool_stats(),
+            'read_replica': replica.stats() if replica else {'configured': False}
+        }
@@ -1,10 +1,13 @@
-from flask_restx import Namespace, Resource
+from flask_restx import Namespace, Resource, abort
 from api.models.employee import Employee
 from database import db
 import uuid
 from datetime import datetime, timedelta
 from flask import request
+from api.route_restx.auth_decorators import role_required
+from api.service.bulk_invites import InviteImportError, invite_employees, parse_invite_csv
 from api.service.email.email_service import EmailService
+from constants import ACTIVATION_TOKEN_EXPIRY_HOURS, INVITE_IMPORT_MAX_ROWS
 import os
 
 invite_ns = Namespace('invite', description='Employee Invitation')
@@ -23,7 +26,7 @@ class ProjectInviteEmployee(Resource):
 
         # Create pending employee with activation token and expiry
         token = str(uuid.uuid4())
-        expiry = datetime.utcnow() + timedelta(hours=24)
+        expiry = datetime.utcnow() + timedelta(hours=ACTIVATION_TOKEN_EXPIRY_HOURS)
         
         if not employee:
             new_employee = Employee(
@@ -37,9 +40,39 @@ class ProjectInviteEmployee(Resource):
         else:
             employee.activation_token = token
             employee.activation_token_expiry = expiry
-        db.session.commit()
 
-        email_service = EmailService()  
+        # Queued in the same transaction as the token it carries; the email outbox sends it after the commit
+        email_service = EmailService()
         email_service.send_activation_email(email, f"{os.getenv('BASE_APP_DOMAIN_URL')}/activate/{token}")
-        # TODO: Send activation email with link: f"<frontend_url>/activate/{token}"
+        db.session.commit()
         return {"message": "Invitation sent. Activation email will be sent.", "activation_token": token, "expires_at": expiry.isoformat()}, 201
+
+
+@invite_ns.route('/invite-employees')
+class BulkInviteEmployees(Resource):
+    @invite_ns.doc(description='Body: JSON {"employees": [{"email", "name"}, ...]} (or a bare list), '
+                               'a text/csv body, or a multipart CSV upload in "file"; CSV needs an email column and may have a name column')
+    @invite_ns.response(200, 'Per-row report')
+    @invite_ns.response(400, 'Unreadable or oversized invite list')
+    @role_required(['admin', 'employer'])
+    def post(self):
+        """Invite many employees at once: set-based dedupe, bulk inserts and bulk-queued activation emails"""
+        try:
+            if 'file' in request.files:
+                rows = parse_invite_csv(request.files['file'].read().decode('utf-8-sig'))
+            elif request.mimetype == 'text/csv':
+                rows = parse_invite_csv(request.get_data(as_text=True).lstrip('\ufeff'))
+            else:
+                data = request.get_json(silent=True)
+                rows = data.get('employees') if isinstance(data, dict) else data
+                if not isinstance(rows, list):
+                    raise InviteImportError('Expected a JSON list of employees or a CSV')
+        except (InviteImportError, UnicodeDecodeError) as e:
+            abort(400, str(e))
+        if not rows:
+            abort(400, 'No employees to invite')
+        if len(rows) > INVITE_IMPORT_MAX_ROWS:
+            abort(400, f'An import may contain at most {INVITE_IMPORT_MAX_ROWS} employees')
+        report = invite_employees(rows)
+        db.session.commit()
+        return report, 200
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from flask_restx import abort
+
+# Upper bound for page_size on keyset-paginated listings
+MAX_PAGE_SIZE: int = 100
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """
+    Build an opaque keyset cursor from the sort key of the last row on a page.
+
+    Args:
+        sort_value: Value of the datetime sort column for the last row
+        row_id: Primary key of the last row (tie-breaker)
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Decode a cursor produced by encode_cursor, aborting with 400 if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        abort(400, 'Invalid cursor')
+
+
+def page_size_arg(page_size: Optional[int], default: int = 10, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Clamp a requested page size to 1..maximum (MAX_PAGE_SIZE unless given)"""
+    if not page_size:
+        return default
+    return max(1, min(page_size, maximum))
+
+
+def split_page(rows: List[Any], page_size: int) -> Tuple[List[Any], bool]:
+    """Split rows fetched with LIMIT page_size + 1 into the page and a has-more flag"""
+    return rows[:page_size], len(rows) > page_size
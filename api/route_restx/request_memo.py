@@ -0,0 +1,70 @@
+from typing import Any, Callable, Dict, Optional, Type, TypeVar
+from flask import Flask, Response, current_app, g, has_request_context
+from flask_restx import abort
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from database import db
+
+T = TypeVar('T')
+
+# Request-scoped memo table on flask.g: key -> value, plus load/hit counters for the debug headers
+MEMO_ATTR = '_request_memo'
+
+
+def memoize(key: Any, loader: Callable[[], T]) -> T:
+    """
+    Return the value stored under key for the current request, calling loader only the first time.
+    Outside a request the loader is simply called.
+    """
+    if not has_request_context():
+        return loader()
+    memo: Dict[str, Any] = g.setdefault(MEMO_ATTR, {'values': {}, 'loads': 0, 'hits': 0})
+    if key in memo['values']:
+        memo['hits'] += 1
+        return memo['values'][key]
+    value = loader()
+    memo['values'][key] = value
+    memo['loads'] += 1
+    return value
+
+
+def verify_jwt_once() -> None:
+    """verify_jwt_in_request, skipped when jwt_required already decoded the token for this request"""
+    try:
+        get_jwt()
+    except RuntimeError:
+        verify_jwt_in_request()
+        return
+    if has_request_context():
+        g.setdefault(MEMO_ATTR, {'values': {}, 'loads': 0, 'hits': 0})['hits'] += 1
+
+
+def load_entity(model: Type[T], entity_id: Any, *options: Any) -> Optional[T]:
+    """
+    Load an entity by primary key at most once per request.
+
+    Args:
+        model: Model class
+        entity_id: Primary key
+        options: Loader options (e.g. selectinload) applied when the entity is first loaded
+    """
+    return memoize(('entity', model.__name__, entity_id),
+                   lambda: db.session.get(model, entity_id, options=options or None))
+
+
+def load_entity_or_404(model: Type[T], entity_id: Any, *options: Any) -> T:
+    """load_entity, aborting with 404 when the entity does not exist"""
+    entity = load_entity(model, entity_id, *options)
+    if entity is None:
+        abort(404, f'{model.__name__} not found')
+    return entity
+
+
+def init_request_memo(app: Flask) -> None:
+    """Report memo loads and avoided loads in X-Request-Memo-* headers when REQUEST_MEMO_DEBUG_HEADERS is set"""
+    @app.after_request
+    def add_request_memo_headers(response: Response) -> Response:
+        if current_app.config.get('REQUEST_MEMO_DEBUG_HEADERS'):
+            memo = g.get(MEMO_ATTR) or {'loads': 0, 'hits': 0}
+            response.headers['X-Request-Memo-Loads'] = str(memo['loads'])
+            response.headers['X-Request-Memo-Avoided'] = str(memo['hits'])
+        return response
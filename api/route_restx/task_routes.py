@@ -1,7 +1,13 @@
 from flask_restx import Namespace, Resource, fields
+from sqlalchemy.orm import joinedload, selectinload
+from api.models.base import task_employee
+from api.models.project import Project
 from api.models.task import Task
+from api.models.time_log import TimeLog
 from database import db
 from flask_jwt_extended import jwt_required, get_jwt
+from api.route_restx.conditional_get import conditional_get, path_scope
+from api.route_restx.request_memo import load_entity_or_404
 
 api = Namespace('tasks', description='Task operations')
 
@@ -26,7 +32,7 @@ detailed_task_model = api.model('DetailedTask', {
     'project_hourly_rate': fields.Float(attribute=lambda x: float(x.project.hourly_rate) if x.project and x.project.hourly_rate else None),
     'created_at': fields.DateTime(),
     'updated_at': fields.DateTime(),
-    'minutes_spent': fields.Integer(),
+    'minutes_spent': fields.Integer(attribute='total_minutes_spent'),
     'assignees': fields.List(fields.Nested(api.model('AssigneeSummary', {
         'id': fields.Integer(),
         'name': fields.String(),
@@ -79,11 +85,26 @@ class TaskList(Resource):
         db.session.commit()
         return task, 201
 
+def authorize_task(claims, kwargs):
+    """Permission check of the task detail, with one small query, run before conditional_get may answer 304"""
+    user_role, user_id, task_id = claims.get('role'), claims.get('id'), kwargs['task_id']
+    if user_role == 'employee':
+        allowed = db.session.query(task_employee).filter_by(task_id=task_id, employee_id=user_id).first() is not None
+    elif user_role == 'employer':
+        owner_id = db.session.query(Project.employer_id).join(Task, Task.project_id == Project.id) \
+            .filter(Task.id == task_id).scalar()
+        allowed = owner_id == user_id
+    else:
+        return
+    if not allowed:
+        api.abort(403, 'You do not have permission to view this task')
+
 @api.route('/<int:task_id>')
 @api.param('task_id', 'The task identifier')
 @api.response(404, 'Task not found')
 class TaskDetail(Resource):
     @jwt_required()
+    @conditional_get(path_scope('task', 'task_id'), authorize=authorize_task)
     @api.marshal_with(detailed_task_model)
     def get(self, task_id):
         """Get task details including time entries"""
@@ -92,7 +113,13 @@ class TaskDetail(Resource):
         user_role = claims.get('role')
         user_id = claims.get('id')
 
-        task = Task.query.get_or_404(task_id)
+        # Everything the detailed model's attribute lambdas read, so marshalling issues no lazy loads
+        task = load_entity_or_404(
+            Task, task_id,
+            joinedload(Task.project),
+            selectinload(Task.employees),
+            selectinload(Task.time_logs).joinedload(TimeLog.employee)
+        )
 
         # Check permissions
         if user_role == 'employee':
@@ -1,16 +1,29 @@
 import os
-import uuid
 from datetime import datetime
 import mimetypes
-from flask import current_app
-from flask_restx import Namespace, Resource, fields, reqparse
+from typing import Any, Dict, List, Optional, Tuple
+from flask import current_app, request
+from flask_restx import Namespace, Resource, fields, inputs, reqparse, abort
+from sqlalchemy import insert, tuple_
+from sqlalchemy.exc import IntegrityError
 from werkzeug.datastructures import FileStorage
 from api.models.time_log import TimeLog
 from api.models.task import Task
+from api.models.project import Project
 from database import db
 from api.route_restx.auth_decorators import role_required, check_mac_address
-from api.service.azure_blob import AzureBlobStorage
+from api.route_restx.request_memo import load_entity, memoize
+from api.route_restx.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, page_size_arg, split_page
+from api.service.direct_uploads import DirectUploadError, UploadAlreadyClaimedError, claim_upload, discard, issue_upload, release_source
+from api.service.read_replica import replica_reads
+from api.service.screenshot_blobs import delete_unshared, purge_released, release, thumbnail_blob_name
+from api.service.screenshot_uploader import SpoolFullError
+from api.service.similarity_index import IndexedScreenshot, hash_hex
+from api.service.time_rollups import forget_time_logs, record_time_logs
 from flask_jwt_extended import get_jwt
+from constants import (SCREENSHOT_GALLERY_DEFAULT_PAGE_SIZE, SCREENSHOT_GALLERY_MAX_PAGE_SIZE,
+                       SIMILAR_SCREENSHOT_DEFAULT_DISTANCE, SIMILAR_SCREENSHOT_MAX_DISTANCE, TIME_LOG_BATCH_MAX_ITEMS,
+                       TIME_LOG_FORM_OVERHEAD_BYTES)
 
 api = Namespace('timelogs', description='Time Log operations')
 
@@ -25,10 +38,93 @@ time_log_model = api.model('TimeLog', {
     'is_screenshot_permission_enabled': fields.Boolean,
     'ip_address': fields.String,
     'mac_address': fields.String,
+    'idempotency_key': fields.String(description='Client-generated key that makes retries safe'),
     # Screenshot fields
     'file_path': fields.String(readOnly=True),
     'image_url': fields.String(readOnly=True),
-    'captured_at': fields.DateTime(description='Timestamp when the screenshot was taken')
+    'thumbnail_urls': fields.Raw(readOnly=True, description='Thumbnail URLs keyed by width in pixels'),
+    'perceptual_hash': fields.String(readOnly=True, attribute=lambda time_log: hash_hex(time_log.perceptual_hash),
+                                     description='64-bit dHash of the screenshot as 16 hex digits'),
+    'captured_at': fields.DateTime(description='Timestamp when the screenshot was taken'),
+    'screenshot_status': fields.String(readOnly=True, description="Screenshot upload state: 'pending', 'uploaded' or 'failed'"),
+    'screenshot_attempts': fields.Integer(readOnly=True, description='Number of upload attempts made so far')
+})
+
+gallery_screenshot_model = api.model('GalleryScreenshot', {
+    'time_log_id': fields.Integer,
+    'employee_id': fields.Integer,
+    'project_id': fields.Integer,
+    'task_id': fields.Integer,
+    'start_time': fields.DateTime,
+    'captured_at': fields.DateTime,
+    'image_url': fields.String(description='Short-lived read URL of the screenshot'),
+    'thumbnail_urls': fields.Raw(description='Short-lived read URLs of the thumbnails keyed by width in pixels'),
+    'perceptual_hash': fields.String
+})
+
+gallery_page_model = api.model('ScreenshotGalleryPage', {
+    'screenshots': fields.List(fields.Nested(gallery_screenshot_model)),
+    'urls_valid_for': fields.Integer(description='Seconds the returned URLs stay valid at least'),
+    'next_cursor': fields.String(description='Opaque cursor for the next page, null on the last page')
+})
+
+similar_screenshot_model = api.model('SimilarScreenshot', {
+    'time_log_id': fields.Integer,
+    'project_id': fields.Integer,
+    'start_time': fields.DateTime,
+    'distance': fields.Integer(description='Hamming distance between the perceptual hashes (0-64); '
+                                           'in groups, to the first screenshot of the group')
+})
+
+similar_screenshots_model = api.model('SimilarScreenshots', {
+    'time_log_id': fields.Integer,
+    'perceptual_hash': fields.String,
+    'max_distance': fields.Integer,
+    'matches': fields.List(fields.Nested(similar_screenshot_model))
+})
+
+similar_groups_model = api.model('SimilarScreenshotGroups', {
+    'employee_id': fields.Integer,
+    'date': fields.String,
+    'max_distance': fields.Integer,
+    'groups': fields.List(fields.List(fields.Nested(similar_screenshot_model)),
+                          description='Near-identical screenshots, each group in time order')
+})
+
+time_log_page_model = api.model('TimeLogPage', {
+    'time_logs': fields.List(fields.Nested(time_log_model)),
+    'next_cursor': fields.String(description='Opaque cursor for the next page, null on the last page')
+})
+
+batch_item_model = api.model('TimeLogBatchItem', {
+    'task_id': fields.Integer(required=True, description='Task ID'),
+    'project_id': fields.Integer(required=True, description='Project ID'),
+    'start_time': fields.Float(required=True, description='Start time as UNIX timestamp (seconds)'),
+    'end_time': fields.Float(required=True, description='End time as UNIX timestamp (seconds)'),
+    'duration': fields.Float(required=True, description='Duration in seconds'),
+    'is_screenshot_permission_enabled': fields.Boolean,
+    'ip_address': fields.String,
+    'mac_address': fields.String,
+    'idempotency_key': fields.String(description='Client-generated key (e.g. "<device>:<sequence>") that makes retries safe')
+})
+
+batch_input_model = api.model('TimeLogBatch', {
+    'time_logs': fields.List(fields.Nested(batch_item_model), required=True,
+                             description=f'Up to {TIME_LOG_BATCH_MAX_ITEMS} intervals')
+})
+
+batch_result_model = api.model('TimeLogBatchResult', {
+    'index': fields.Integer(description='Position of the item in the request payload'),
+    'status': fields.String(description="'created', 'duplicate' or 'failed'"),
+    'id': fields.Integer(description='ID of the created (or previously stored) time log'),
+    'message': fields.String(description='Reason the item was rejected')
+})
+
+batch_response_model = api.model('TimeLogBatchResponse', {
+    'created': fields.Integer,
+    'duplicates': fields.Integer,
+    'failed': fields.Integer,
+    'results': fields.List(fields.Nested(batch_result_model))
 })
 
 upload_parser = reqparse.RequestParser()
@@ -37,10 +133,28 @@ upload_parser.add_argument('project_id', type=int, required=True, help='Project
 upload_parser.add_argument('start_time', type=float, required=True, help='Start time as UNIX timestamp (seconds)')
 upload_parser.add_argument('end_time', type=float, required=True, help='End time as UNIX timestamp (seconds)')
 upload_parser.add_argument('duration', type=float, required=True, help='Duration in seconds')
-upload_parser.add_argument('is_screenshot_permission_enabled', type=bool, required=False)
+upload_parser.add_argument('is_screenshot_permission_enabled', type=inputs.boolean, required=False, default=True)
 upload_parser.add_argument('ip_address', type=str, required=False)
 upload_parser.add_argument('mac_address', type=str, required=False)
+upload_parser.add_argument('idempotency_key', type=str, required=False, help='Client-generated key (e.g. "<device>:<sequence>") that makes retries safe')
 upload_parser.add_argument('file', location='files', type=FileStorage, required=False, help='Screenshot image file')
+upload_parser.add_argument('upload_token', type=str, required=False,
+                           help='upload_token from POST /screenshot-uploads, once the screenshot was PUT to its upload URL')
+
+screenshot_upload_request_model = api.model('ScreenshotUploadRequest', {
+    'content_type': fields.String(description='MIME type of the screenshot', default='image/png'),
+    'size': fields.Integer(description='Exact size in bytes the upload will have (checked at commit)')
+})
+
+screenshot_upload_model = api.model('ScreenshotUpload', {
+    'url': fields.String(description='Short-lived URL to PUT the screenshot bytes to'),
+    'method': fields.String(description='HTTP method to use (PUT)'),
+    'headers': fields.Raw(description='Headers to send with the PUT'),
+    'blob_name': fields.String,
+    'upload_token': fields.String(description='Send with the time log (POST /) once the PUT succeeded'),
+    'max_bytes': fields.Integer,
+    'expires_at': fields.String
+})
 
 @api.route('/')
 class TimeLogList(Resource):
@@ -49,27 +163,47 @@ class TimeLogList(Resource):
     @check_mac_address
     @api.marshal_with(time_log_model, code=201)
     def post(self) -> tuple[TimeLog, int]:
-        """Create a new time log (optionally with screenshot upload)"""
+        """Create a new time log (optionally with a screenshot file, or an upload_token of a direct upload)"""
         claims = get_jwt()
         employee_id = claims.get('id')
+        # Refuse oversized bodies before the form is parsed; werkzeug also stops reading at this limit
+        # when no Content-Length is sent, and the file part is streamed to a temporary file, not memory
+        max_bytes = current_app.config['SCREENSHOT_MAX_BYTES'] + TIME_LOG_FORM_OVERHEAD_BYTES
+        if request.content_length is not None and request.content_length > max_bytes:
+            abort(413, f"Screenshot exceeds {current_app.config['SCREENSHOT_MAX_BYTES']} bytes")
+        request.max_content_length = max_bytes
         args = upload_parser.parse_args()
+        if args.get('file') and args.get('upload_token'):
+            abort(400, 'Send either file or upload_token, not both')
+        idempotency_key = args.get('idempotency_key')
+        if idempotency_key:
+            if len(idempotency_key) > 128:
+                abort(400, 'idempotency_key must be at most 128 characters')
+            # Fast path for agent retries: return the stored row without a second insert or counter increment
+            existing = TimeLog.find_by_idempotency_keys(employee_id, [idempotency_key]).get(idempotency_key)
+            if existing:
+                return existing, 200
         file = args.get('file')
-        file_path = None
-        image_url = None
-        captured_at = None
-        if file:
-            # Generate a GUID for the file ID
-            file_id = str(uuid.uuid4())
-            blob_name = file_id
+        spooled = None
+        direct = None
+        if args.get('upload_token'):
+            # The agent already put the screenshot in storage: check it and copy it out of the agent's reach
+            try:
+                direct = claim_upload(employee_id, args['upload_token'])
+            except UploadAlreadyClaimedError as e:
+                abort(409, str(e))
+            except DirectUploadError as e:
+                abort(400, str(e))
+        elif file:
+            # Spool the bytes locally; a background worker uploads them to blob storage
             container_name = os.environ.get('SCREENSHOT_STORAGE_CONTAINER', 'screenshots')
-            # Get Azure connection string from config/env
-            azure_blob = AzureBlobStorage()
-            file_data = file.read()
             content_type = mimetypes.guess_type(file.filename)[0] or 'application/octet-stream'
-            image_url = azure_blob.upload_file(container_name, blob_name, file_data, content_type)
-            file_path = blob_name
-            captured_at = datetime.utcnow()
-            
+            uploader = current_app.extensions['screenshot_uploader']
+            try:
+                spooled = uploader.spool(file, container_name, content_type)
+            except SpoolFullError as e:
+                abort(503, str(e))
+
         # Convert UNIX timestamps to datetime
         start_time_dt = datetime.utcfromtimestamp(args.get('start_time')) if args.get('start_time') else None
         end_time_dt = datetime.utcfromtimestamp(args.get('end_time')) if args.get('end_time') else None
@@ -83,46 +217,556 @@ class TimeLogList(Resource):
             is_screenshot_permission_enabled=args.get('is_screenshot_permission_enabled'),
             ip_address=args.get('ip_address'),
             mac_address=args.get('mac_address'),
-            file_path=file_path,
-            image_url=image_url,
-            captured_at=captured_at
+            idempotency_key=idempotency_key,
+            screenshot_status='pending' if spooled else None
         )
-        # Add the duration to minutes in task assigned to this user
-        task = Task.query.get(args['task_id'])
-        if task:
-            task.minutes_spent += args['duration']
+        if direct:
+            time_log.screenshot_status = 'uploaded'
+            time_log.file_path = direct.blob_name
+            time_log.image_url = direct.image_url
+            time_log.captured_at = datetime.utcnow()
         db.session.add(time_log)
-        db.session.commit()
+        # Add the duration to minutes in task assigned to this user (SQL increment, no read-modify-write)
+        Task.apply_minutes_deltas({args['task_id']: args['duration']})
+        record_time_logs([{
+            'project_id': time_log.project_id,
+            'task_id': time_log.task_id,
+            'employee_id': employee_id,
+            'start_time': start_time_dt,
+            'duration': time_log.duration
+        }])
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if spooled:
+                uploader.discard(spooled)
+            if direct:
+                discard(direct)
+            if isinstance(e, IntegrityError) and idempotency_key:
+                # A concurrent retry with the same key won the race
+                existing = TimeLog.find_by_idempotency_keys(employee_id, [idempotency_key]).get(idempotency_key)
+                if existing:
+                    return existing, 200
+            raise
+        if spooled:
+            uploader.submit(spooled, time_log.id)
+        if direct:
+            release_source(direct)
+        processor = current_app.extensions.get('screenshot_processor')
+        if direct and processor:
+            processor.process_stored(time_log.id, direct.container_name, direct.blob_name)
         return time_log, 201
 
-    @api.marshal_list_with(time_log_model)
+    @api.marshal_with(time_log_page_model)
+    @api.doc(params={
+        'project_id': 'Project ID',
+        'task_id': 'Task ID',
+        'start_date': 'Only logs starting at or after this ISO date/time',
+        'end_date': 'Only logs starting at or before this ISO date/time',
+        'page_size': f'Number of logs per page (max {MAX_PAGE_SIZE})',
+        'cursor': 'next_cursor from the previous page'
+    })
     @role_required(['admin', 'employer'])
-    def get(self) -> list[TimeLog]:
-        """Get time logs for a project and task within a date range"""
-        from flask import request
+    @replica_reads
+    def get(self) -> Dict[str, Any]:
+        """Get time logs for a project and task within a date range, newest first (keyset paginated)"""
         project_id = request.args.get('project_id', type=int)
         task_id = request.args.get('task_id', type=int)
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        page = request.args.get('page', default=1, type=int)
-        page_size = request.args.get('page_size', default=10, type=int)
-        
-        time_logs = TimeLog.query.filter_by(project_id=project_id, task_id=task_id).filter(TimeLog.start_time.between(start_date, end_date)).all()
-        time_logs = time_logs[(page - 1) * page_size: page * page_size]
-        time_logs = [{
-            'id': time_log.id,
-            'employee_id': time_log.employee_id,
-            'task_id': time_log.task_id,
+        start_date = _parse_date_arg('start_date')
+        end_date = _parse_date_arg('end_date')
+        page_size = page_size_arg(request.args.get('page_size', type=int))
+        cursor = decode_cursor(request.args.get('cursor'))
+
+        query = TimeLog.query
+        if project_id is not None:
+            query = query.filter(TimeLog.project_id == project_id)
+        if task_id is not None:
+            query = query.filter(TimeLog.task_id == task_id)
+        if start_date:
+            query = query.filter(TimeLog.start_time >= start_date)
+        if end_date:
+            query = query.filter(TimeLog.start_time <= end_date)
+        if cursor:
+            query = query.filter(tuple_(TimeLog.start_time, TimeLog.id) < tuple_(*cursor))
+        rows = query.order_by(TimeLog.start_time.desc(), TimeLog.id.desc()).limit(page_size + 1).all()
+
+        time_logs, has_more = split_page(rows, page_size)
+        last = time_logs[-1] if time_logs else None
+        return {
+            'time_logs': time_logs,
+            'next_cursor': encode_cursor(last.start_time, last.id) if has_more else None
+        }
+
+
+def _load_time_log_or_404(time_log_id: int) -> TimeLog:
+    """Load a time log by id at most once per request, aborting with 404 when it does not exist"""
+    time_log = memoize(('entity', TimeLog.__name__, time_log_id), lambda: TimeLog.find(time_log_id))
+    if time_log is None:
+        abort(404, 'TimeLog not found')
+    return time_log
+
+
+def _parse_date_arg(name: str) -> Optional[datetime]:
+    """Parse an optional ISO date/time query argument, aborting with 400 if it is malformed"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f'{name} must be an ISO 8601 date or date/time')
+
+
+def _max_distance_arg() -> int:
+    """max_distance query argument, clamped to 0..SIMILAR_SCREENSHOT_MAX_DISTANCE"""
+    max_distance = request.args.get('max_distance', SIMILAR_SCREENSHOT_DEFAULT_DISTANCE, type=int)
+    return max(0, min(max_distance, SIMILAR_SCREENSHOT_MAX_DISTANCE))
+
+
+def _employer_project_ids() -> set:
+    """Ids of the calling employer's projects"""
+    return {row.id for row in db.session.query(Project.id).filter(Project.employer_id == get_jwt().get('id'))}
+
+
+def _similar_screenshot(item: IndexedScreenshot, distance: int) -> Dict[str, Any]:
+    time_log_id, project_id, start_time = item
+    return {'time_log_id': time_log_id, 'project_id': project_id, 'start_time': start_time, 'distance': distance}
+
+
+def _validate_batch_item(item: Any, tasks: Dict[int, int]) -> Optional[str]:
+    """Return an error message for an invalid batch item, or None if it can be inserted"""
+    if not isinstance(item, dict):
+        return 'Item must be an object'
+    for key in ('task_id', 'project_id', 'start_time', 'end_time', 'duration'):
+        if item.get(key) is None:
+            return f'{key} is required'
+    try:
+        task_id = int(item['task_id'])
+        project_id = int(item['project_id'])
+        start_time = float(item['start_time'])
+        end_time = float(item['end_time'])
+        duration = float(item['duration'])
+    except (TypeError, ValueError):
+        return 'task_id, project_id, start_time, end_time and duration must be numeric'
+    if end_time < start_time:
+        return 'end_time must not be before start_time'
+    if duration < 0:
+        return 'duration must not be negative'
+    idempotency_key = item.get('idempotency_key')
+    if idempotency_key is not None and (not isinstance(idempotency_key, str) or len(idempotency_key) > 128):
+        return 'idempotency_key must be a string of at most 128 characters'
+    if task_id not in tasks:
+        return f'Task {task_id} not found'
+    if tasks[task_id] != project_id:
+        return f'Task {task_id} does not belong to project {project_id}'
+    return None
+
+
+@api.route('/screenshot-uploads')
+class ScreenshotUploads(Resource):
+    @api.expect(screenshot_upload_request_model)
+    @role_required(['employee', 'employer'])
+    @check_mac_address
+    @api.marshal_with(screenshot_upload_model, code=201)
+    @api.response(400, 'Invalid content type or size')
+    def post(self) -> Tuple[Dict[str, Any], int]:
+        """
+        Start a direct screenshot upload: returns a short-lived write URL for a server-chosen blob.
+        PUT the bytes there, then create the time log (POST /) with the returned upload_token.
+        """
+        data = request.get_json(silent=True) or {}
+        content_type = data.get('content_type') or 'image/png'
+        if not isinstance(content_type, str) or not content_type.startswith('image/'):
+            abort(400, 'content_type must be an image MIME type')
+        size = data.get('size')
+        if size is not None and (not isinstance(size, int) or isinstance(size, bool)):
+            abort(400, 'size must be an integer')
+        try:
+            return issue_upload(get_jwt().get('id'), content_type, size), 201
+        except DirectUploadError as e:
+            abort(400, str(e))
+
+
+@api.route('/blob-uploads/<string:container_name>/<path:blob_name>')
+class LocalBlobUpload(Resource):
+    @api.doc(params={'token': 'Signed token from the upload URL'})
+    @api.response(201, 'Stored')
+    @api.response(403, 'Invalid or expired token')
+    @api.response(411, 'Content-Length required')
+    @api.response(413, 'Blob too large')
+    def put(self, container_name: str, blob_name: str) -> Tuple[str, int]:
+        """Signed upload URL target of the local storage backend (the URL token is the credential)"""
+        storage = current_app.extensions['blob_storage']
+        if storage.backend != 'local':
+            abort(404, 'Uploads go directly to blob storage')
+        try:
+            content_type, max_bytes = storage.verify_upload_token(container_name, blob_name, request.args.get('token'))
+        except ValueError as e:
+            abort(403, str(e))
+        if request.content_length is None:
+            abort(411, 'Content-Length required')
+        if max_bytes is not None and request.content_length > max_bytes:
+            abort(413, f'Blob exceeds {max_bytes} bytes')
+        storage.upload_file(container_name, blob_name, request.stream, content_type or request.mimetype)
+        return '', 201
+
+
+@api.route('/blob-reads/<string:container_name>/<path:blob_name>')
+class LocalBlobRead(Resource):
+    @api.doc(params={'token': 'Signed token from the read URL'})
+    @api.response(200, 'Blob bytes')
+    @api.response(403, 'Invalid or expired token')
+    @api.response(404, 'Blob not found')
+    def get(self, container_name: str, blob_name: str) -> Any:
+        """Signed read URL target of the local storage backend (the URL token is the credential)"""
+        storage = current_app.extensions['blob_storage']
+        if storage.backend != 'local':
+            abort(404, 'Blobs are read directly from blob storage')
+        try:
+            storage.verify_read_token(container_name, blob_name, request.args.get('token'))
+        except ValueError as e:
+            abort(403, str(e))
+        try:
+            return storage.send_blob(container_name, blob_name)
+        except FileNotFoundError:
+            abort(404, 'Blob not found')
+
+
+@api.route('/screenshots')
+class ScreenshotGallery(Resource):
+    @api.marshal_with(gallery_page_model)
+    @api.doc(params={
+        'project_id': 'Project ID',
+        'employee_id': 'Employee ID (employees only see their own screenshots)',
+        'start_date': 'Only screenshots of logs starting at or after this ISO date/time',
+        'end_date': 'Only screenshots of logs starting at or before this ISO date/time',
+        'page_size': f'Number of screenshots per page (default {SCREENSHOT_GALLERY_DEFAULT_PAGE_SIZE}, '
+                     f'max {SCREENSHOT_GALLERY_MAX_PAGE_SIZE})',
+        'cursor': 'next_cursor from the previous page'
+    })
+    @role_required(['admin', 'employer', 'employee'])
+    @api.response(403, 'Not authorized')
+    @replica_reads
+    def get(self) -> Dict[str, Any]:
+        """Uploaded screenshots of a project/employee and time window, newest first, with short-lived read URLs"""
+        claims = get_jwt()
+        project_id = request.args.get('project_id', type=int)
+        employee_id = request.args.get('employee_id', type=int)
+        start_date = _parse_date_arg('start_date')
+        end_date = _parse_date_arg('end_date')
+        page_size = page_size_arg(request.args.get('page_size', type=int), default=SCREENSHOT_GALLERY_DEFAULT_PAGE_SIZE,
+                                  maximum=SCREENSHOT_GALLERY_MAX_PAGE_SIZE)
+        cursor = decode_cursor(request.args.get('cursor'))
+
+        query = db.session.query(
+            TimeLog.id, TimeLog.employee_id, TimeLog.project_id, TimeLog.task_id, TimeLog.start_time,
+            TimeLog.captured_at, TimeLog.file_path, TimeLog.thumbnail_urls, TimeLog.perceptual_hash
+        ).filter(TimeLog.screenshot_status == 'uploaded', TimeLog.file_path.isnot(None))
+        if claims.get('role') == 'employee':
+            if employee_id is not None and employee_id != claims.get('id'):
+                abort(403, "Not authorized to view another employee's screenshots")
+            employee_id = claims.get('id')
+        if claims.get('role') == 'employer':
+            if project_id is not None:
+                project = load_entity(Project, project_id)
+                if project is None or project.employer_id != claims.get('id'):
+                    abort(403, 'Not authorized to view screenshots of this project')
+            else:
+                query = query.filter(TimeLog.project_id.in_(
+                    db.session.query(Project.id).filter(Project.employer_id == claims.get('id'))))
+        if project_id is not None:
+            query = query.filter(TimeLog.project_id == project_id)
+        if employee_id is not None:
+            query = query.filter(TimeLog.employee_id == employee_id)
+        if start_date:
+            query = query.filter(TimeLog.start_time >= start_date)
+        if end_date:
+            query = query.filter(TimeLog.start_time <= end_date)
+        if cursor:
+            query = query.filter(tuple_(TimeLog.start_time, TimeLog.id) < tuple_(*cursor))
+        rows = query.order_by(TimeLog.start_time.desc(), TimeLog.id.desc()).limit(page_size + 1).all()
+        rows, has_more = split_page(rows, page_size)
+
+        # Sign every URL of the page in one batch (cached ones are reused)
+        blob_names = {row.id: (row.file_path, {width: thumbnail_blob_name(row.file_path, width)
+                                               for width in row.thumbnail_urls or ()}) for row in rows}
+        read_urls = current_app.extensions['read_urls']
+        urls = read_urls.urls(os.environ.get('SCREENSHOT_STORAGE_CONTAINER', 'screenshots'),
+                              [name for image, thumbnails in blob_names.values() for name in (image, *thumbnails.values()) if name])
+        screenshots = []
+        for row in rows:
+            image, thumbnails = blob_names[row.id]
+            screenshots.append({
+                'time_log_id': row.id,
+                'employee_id': row.employee_id,
+                'project_id': row.project_id,
+                'task_id': row.task_id,
+                'start_time': row.start_time,
+                'captured_at': row.captured_at,
+                'image_url': urls[image],
+                'thumbnail_urls': {width: urls[name] for width, name in thumbnails.items() if name} or None,
+                'perceptual_hash': hash_hex(row.perceptual_hash)
+            })
+        last = rows[-1] if rows else None
+        return {
+            'screenshots': screenshots,
+            'urls_valid_for': read_urls.refresh,
+            'next_cursor': encode_cursor(last.start_time, last.id) if has_more else None
+        }
+
+
+@api.route('/batch')
+class TimeLogBatch(Resource):
+    @api.expect(batch_input_model)
+    @api.response(201, 'All time logs created', batch_response_model)
+    @api.response(207, 'Some time logs were rejected', batch_response_model)
+    @api.response(400, 'Validation error')
+    @role_required(['employee', 'employer'])
+    @check_mac_address
+    def post(self) -> Tuple[Dict[str, Any], int]:
+        """Create many time logs in one request (per-item results let agents retry only failures)"""
+        claims = get_jwt()
+        employee_id = claims.get('id')
+        data = api.payload or {}
+        items = data.get('time_logs')
+        if not isinstance(items, list) or not items:
+            abort(400, 'time_logs must be a non-empty list')
+        if len(items) > TIME_LOG_BATCH_MAX_ITEMS:
+            abort(400, f'A batch may contain at most {TIME_LOG_BATCH_MAX_ITEMS} time logs')
+
+        # Resolve every referenced task and previously stored idempotency key in one query each
+        task_ids = set()
+        for item in items:
+            try:
+                task_ids.add(int(item['task_id']))
+            except (TypeError, ValueError, KeyError):
+                continue
+        tasks: Dict[int, int] = dict(
+            db.session.query(Task.id, Task.project_id).filter(Task.id.in_(task_ids)).all()
+        ) if task_ids else {}
+        existing = TimeLog.find_by_idempotency_keys(
+            employee_id, [item.get('idempotency_key') for item in items
+                          if isinstance(item, dict) and isinstance(item.get('idempotency_key'), str)]
+        )
+
+        results: List[Dict[str, Any]] = []
+        rows: List[Dict[str, Any]] = []
+        row_indexes: List[int] = []
+        row_keys: Dict[str, int] = {}
+        repeated: List[Tuple[int, str]] = []
+        deltas: Dict[int, float] = {}
+        for index, item in enumerate(items):
+            error = _validate_batch_item(item, tasks)
+            if error:
+                results.append({'index': index, 'status': 'failed', 'message': error})
+                continue
+            idempotency_key = item.get('idempotency_key')
+            if idempotency_key in existing:
+                results.append({'index': index, 'status': 'duplicate', 'id': existing[idempotency_key].id})
+                continue
+            if idempotency_key in row_keys:
+                # Same key twice in one payload; resolved to the first occurrence after the insert
+                repeated.append((index, idempotency_key))
+                continue
+            if idempotency_key:
+                row_keys[idempotency_key] = len(rows)
+            task_id = int(item['task_id'])
+            duration = float(item['duration'])
+            rows.append({
+                'employee_id': employee_id,
+                'task_id': task_id,
+                'project_id': int(item['project_id']),
+                'start_time': datetime.utcfromtimestamp(float(item['start_time'])),
+                'end_time': datetime.utcfromtimestamp(float(item['end_time'])),
+                'duration': duration,
+                'is_screenshot_permission_enabled': bool(item.get('is_screenshot_permission_enabled', True)),
+                'ip_address': item.get('ip_address'),
+                'mac_address': item.get('mac_address'),
+                'idempotency_key': idempotency_key
+            })
+            row_indexes.append(index)
+            deltas[task_id] = deltas.get(task_id, 0) + duration
+
+        if rows:
+            try:
+                # Single multi-row INSERT plus one grouped UPDATE of the task counters
+                ids = db.session.scalars(
+                    insert(TimeLog).returning(TimeLog.id, sort_by_parameter_order=True),
+                    rows
+                ).all()
+                Task.apply_minutes_deltas(deltas)
+                record_time_logs(rows)
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent retry stored one of these keys first; retrying the batch dedups it
+                db.session.rollback()
+                abort(409, 'Some idempotency keys were stored concurrently, retry the batch')
+            except Exception as e:
+                db.session.rollback()
+                abort(500, f'Failed to store time logs: {str(e)}')
+            for index, time_log_id in zip(row_indexes, ids):
+                results.append({'index': index, 'status': 'created', 'id': time_log_id})
+            for index, idempotency_key in repeated:
+                results.append({'index': index, 'status': 'duplicate', 'id': ids[row_keys[idempotency_key]]})
+            results.sort(key=lambda result: result['index'])
+
+        created = len(rows)
+        duplicates = len([result for result in results if result['status'] == 'duplicate'])
+        failed = len(items) - created - duplicates
+        return {
+            'created': created,
+            'duplicates': duplicates,
+            'failed': failed,
+            'results': results
+        }, 201 if failed == 0 else 207
+
+
+@api.route('/<int:time_log_id>')
+@api.param('time_log_id', 'The time log identifier')
+class TimeLogItem(Resource):
+    @role_required(['admin', 'employer'])
+    @api.response(204, 'Time log deleted')
+    @api.response(403, 'Not authorized')
+    @api.response(404, 'Time log not found')
+    def delete(self, time_log_id: int) -> Tuple[str, int]:
+        """Delete a time log, taking its duration off the task and rollups and releasing its screenshot"""
+        claims = get_jwt()
+        time_log = _load_time_log_or_404(time_log_id)
+        if claims.get('role') == 'employer':
+            project = load_entity(Project, time_log.project_id)
+            if project is None or project.employer_id != claims.get('id'):
+                abort(403, 'Not authorized to delete this time log')
+        Task.apply_minutes_deltas({time_log.task_id: -(time_log.duration or 0)})
+        forget_time_logs([{
             'project_id': time_log.project_id,
+            'task_id': time_log.task_id,
+            'employee_id': time_log.employee_id,
             'start_time': time_log.start_time,
-            'end_time': time_log.end_time,
-            'duration': time_log.duration,
-            'is_screenshot_permission_enabled': time_log.is_screenshot_permission_enabled,
-            'ip_address': time_log.ip_address,
-            'mac_address': time_log.mac_address,
-            'file_path': time_log.file_path,
-            'image_url': time_log.image_url,
-            'captured_at': time_log.captured_at
-        } for time_log in time_logs]
-        time_logs = sorted(time_logs, key=lambda x: x['start_time'], reverse=True) 
-        return time_logs
\ No newline at end of file
+            'duration': time_log.duration
+        }])
+        blob_id = time_log.screenshot_blob_id
+        unshared = None if blob_id or not time_log.file_path else (time_log.file_path, time_log.thumbnail_urls)
+        db.session.delete(time_log)
+        db.session.flush()
+        # Shared screenshot: only the last reference deletes the stored blobs, once the delete is committed
+        released = release([blob_id])
+        db.session.commit()
+        purge_released(released)
+        if unshared:
+            try:
+                delete_unshared(os.environ.get('SCREENSHOT_STORAGE_CONTAINER', 'screenshots'), *unshared)
+            except Exception as e:
+                current_app.logger.warning(f"Could not delete screenshot of time log {time_log_id}: {e}")
+        return '', 204
+
+
+@api.route('/<int:time_log_id>/screenshot')
+@api.param('time_log_id', 'The time log identifier')
+class TimeLogScreenshot(Resource):
+    @role_required(['admin', 'employer', 'employee'])
+    @api.response(200, 'Screenshot bytes')
+    @api.response(403, 'Not authorized')
+    @api.response(404, 'Time log or screenshot not found')
+    def get(self, time_log_id: int) -> Any:
+        """Download a time log's screenshot from the configured storage backend"""
+        claims = get_jwt()
+        time_log = _load_time_log_or_404(time_log_id)
+        if claims.get('role') == 'employee' and time_log.employee_id != claims.get('id'):
+            abort(403, 'Not authorized to view this screenshot')
+        if claims.get('role') == 'employer':
+            project = load_entity(Project, time_log.project_id)
+            if project is None or project.employer_id != claims.get('id'):
+                abort(403, 'Not authorized to view this screenshot')
+        if time_log.screenshot_status != 'uploaded' or not time_log.file_path:
+            abort(404, 'Screenshot not available')
+        container_name = os.environ.get('SCREENSHOT_STORAGE_CONTAINER', 'screenshots')
+        try:
+            return current_app.extensions['blob_storage'].send_blob(container_name, time_log.file_path)
+        except FileNotFoundError:
+            abort(404, 'Screenshot not found in storage')
+
+
+@api.route('/<int:time_log_id>/similar')
+@api.param('time_log_id', 'The time log identifier')
+class TimeLogSimilarScreenshots(Resource):
+    @api.marshal_with(similar_screenshots_model)
+    @api.doc(params={'max_distance': f'Maximum Hamming distance (default {SIMILAR_SCREENSHOT_DEFAULT_DISTANCE}, '
+                                     f'max {SIMILAR_SCREENSHOT_MAX_DISTANCE})'})
+    @role_required(['admin', 'employer', 'employee'])
+    @api.response(403, 'Not authorized')
+    @api.response(404, 'Time log not found')
+    def get(self, time_log_id: int) -> Dict[str, Any]:
+        """Screenshots of the same employee and day that look like this time log's, nearest first"""
+        claims = get_jwt()
+        time_log = _load_time_log_or_404(time_log_id)
+        if claims.get('role') == 'employee' and time_log.employee_id != claims.get('id'):
+            abort(403, 'Not authorized to view this screenshot')
+        project_ids = _employer_project_ids() if claims.get('role') == 'employer' else None
+        if project_ids is not None and time_log.project_id not in project_ids:
+            abort(403, 'Not authorized to view this screenshot')
+        max_distance = _max_distance_arg()
+        matches = current_app.extensions['similarity_index'].similar(time_log, max_distance)
+        return {
+            'time_log_id': time_log.id,
+            'perceptual_hash': hash_hex(time_log.perceptual_hash),
+            'max_distance': max_distance,
+            'matches': [_similar_screenshot(item, distance) for distance, item in matches
+                        if project_ids is None or item[1] in project_ids]
+        }
+
+
+@api.route('/similar-groups')
+class TimeLogSimilarGroups(Resource):
+    @api.marshal_with(similar_groups_model)
+    @api.doc(params={
+        'employee_id': 'Employee ID (defaults to the calling employee)',
+        'date': 'Day as an ISO date',
+        'max_distance': f'Maximum Hamming distance (default {SIMILAR_SCREENSHOT_DEFAULT_DISTANCE}, '
+                        f'max {SIMILAR_SCREENSHOT_MAX_DISTANCE})'
+    })
+    @role_required(['admin', 'employer', 'employee'])
+    @api.response(400, 'Invalid arguments')
+    @api.response(403, 'Not authorized')
+    def get(self) -> Dict[str, Any]:
+        """Group an employee's screenshots of one day into runs of near-identical ones"""
+        claims = get_jwt()
+        employee_id = request.args.get('employee_id', type=int)
+        if claims.get('role') == 'employee':
+            if employee_id is not None and employee_id != claims.get('id'):
+                abort(403, "Not authorized to view another employee's screenshots")
+            employee_id = claims.get('id')
+        if employee_id is None:
+            abort(400, 'employee_id is required')
+        day = _parse_date_arg('date')
+        if day is None:
+            abort(400, 'date is required')
+        max_distance = _max_distance_arg()
+        project_ids = _employer_project_ids() if claims.get('role') == 'employer' else None
+        groups = current_app.extensions['similarity_index'].groups(employee_id, day.date(), max_distance)
+        if project_ids is not None:
+            groups = [[(distance, item) for distance, item in group if item[1] in project_ids] for group in groups]
+        return {
+            'employee_id': employee_id,
+            'date': day.date().isoformat(),
+            'max_distance': max_distance,
+            'groups': [[_similar_screenshot(item, distance) for distance, item in group] for group in groups if group]
+        }
+
+
+@api.route('/storage-stats')
+class TimeLogStorageStats(Resource):
+    @role_required('admin')
+    @api.response(200, 'Success')
+    @api.response(403, 'Not authorized')
+    def get(self) -> Dict[str, Any]:
+        """Screenshot storage counters of this worker: upload latency, container checks, connections opened, deduplicated uploads, read URLs"""
+        storage = current_app.extensions.get('blob_storage')
+        uploader = current_app.extensions.get('screenshot_uploader')
+        read_urls = current_app.extensions.get('read_urls')
+        return {
+            'storage': storage.stats() if storage else None,
+            'pending_uploads': uploader.pending if uploader else None,
+            'deduplicated_uploads': uploader.deduplicated if uploader else None,
+            'read_urls': read_urls.stats() if read_urls else None
+        }
@@ -0,0 +1,120 @@
+from typing import Collection, Dict, Optional, Set, Tuple
+from sqlalchemy import delete, select, true
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import db
+from api.models.base import project_employee, task_employee
+from api.models.employee import Employee
+from api.models.project import Project
+from api.models.task import Task
+from api.service.change_versions import mark_changed
+
+
+class AssignmentError(Exception):
+    """Raised when an assignment names employees, projects or tasks that do not exist (or are not the employer's)"""
+
+
+def assign(employee_ids: Collection[int], project_ids: Collection[int] = (), task_ids: Collection[int] = (),
+           employer_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Assign every employee to every project with all of its tasks, and to every task with its
+    project (caller commits).
+
+    Each association table gets one INSERT ... SELECT ... ON CONFLICT DO NOTHING over the
+    employee x project (or task) cross join, so existing assignments are left alone and no relationship
+    collection is loaded.
+
+    Args:
+        employer_id: When set, every project and task must belong to this employer
+
+    Returns:
+        The number of new project and task assignments, and the number of tasks covered
+
+    Raises:
+        AssignmentError: If an id does not exist or belongs to another employer
+    """
+    employees, projects, tasks = _resolve(employee_ids, project_ids, task_ids, employer_id)
+    insert = postgresql_insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+    project_rows = task_rows = 0
+    if employees and projects:
+        project_rows = db.session.execute(
+            insert(project_employee).from_select(
+                ['project_id', 'employee_id'],
+                select(Project.id, Employee.id).join(Employee, true()).where(Project.id.in_(projects), Employee.id.in_(employees))
+            ).on_conflict_do_nothing()
+        ).rowcount
+    if employees and tasks:
+        task_rows = db.session.execute(
+            insert(task_employee).from_select(
+                ['task_id', 'employee_id'],
+                select(Task.id, Employee.id).join(Employee, true()).where(Task.id.in_(tasks), Employee.id.in_(employees))
+            ).on_conflict_do_nothing()
+        ).rowcount
+    mark_changed(db.session, employers=set(projects.values()), projects=projects, tasks=tasks, employees=employees)
+    return {'project_assignments': project_rows, 'task_assignments': task_rows, 'tasks': len(tasks)}
+
+
+def unassign(employee_ids: Collection[int], project_ids: Collection[int] = (), task_ids: Collection[int] = (),
+             employer_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Remove every employee from every project with all of its tasks, and from every task
+    (caller commits). Removing a task keeps the project assignment.
+
+    Each association table gets one DELETE over the employee x project (or task) pairs.
+
+    Returns:
+        The number of project and task assignments removed
+
+    Raises:
+        AssignmentError: If an id does not exist or belongs to another employer
+    """
+    employees, projects, tasks = _resolve(employee_ids, project_ids, task_ids, employer_id)
+    project_rows = task_rows = 0
+    if employees and project_ids:
+        project_rows = db.session.execute(
+            delete(project_employee).where(project_employee.c.project_id.in_(set(project_ids)),
+                                           project_employee.c.employee_id.in_(employees))
+        ).rowcount
+    if employees and tasks:
+        task_rows = db.session.execute(
+            delete(task_employee).where(task_employee.c.task_id.in_(tasks),
+                                        task_employee.c.employee_id.in_(employees))
+        ).rowcount
+    mark_changed(db.session, employers=set(projects.values()), projects=projects, tasks=tasks, employees=employees)
+    return {'project_assignments': project_rows, 'task_assignments': task_rows}
+
+
+def _resolve(employee_ids: Collection[int], project_ids: Collection[int], task_ids: Collection[int],
+             employer_id: Optional[int]) -> Tuple[Set[int], Dict[int, int], Dict[int, int]]:
+    """
+    Employee ids, {project id: employer id} and {task id: project id} of an assignment, with one
+    query per table. The tasks include every task of the projects, the projects every task's project.
+    """
+    project_ids, task_ids = set(project_ids), set(task_ids)
+    employees = set(db.session.execute(select(Employee.id).where(Employee.id.in_(set(employee_ids)))).scalars())
+    _check_missing('employees', employee_ids, employees)
+    tasks: Dict[int, int] = {}
+    if project_ids or task_ids:
+        rows = db.session.execute(
+            select(Task.id, Task.project_id).where(Task.project_id.in_(project_ids) | Task.id.in_(task_ids))
+        ).all()
+        tasks = {row.id: row.project_id for row in rows}
+        _check_missing('tasks', task_ids, set(tasks))
+    projects: Dict[int, int] = {}
+    if project_ids or tasks:
+        projects = dict(db.session.execute(
+            select(Project.id, Project.employer_id).where(Project.id.in_(project_ids | set(tasks.values())))
+        ).all())
+        _check_missing('projects', project_ids, set(projects))
+    if employer_id is not None:
+        _check_missing('projects', project_ids, {id_ for id_, owner in projects.items() if owner == employer_id})
+        _check_missing('tasks', task_ids, {id_ for id_, project_id in tasks.items()
+                                           if projects.get(project_id) == employer_id})
+    return employees, projects, tasks
+
+
+def _check_missing(kind: str, requested: Collection[int], found: Set[int]) -> None:
+    missing = sorted(set(requested) - found)
+    if missing:
+        shown = ', '.join(str(id_) for id_ in missing[:20])
+        raise AssignmentError(f"Unknown {kind}: {shown}{' ...' if len(missing) > 20 else ''}")
@@ -1,14 +1,16 @@
-import os
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from typing import BinaryIO, Optional, Union
+from flask import current_app
+from storage import BlobStorage
 
 class AzureBlobStorage:
-    def __init__(self):
-        connection_string = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
-        self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    """Blob upload helper backed by the app's configured storage backend (app.extensions['blob_storage'])"""
 
-    def upload_file(self, container_name: str, blob_name: str, file_data: bytes, content_type: str = None) -> str:
+    def __init__(self, storage: Optional[BlobStorage] = None):
+        self.storage: BlobStorage = storage or current_app.extensions['blob_storage']
+
+    def upload_file(self, container_name: str, blob_name: str, file_data: Union[bytes, BinaryIO], content_type: str = None) -> str:
         """
-        Uploads a file to Azure Blob Storage.
+        Uploads a file to blob storage (Azure or the local filesystem backend).
         Args:
             container_name (str): The name of the blob container.
             blob_name (str): The name of the blob (filename in storage).
@@ -17,17 +19,8 @@ class AzureBlobStorage:
         Returns:
             str: The URL of the uploaded blob.
         """
-        container_client = self.blob_service_client.get_container_client(container_name)
-        if not container_client.exists():
-            container_client.create_container()
-        blob_client = container_client.get_blob_client(blob_name)
-        content_settings = ContentSettings(content_type=content_type) if content_type else None
-        blob_client.upload_blob(file_data, overwrite=True, content_settings=content_settings)
-        blob_url = blob_client.url
-        return blob_url
+        return self.storage.upload_file(container_name, blob_name, file_data, content_type)
 
     def delete_file(self, container_name: str, blob_name: str):
-        """Deletes a file from Azure Blob Storage."""
-        container_client = self.blob_service_client.get_container_client(container_name)
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.delete_blob()
+        """Deletes a file from blob storage."""
+        self.storage.delete_file(container_name, blob_name)
@@ -0,0 +1,114 @@
+import csv
+import io
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import insert, update
+from database import db
+from api.models.employee import Employee
+from api.service.email.email_service import EmailService
+from constants import ACTIVATION_TOKEN_EXPIRY_HOURS
+
+# Emails per IN (...) lookup of existing employees
+LOOKUP_CHUNK_SIZE = 1000
+
+INVITE_STATUSES = ('invited', 'reinvited', 'already_registered', 'duplicate', 'invalid')
+
+
+class InviteImportError(Exception):
+    """Raised when an invite list cannot be read at all (as opposed to individual invalid rows)"""
+
+
+def parse_invite_csv(text: str) -> List[Dict[str, Any]]:
+    """
+    Rows of a CSV with an email column and an optional name column (headers are case-insensitive).
+
+    Raises:
+        InviteImportError: If there is no email column
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {(column or '').strip().lower(): column for column in reader.fieldnames or []}
+    if 'email' not in columns:
+        raise InviteImportError("CSV must have an 'email' column")
+    return [{'email': row.get(columns['email']), 'name': row.get(columns['name']) if 'name' in columns else None}
+            for row in reader]
+
+
+def invite_employees(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Invite many people at once (caller commits).
+
+    Existing employees are found with one IN lookup per LOOKUP_CHUNK_SIZE emails. New people are
+    added as pending employees with their activation token in one multi-row insert, pending
+    employees get a fresh token in one bulk update, and their activation emails are queued in the
+    outbox with one insert. Returns a summary and a result per row (1-based, in input order).
+    """
+    results: List[Dict[str, Any]] = []
+    first_row: Dict[str, int] = {}
+    invites: List[Tuple[int, str, str]] = []
+    for number, row in enumerate(rows, start=1):
+        email, name, error = _clean_row(row)
+        if error:
+            results.append({'row': number, 'email': email or None, 'status': 'invalid', 'message': error})
+        elif email in first_row:
+            results.append({'row': number, 'email': email, 'status': 'duplicate',
+                            'message': f'Same email as row {first_row[email]}'})
+        else:
+            first_row[email] = number
+            results.append({'row': number, 'email': email, 'status': None})
+            invites.append((number, email, name))
+
+    existing: Dict[str, Tuple[int, bool]] = {}
+    emails = [email for _, email, _ in invites]
+    for start in range(0, len(emails), LOOKUP_CHUNK_SIZE):
+        found = db.session.query(Employee.id, Employee.email, Employee.is_active) \
+            .filter(Employee.email.in_(emails[start:start + LOOKUP_CHUNK_SIZE]))
+        existing.update({row.email: (row.id, bool(row.is_active)) for row in found})
+
+    now = datetime.utcnow()
+    expiry = now + timedelta(hours=ACTIVATION_TOKEN_EXPIRY_HOURS)
+    new_employees: List[Dict[str, Any]] = []
+    refreshed: List[Dict[str, Any]] = []
+    activation_emails: List[Tuple[str, str]] = []
+    base_url = os.getenv('BASE_APP_DOMAIN_URL')
+    for number, email, name in invites:
+        result = results[number - 1]
+        if email in existing and existing[email][1]:
+            result.update(status='already_registered', message='Employee already registered')
+            continue
+        token = str(uuid.uuid4())
+        if email in existing:
+            refreshed.append({'id': existing[email][0], 'activation_token': token, 'activation_token_expiry': expiry})
+            result['status'] = 'reinvited'
+        else:
+            new_employees.append({'name': name, 'email': email, 'is_active': False, 'activation_token': token,
+                                  'activation_token_expiry': expiry, 'created_at': now, 'updated_at': now})
+            result['status'] = 'invited'
+        activation_emails.append((email, f"{base_url}/activate/{token}"))
+
+    if new_employees:
+        db.session.execute(insert(Employee), new_employees)
+    if refreshed:
+        db.session.execute(update(Employee), refreshed)
+    EmailService().send_activation_emails(activation_emails)
+
+    summary = {status: 0 for status in INVITE_STATUSES}
+    for result in results:
+        summary[result['status']] += 1
+    return {'summary': summary, 'expires_at': expiry.isoformat(), 'results': results}
+
+
+def _clean_row(row: Any) -> Tuple[str, str, str]:
+    """(email, name, error) of one input row, normalized like the single invite endpoint"""
+    if not isinstance(row, dict):
+        return '', '', 'Row must be an object with email and name'
+    email = str(row.get('email') or '').strip().lower()
+    name = str(row.get('name') or '').strip()
+    if not email or '@' not in email or ' ' in email:
+        return email, name, 'A valid email is required'
+    if len(email) > Employee.email.type.length:
+        return email, name, f'Email is longer than {Employee.email.type.length} characters'
+    if len(name) > Employee.name.type.length:
+        return email, name, f'Name is longer than {Employee.name.type.length} characters'
+    return email, name, ''
@@ -0,0 +1,203 @@
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from api.models.employee import Employee
+from api.models.employer import Employer
+from api.models.project import Project
+from api.models.task import Task
+from api.models.time_log import TimeLog
+
+# session.info key holding the scopes ('employer:1', 'project:7', ...) that change when the transaction commits
+PENDING_SCOPES_KEY = 'change_versions_scopes'
+
+# Seconds the time of a scope's last bump is kept in Redis (changed_within only looks back a few seconds)
+BUMP_TIME_SECONDS = 3600
+
+
+class MemoryVersionStore:
+    """Version counters of this worker only; writes handled by other workers are not seen"""
+
+    shared = False
+
+    def __init__(self):
+        # Distinguishes this worker's counters from another worker's (or a previous run's) equal numbers
+        self.instance = uuid.uuid4().hex[:12]
+        self._versions: Dict[str, int] = {}
+        self._bumped_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, scopes: List[str]) -> List[int]:
+        return [self._versions.get(scope, 0) for scope in scopes]
+
+    def bumped_at_many(self, scopes: List[str]) -> List[Optional[float]]:
+        return [self._bumped_at.get(scope) for scope in scopes]
+
+    def bump_many(self, scopes: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+                self._bumped_at[scope] = now
+
+
+class RedisVersionStore:
+    """Version counters shared by all workers, stored in Redis (requires the optional 'redis' package)"""
+
+    shared = True
+    instance = 'shared'
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("REDIS_URL requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+
+    def get_many(self, scopes: List[str]) -> List[int]:
+        if not scopes:
+            return []
+        return [int(value or 0) for value in self.client.mget([f'version:{scope}' for scope in scopes])]
+
+    def bumped_at_many(self, scopes: List[str]) -> List[Optional[float]]:
+        if not scopes:
+            return []
+        return [float(value) if value else None for value in self.client.mget([f'bumped_at:{scope}' for scope in scopes])]
+
+    def bump_many(self, scopes: Iterable[str]) -> None:
+        now = time.time()
+        pipeline = self.client.pipeline(transaction=False)
+        for scope in scopes:
+            pipeline.incr(f'version:{scope}')
+            pipeline.set(f'bumped_at:{scope}', now, ex=BUMP_TIME_SECONDS)
+        pipeline.execute()
+
+
+class ChangeVersions:
+    """
+    Version counters per employer, project, task and employee, bumped after every commit that
+    touches their rows or assignments. Caches and ETags are derived from them, so checking
+    freshness never has to query the data itself.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.store = None
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        redis_url = app.config.get('REDIS_URL')
+        self.store = RedisVersionStore(redis_url) if redis_url else MemoryVersionStore()
+        app.extensions['change_versions'] = self
+        _register_session_events()
+
+    @property
+    def instance(self) -> str:
+        return self.store.instance
+
+    def get(self, scope: str) -> int:
+        return self.store.get_many([scope])[0]
+
+    def get_many(self, scopes: List[str]) -> List[int]:
+        return self.store.get_many(scopes)
+
+    def changed_within(self, scopes: List[str], seconds: float) -> bool:
+        """Whether any of the scopes was bumped in the last seconds"""
+        since = time.time() - seconds
+        return any(bumped_at is not None and bumped_at > since for bumped_at in self.store.bumped_at_many(scopes))
+
+    def bump(self, scopes: Set[str]) -> None:
+        self.store.bump_many(scopes)
+        for listener in self._listeners:
+            listener(scopes)
+
+    def subscribe(self, listener: Callable[[Set[str]], None]) -> None:
+        """Call listener with the bumped scopes after every bump"""
+        self._listeners.append(listener)
+
+
+def mark_changed(session: Session, employers: Iterable[Optional[int]] = (), projects: Iterable[Optional[int]] = (),
+                 tasks: Iterable[Optional[int]] = (), employees: Iterable[Optional[int]] = ()) -> None:
+    """Bump these scopes when the session commits (for writes made with Core statements)"""
+    pending = session.info.setdefault(PENDING_SCOPES_KEY, set())
+    for kind, ids in (('employer', employers), ('project', projects), ('task', tasks), ('employee', employees)):
+        pending.update(f'{kind}:{id_}' for id_ in ids if id_ is not None)
+
+
+_session_events_registered = False
+
+
+def _register_session_events() -> None:
+    global _session_events_registered
+    if _session_events_registered:
+        return
+    event.listen(Session, 'after_flush', _collect_changes)
+    event.listen(Session, 'after_commit', _bump_changes)
+    event.listen(Session, 'after_rollback', _discard_changes)
+    _session_events_registered = True
+
+
+def _collect_changes(session: Session, flush_context: Any) -> None:
+    """Work out which employers, projects, tasks and employees the flushed rows and assignments belong to"""
+    employer_ids: Set[int] = set()
+    project_ids: Set[int] = set()
+    task_ids: Set[int] = set()
+    employee_ids: Set[int] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Employer):
+            employer_ids.add(obj.id)
+        elif isinstance(obj, Project):
+            employer_ids.update(_attribute_values(obj, 'employer_id'))
+            project_ids.add(obj.id)
+            employee_ids.update(employee.id for employee in _relationship_changes(obj, 'employees'))
+        elif isinstance(obj, Task):
+            project_ids.update(_attribute_values(obj, 'project_id'))
+            task_ids.add(obj.id)
+            employee_ids.update(employee.id for employee in _relationship_changes(obj, 'employees'))
+        elif isinstance(obj, TimeLog):
+            project_ids.update(_attribute_values(obj, 'project_id'))
+            task_ids.update(_attribute_values(obj, 'task_id'))
+            employee_ids.update(_attribute_values(obj, 'employee_id'))
+        elif isinstance(obj, Employee):
+            # Assignment changes made from the employee side
+            employee_ids.add(obj.id)
+            project_ids.update(project.id for project in _relationship_changes(obj, 'projects'))
+            for task in _relationship_changes(obj, 'tasks'):
+                task_ids.add(task.id)
+                project_ids.add(task.project_id)
+    project_ids.discard(None)
+    if project_ids:
+        employer_ids.update(session.connection().execute(
+            select(Project.employer_id).where(Project.id.in_(project_ids))
+        ).scalars())
+    mark_changed(session, employer_ids, project_ids, task_ids, employee_ids)
+
+
+def _bump_changes(session: Session) -> None:
+    scopes = session.info.pop(PENDING_SCOPES_KEY, None)
+    if not scopes:
+        return
+    versions: Optional[ChangeVersions] = current_app.extensions.get('change_versions') if has_app_context() else None
+    if versions is not None:
+        versions.bump(scopes)
+
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop(PENDING_SCOPES_KEY, None)
+
+
+def _attribute_values(obj: Any, name: str) -> Set[Any]:
+    """Current and previous values of a column attribute, so moving a row bumps both owners"""
+    history = inspect(obj).attrs[name].history
+    values = set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+    values.discard(None)
+    return values
+
+
+def _relationship_changes(obj: Any, name: str) -> Iterable[Any]:
+    history = inspect(obj).attrs[name].history
+    return list(history.added or ()) + list(history.deleted or ())
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from flask import Flask, current_app, request
+from flask_jwt_extended import get_jwt
+from api.service.read_replica import read_fresh
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def drop_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Cache shared by all workers, stored in Redis (requires the optional 'redis' package)"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("DASHBOARD_CACHE_BACKEND='redis' requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(f'dashboard:{key}')
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.client.set(f'dashboard:{key}', json.dumps(value, default=str), px=int(ttl * 1000))
+
+    def drop_prefix(self, prefix: str) -> None:
+        # Entries under a superseded version are unreachable and expire with their TTL
+        pass
+
+    def size(self) -> int:
+        return -1
+
+
+class DashboardCache:
+    """
+    Response cache for the employer dashboard endpoints.
+
+    Entries are keyed by employer, endpoint and query string, under the employer's change version
+    (see api/service/change_versions.py), so stale entries are never served after a write. Without
+    REDIS_URL versions are per worker, and the TTL bounds staleness from writes other workers handled.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.backend = None
+        self.versions = None
+        self.ttl: float = 30
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        backend = app.config['DASHBOARD_CACHE_BACKEND']
+        self.versions = app.extensions['change_versions']
+        if backend == 'redis':
+            if not app.config.get('REDIS_URL'):
+                raise RuntimeError("DASHBOARD_CACHE_BACKEND='redis' requires REDIS_URL")
+            self.backend = RedisCacheBackend(app.config['REDIS_URL'])
+        elif backend == 'memory':
+            self.backend = MemoryCacheBackend(app.config['DASHBOARD_CACHE_MAX_ENTRIES'])
+        else:
+            self.backend = None
+        self.ttl = app.config['DASHBOARD_CACHE_TTL_SECONDS']
+        app.extensions['dashboard_cache'] = self
+        self.versions.subscribe(self._invalidate)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, employer_id: int, endpoint: str, params: str) -> str:
+        """
+        Cache key under the employer's current version. Take it before computing a response, so a
+        write committed meanwhile leaves the result stored under the superseded version.
+        """
+        scope = f'employer:{employer_id}'
+        return f'{scope}:{self.versions.instance}:{self.versions.get(scope)}:{endpoint}?{params}'
+
+    def get(self, key: str, endpoint: str) -> Optional[Any]:
+        value = self.backend.get(key)
+        self._count(endpoint, 'hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.backend.set(key, value, ttl or self.ttl)
+
+    def _invalidate(self, scopes: Set[str]) -> None:
+        """Drop the entries of employers whose version was bumped"""
+        if not self.enabled:
+            return
+        for scope in scopes:
+            if scope.startswith('employer:'):
+                self.backend.drop_prefix(f'{scope}:')
+                self._count('_all', 'invalidations')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            endpoints = {endpoint: dict(counters) for endpoint, counters in self._stats.items() if endpoint != '_all'}
+            invalidations = self._stats.get('_all', {}).get('invalidations', 0)
+        hits = sum(counters.get('hits', 0) for counters in endpoints.values())
+        misses = sum(counters.get('misses', 0) for counters in endpoints.values())
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'ttl_seconds': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'invalidations': invalidations,
+            'evictions': self.backend.evictions if self.backend else 0,
+            'entries': self.backend.size() if self.backend else 0,
+            'endpoints': endpoints
+        }
+
+    def _count(self, endpoint: str, counter: str) -> None:
+        with self._stats_lock:
+            counters = self._stats.setdefault(endpoint, {})
+            counters[counter] = counters.get(counter, 0) + 1
+
+
+def dashboard_cached(endpoint: str, ttl: Optional[float] = None) -> Callable:
+    """
+    Cache a successful employer dashboard response per employer and query string. A miss right after
+    a write to the employer reads from the primary, so the replica's older rows are not cached as current.
+    Apply below the auth decorators and above marshal_with, so the cached value is the serialized response.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            cache: Optional[DashboardCache] = current_app.extensions.get('dashboard_cache')
+            claims = get_jwt()
+            if cache is None or not cache.enabled or claims.get('role') != 'employer':
+                return fn(*args, **kwargs)
+            path_params = '&'.join(f'{name}={value}' for name, value in sorted(kwargs.items()))
+            params = '&'.join(filter(None, [path_params, '&'.join(
+                f'{name}={value}' for name, value in sorted(request.args.items(multi=True))
+            )]))
+            key = cache.key(claims['id'], endpoint, params)
+            cached = cache.get(key, endpoint)
+            if cached is not None:
+                return cached, 200, {'X-Cache': 'HIT'}
+            read_fresh([f"employer:{claims['id']}"])
+            response = fn(*args, **kwargs)
+            body, status = (response[0], response[1]) if isinstance(response, tuple) else (response, 200)
+            if status == 200:
+                cache.set(key, body, ttl)
+            return body, status, {'X-Cache': 'MISS'}
+        return wrapper
+    return decorator
@@ -0,0 +1,54 @@
+from typing import Optional, Tuple
+from flask import Flask
+from database import db
+from api.models.employee import Employee
+from api.service.dashboard_cache import MemoryCacheBackend
+
+# (device_generation, latest_mac_address) of an employee
+DeviceBinding = Tuple[int, str]
+
+
+class DeviceBindingCache:
+    """
+    Short-lived in-process cache of each employee's device binding, so check_mac_address can verify
+    the JWT's device without a database round trip. Logins handled by this worker update it
+    immediately; a login handled by another worker is seen once the token carrying its newer
+    device_generation arrives here, or when the entry expires (DEVICE_BINDING_CACHE_TTL_SECONDS).
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.backend: Optional[MemoryCacheBackend] = None
+        self.ttl: float = 30
+        self.hits = 0
+        self.misses = 0
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.ttl = app.config['DEVICE_BINDING_CACHE_TTL_SECONDS']
+        self.backend = MemoryCacheBackend(app.config['DEVICE_BINDING_CACHE_MAX_ENTRIES'])
+        app.extensions['device_bindings'] = self
+
+    def get(self, employee_id: int, min_generation: int = 0) -> Optional[DeviceBinding]:
+        """
+        Return the employee's current binding, loading it from the database when it is not cached,
+        expired, or older than min_generation (the generation of the token being checked)
+        """
+        binding: Optional[DeviceBinding] = self.backend.get(str(employee_id)) if self.ttl else None
+        if binding is not None and binding[0] >= min_generation:
+            self.hits += 1
+            return binding
+        self.misses += 1
+        row = db.session.query(Employee.device_generation, Employee.latest_mac_address).filter(
+            Employee.id == employee_id
+        ).first()
+        if row is None or not row.latest_mac_address:
+            return None
+        binding = (row.device_generation or 0, row.latest_mac_address)
+        self.remember(employee_id, *binding)
+        return binding
+
+    def remember(self, employee_id: int, generation: int, mac_address: str) -> None:
+        """Store the binding written by a login (call after the commit)"""
+        if self.ttl:
+            self.backend.set(str(employee_id), (generation, mac_address), self.ttl)
@@ -0,0 +1,154 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy.exc import IntegrityError
+from database import db
+from api.models.screenshot_upload_claim import ScreenshotUploadClaim
+from constants import SCREENSHOT_STORAGE_CONTAINER
+
+# itsdangerous salt of the upload tokens handed to agents between the two phases
+UPLOAD_TOKEN_SALT = 'screenshot-direct-upload'
+# Prefix of the server-owned copies of claimed uploads (no upload URL is ever issued for these names)
+CLAIMED_BLOB_PREFIX = 'claimed/'
+
+
+class DirectUploadError(Exception):
+    """Raised when a direct upload cannot be attached to a time log"""
+
+
+class UploadAlreadyClaimedError(DirectUploadError):
+    """Raised when an upload_token has already been attached to a time log"""
+
+
+class DirectUpload:
+    """
+    A screenshot the agent has uploaded straight to blob storage, copied to a server-owned blob,
+    checked and ready to attach. source_blob_name is the agent-writable upload, deleted after the commit.
+    """
+
+    def __init__(self, container_name: str, blob_name: str, size: int, image_url: str, source_blob_name: str):
+        self.container_name = container_name
+        self.blob_name = blob_name
+        self.size = size
+        self.image_url = image_url
+        self.source_blob_name = source_blob_name
+
+
+def issue_upload(employee_id: int, content_type: str, size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Phase one: choose a blob name and return a short-lived write URL for it, plus the
+    upload_token the agent sends back with the time log once the PUT has succeeded.
+
+    Raises:
+        DirectUploadError: If the declared size exceeds SCREENSHOT_MAX_BYTES
+    """
+    max_bytes = current_app.config['SCREENSHOT_MAX_BYTES']
+    if size is not None and (size <= 0 or size > max_bytes):
+        raise DirectUploadError(f'size must be between 1 and {max_bytes} bytes')
+    expires_in = current_app.config['SCREENSHOT_UPLOAD_URL_TTL_SECONDS']
+    container_name = _container_name()
+    blob_name = str(uuid.uuid4())
+    upload = current_app.extensions['blob_storage'].create_upload_url(
+        container_name, blob_name, expires_in, content_type=content_type, max_bytes=max_bytes
+    )
+    token = _serializer().dumps({'employee_id': employee_id, 'blob_name': blob_name, 'size': size})
+    return {
+        **upload,
+        'blob_name': blob_name,
+        'upload_token': token,
+        'max_bytes': max_bytes,
+        'expires_at': (datetime.utcnow() + timedelta(seconds=expires_in)).isoformat() + 'Z'
+    }
+
+
+def claim_upload(employee_id: int, upload_token: str) -> DirectUpload:
+    """
+    Phase two: check that the token was issued to this employee, then copy the uploaded blob to a
+    server-owned name (CLAIMED_BLOB_PREFIX) and check the copy's size (the declared size, when one
+    was given at phase one). The upload URL stays writable until it expires, so only the copy is
+    attached: writes after the claim cannot replace what was checked. Oversized uploads are deleted.
+    The claim is recorded in the caller's transaction, so each token attaches its blob to one time
+    log only; otherwise deleting one of several logs sharing the blob would delete it under the others.
+    After the commit the caller deletes the upload (release_source), or the copy on rollback (discard).
+
+    Raises:
+        UploadAlreadyClaimedError: If the token was already used for a time log
+        DirectUploadError: If the token is invalid or expired, or the blob is missing or the wrong size
+    """
+    # Agents commit after uploading, so the token lives a little longer than the write URL
+    max_age = current_app.config['SCREENSHOT_UPLOAD_URL_TTL_SECONDS'] * 2
+    try:
+        claims = _serializer().loads(upload_token, max_age=max_age)
+    except BadSignature as e:
+        raise DirectUploadError('Invalid or expired upload_token') from e
+    if claims.get('employee_id') != employee_id:
+        raise DirectUploadError('upload_token was issued to another employee')
+
+    source_blob_name = claims['blob_name']
+    if db.session.get(ScreenshotUploadClaim, source_blob_name) is not None:
+        raise UploadAlreadyClaimedError('upload_token has already been used')
+
+    storage = current_app.extensions['blob_storage']
+    container_name = _container_name()
+    max_bytes = current_app.config['SCREENSHOT_MAX_BYTES']
+    # Checked before copying too, so an oversized upload is never copied
+    _check_size(storage, container_name, source_blob_name, claims.get('size'), max_bytes)
+    blob_name = f'{CLAIMED_BLOB_PREFIX}{source_blob_name}'
+    try:
+        image_url = storage.copy_blob(container_name, source_blob_name, blob_name)
+    except FileNotFoundError as e:
+        raise DirectUploadError('Screenshot has not been uploaded') from e
+    try:
+        size = _check_size(storage, container_name, blob_name, claims.get('size'), max_bytes)
+        # A savepoint, so a concurrent claim of the same token fails here and not at the caller's commit
+        with db.session.begin_nested():
+            db.session.add(ScreenshotUploadClaim(blob_name=source_blob_name, employee_id=employee_id))
+    except (DirectUploadError, IntegrityError) as e:
+        _delete_quietly(storage, container_name, blob_name)
+        if isinstance(e, IntegrityError):
+            raise UploadAlreadyClaimedError('upload_token has already been used') from e
+        raise
+    return DirectUpload(container_name, blob_name, size, image_url, source_blob_name)
+
+
+def release_source(upload: DirectUpload) -> None:
+    """After the commit: delete the agent-writable upload, leaving only the claimed copy"""
+    _delete_quietly(current_app.extensions['blob_storage'], upload.container_name, upload.source_blob_name)
+
+
+def discard(upload: DirectUpload) -> None:
+    """After a rollback: delete the claimed copy; the upload stays claimable with the same token"""
+    _delete_quietly(current_app.extensions['blob_storage'], upload.container_name, upload.blob_name)
+
+
+def _check_size(storage: Any, container_name: str, blob_name: str, declared_size: Optional[int], max_bytes: int) -> int:
+    """Size of a blob after checking it, deleting it when it exceeds max_bytes"""
+    size = storage.blob_size(container_name, blob_name)
+    if size is None:
+        raise DirectUploadError('Screenshot has not been uploaded')
+    if size > max_bytes:
+        _delete_quietly(storage, container_name, blob_name)
+        raise DirectUploadError(f'Screenshot exceeds {max_bytes} bytes')
+    if size == 0 or (declared_size is not None and size != declared_size):
+        raise DirectUploadError(f"Uploaded screenshot is {size} bytes, expected {declared_size or 'at least 1'}")
+    return size
+
+
+def _delete_quietly(storage: Any, container_name: str, blob_name: str) -> None:
+    try:
+        storage.delete_file(container_name, blob_name)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        current_app.logger.warning(f'Could not delete uploaded screenshot {blob_name}: {e}')
+
+
+def _container_name() -> str:
+    return os.environ.get('SCREENSHOT_STORAGE_CONTAINER', SCREENSHOT_STORAGE_CONTAINER)
+
+
+def _serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.secret_key, salt=UPLOAD_TOKEN_SALT)
@@ -4,22 +4,47 @@ from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
 import os
-from typing import List
+from typing import List, Optional, Tuple
 from email.utils import make_msgid
 
+# SMTP connection security: STARTTLS on a plain connection, implicit TLS, or none (local SMTP sinks)
+SMTP_SECURITY_MODES = ('starttls', 'ssl', 'none')
+
+
 class EmailSender:
-    def __init__(self, smtp_server: str, smtp_port: int, smtp_user: str, smtp_password: str, use_tls: bool = True):        
+    def __init__(self, smtp_server: str, smtp_port: int, smtp_user: str, smtp_password: str, use_tls: bool = True,
+                 security: Optional[str] = None, timeout: float = 30):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.smtp_user = smtp_user
         self.smtp_password = smtp_password
         self.use_tls = use_tls
+        self.security = security or ('starttls' if use_tls else 'ssl')
+        if self.security not in SMTP_SECURITY_MODES:
+            raise ValueError(f"SMTP security must be one of {', '.join(SMTP_SECURITY_MODES)}, got {self.security!r}")
+        self.timeout = timeout
         self.attachment_filename = None
         self.attachment_filename_in_email = None
-        
-    def send_email(self, email_message: str, email_from: str, email_subject: str, email_to: List[str], email_cc: List[str] = None, email_bcc: List[str] = None, is_html: bool = False):
-        """Send the email with the given configuration."""
-        # Create a multipart email
+
+    def connect(self) -> smtplib.SMTP:
+        """Open an SMTP connection, secured and logged in; the caller may send many messages over it."""
+        if self.security == 'ssl':
+            server = smtplib.SMTP_SSL(self.smtp_server, int(self.smtp_port), timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.smtp_server, int(self.smtp_port), timeout=self.timeout)
+        try:
+            if self.security == 'starttls':
+                server.starttls()
+            if self.smtp_user and self.smtp_password:
+                server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def build_message(self, email_message: str, email_from: str, email_subject: str, email_to: List[str],
+                      email_cc: List[str] = None, email_bcc: List[str] = None, is_html: bool = False) -> Tuple[MIMEMultipart, List[str]]:
+        """Build the message and the list of all its recipients (To, Cc and Bcc)."""
         msg = MIMEMultipart()
         all_recipients = []
         msg['From'] = email_from
@@ -35,6 +60,11 @@ class EmailSender:
 
         # Add the message body
         msg.attach(MIMEText(email_message, 'plain' if not is_html else 'html'))
+        return msg, all_recipients
+
+    def send_email(self, email_message: str, email_from: str, email_subject: str, email_to: List[str], email_cc: List[str] = None, email_bcc: List[str] = None, is_html: bool = False):
+        """Send the email with the given configuration."""
+        msg, all_recipients = self.build_message(email_message, email_from, email_subject, email_to, email_cc, email_bcc, is_html)
 
         # Send the email via SMTP
         try:
@@ -52,20 +82,9 @@ class EmailSender:
                 os.remove(self.attachment_filename)
                 print(f"Attachment file '{self.attachment_filename}' deleted.")
             
-            # server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-            # server.login(smtp_user, smtp_password)
-            # server.sendmail(smtp_user, all_recipients, msg.as_string())
-            if self.use_tls:
-                with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                    server.starttls()  # Enable TLS if required
-                    server.login(self.smtp_user, self.smtp_password)
-                    server.sendmail(self.smtp_user, all_recipients, msg.as_string())
-            else:
-                with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port) as server:
-                    server.login(self.smtp_user, self.smtp_password)
-                    server.sendmail(self.smtp_user, all_recipients, msg.as_string())
-            
-                    
+            with self.connect() as server:
+                server.sendmail(self.smtp_user, all_recipients, msg.as_string())
+
             print("Email sent successfully! to {}".format(all_recipients))
         except Exception as e:
             print(f"Failed to send email: {str(e)}")
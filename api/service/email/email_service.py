@@ -1,17 +1,22 @@
-from email.message import Message
 import os
-from .email_sender import EmailSender
+from typing import Dict, List, Tuple
+from .outbox import enqueue_email, enqueue_emails
 
 class EmailService:
-    def __init__(self):
-        self.smtp_server = os.getenv('SMTP_SERVER')
-        self.smtp_port = os.getenv('SMTP_PORT')
-        self.smtp_user = os.getenv('SMTP_USER')
-        self.smtp_password = os.getenv('SMTP_PASSWORD')
-        self.use_tls = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
-        self.email_sender = EmailSender(self.smtp_server, self.smtp_port, self.smtp_user, self.smtp_password, self.use_tls)    
-        
+    """
+    Transactional emails. Messages are queued in the email outbox in the caller's session and sent
+    in the background once the caller commits, so requests never wait on SMTP.
+    """
+
     def send_activation_email(self, user_email, activation_url):
+        enqueue_email(email_to=[user_email], is_html=True, kind='activation', **self._activation_email(activation_url))
+
+    def send_activation_emails(self, invites: List[Tuple[str, str]]):
+        """Queue activation emails for many (user_email, activation_url) pairs in one insert"""
+        enqueue_emails([{'email_to': [user_email], 'is_html': True, 'kind': 'activation', **self._activation_email(activation_url)}
+                        for user_email, activation_url in invites])
+
+    def _activation_email(self, activation_url) -> Dict[str, str]:
         # Create the HTML part with a clickable link
         time_tracker_url = os.getenv('LOCAL_TIME_TRACKER_APP_LINK')
         html_body = f"""
@@ -26,12 +31,8 @@ class EmailService:
             <p>Thank you for joining us!</p>
         </body>
         </html>
-        """        
-        self.email_sender.send_email(email_message=html_body,
-                                     email_from=self.smtp_user,
-                                     email_subject="MercorInsightful: Activate your account",
-                                     email_to=[user_email],
-                                     is_html=True)
+        """
+        return {'subject': "MercorInsightful: Activate your account", 'body': html_body}
     
     def send_reset_pwd_email(self, user_email, reset_link):
         # Create the HTML part with a clickable link
@@ -46,9 +47,9 @@ class EmailService:
         </body>
         </html>
         """
-        self.email_sender.send_email(email_message=html_body,
-                                     email_from=self.smtp_user,
-                                     email_subject="MercorInsightful: Reset your password",
-                                     email_to=[user_email],
-                                     is_html=True)
+        enqueue_email(email_to=[user_email],
+                      subject="MercorInsightful: Reset your password",
+                      body=html_body,
+                      is_html=True,
+                      kind='password_reset')
        
\ No newline at end of file
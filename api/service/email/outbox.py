@@ -0,0 +1,273 @@
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+from database import db
+from api.models.outbox_email import OutboxEmail
+from api.service.email.email_sender import EmailSender
+
+# session.info flag: the session added outbox emails, wake the sender after it commits
+WAKE_KEY = 'email_outbox_wake'
+
+
+def enqueue_email(email_to: List[str], subject: str, body: str, is_html: bool = False, email_from: Optional[str] = None,
+                  email_cc: Optional[List[str]] = None, email_bcc: Optional[List[str]] = None,
+                  kind: Optional[str] = None) -> OutboxEmail:
+    """Add an email to the outbox (caller commits); it is sent in the background once committed."""
+    email = OutboxEmail(kind=kind, sender=email_from, recipients=list(email_to), cc=email_cc, bcc=email_bcc,
+                        subject=subject, body=body, is_html=is_html, status='pending', attempts=0,
+                        next_attempt_at=datetime.utcnow())
+    db.session.add(email)
+    db.session.info[WAKE_KEY] = True
+    return email
+
+
+def enqueue_emails(emails: List[Dict[str, Any]]) -> None:
+    """
+    Add many emails to the outbox with one multi-row INSERT (caller commits). Each item has
+    email_to, subject and body, and optionally is_html, email_from and kind.
+    """
+    if not emails:
+        return
+    now = datetime.utcnow()
+    db.session.execute(insert(OutboxEmail), [
+        {'kind': email.get('kind'), 'sender': email.get('email_from'), 'recipients': list(email['email_to']),
+         'subject': email['subject'], 'body': email['body'], 'is_html': email.get('is_html', False),
+         'status': 'pending', 'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+        for email in emails
+    ])
+    db.session.info[WAKE_KEY] = True
+
+
+class PermanentDeliveryError(Exception):
+    """The SMTP server rejected the message for good (5xx); it is not retried"""
+
+
+class EmailOutbox:
+    """
+    Background sender for the email outbox (app.extensions['email_outbox']).
+
+    A sender thread claims batches of due emails (rows locked with SKIP LOCKED, so several workers
+    can drain the same outbox), sends them over one long-lived SMTP connection that is reused across
+    batches and closed after SMTP_CONNECTION_IDLE_SECONDS without mail, and records each outcome.
+    Temporary failures are retried with exponential backoff up to EMAIL_OUTBOX_MAX_ATTEMPTS; 5xx
+    rejections fail at once. The thread is started when EMAIL_OUTBOX_ENABLED is set and an
+    SMTP_SERVER is configured; otherwise emails stay queued.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.app: Optional[Flask] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_used_at = 0.0
+        self._lock = threading.Lock()
+        self.counters = {'sent': 0, 'retried': 0, 'failed': 0, 'connections_opened': 0}
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.batch_size = app.config['EMAIL_OUTBOX_BATCH_SIZE']
+        self.poll_interval = app.config['EMAIL_OUTBOX_POLL_SECONDS']
+        self.max_attempts = app.config['EMAIL_OUTBOX_MAX_ATTEMPTS']
+        self.retry_backoff = app.config['EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS']
+        self.claim_timeout = app.config['EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS']
+        self.idle_timeout = app.config['SMTP_CONNECTION_IDLE_SECONDS']
+        self.default_sender = app.config.get('EMAIL_FROM') or app.config.get('SMTP_USER')
+        self.sender = EmailSender(app.config.get('SMTP_SERVER'), app.config['SMTP_PORT'], app.config.get('SMTP_USER'),
+                                  app.config.get('SMTP_PASSWORD'), security=app.config['SMTP_SECURITY'],
+                                  timeout=app.config['SMTP_TIMEOUT_SECONDS'])
+        app.extensions['email_outbox'] = self
+        _register_session_events()
+        if not app.config['EMAIL_OUTBOX_ENABLED']:
+            return
+        if not app.config.get('SMTP_SERVER'):
+            app.logger.warning("SMTP_SERVER is not set; outbox emails stay queued until it is")
+            return
+        self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """Send newly committed emails now instead of at the next poll"""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def drain(self) -> int:
+        """Send every due email, batch by batch; returns the number sent."""
+        sent = 0
+        while True:
+            batch = self._claim()
+            if not batch:
+                return sent
+            sent += self._send_batch(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                self.app.logger.error(f"Email outbox failed: {e}")
+            if self._smtp is not None and time.monotonic() - self._smtp_used_at > self.idle_timeout:
+                self._disconnect()
+            self._wake.wait(min(self.poll_interval, self.idle_timeout))
+            self._wake.clear()
+
+    def _claim(self) -> List[OutboxEmail]:
+        """Mark a batch of due emails 'sending' and return them (detached from the session)"""
+        now = datetime.utcnow()
+        with self.app.app_context():
+            try:
+                # Emails claimed by a sender that died mid-batch are sent again (at-least-once delivery)
+                db.session.execute(
+                    update(OutboxEmail)
+                    .where(OutboxEmail.status == 'sending', OutboxEmail.claimed_at < now - timedelta(seconds=self.claim_timeout))
+                    .values(status='pending')
+                    .execution_options(synchronize_session=False)
+                )
+                batch = OutboxEmail.query.filter(OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now) \
+                    .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id) \
+                    .limit(self.batch_size).with_for_update(skip_locked=True).all()
+                for email in batch:
+                    email.status = 'sending'
+                    email.claimed_at = now
+                    email.attempts += 1
+                # Detach before the commit would expire them; the sender only reads the claimed values
+                db.session.flush()
+                for email in batch:
+                    db.session.expunge(email)
+                db.session.commit()
+                return batch
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _send_batch(self, batch: List[OutboxEmail]) -> int:
+        outcomes: List[Tuple[OutboxEmail, Optional[Exception]]] = []
+        for email in batch:
+            try:
+                self._deliver(email)
+                outcomes.append((email, None))
+            except Exception as e:
+                outcomes.append((email, e))
+        now = datetime.utcnow()
+        sent_ids = [email.id for email, error in outcomes if error is None]
+        with self.app.app_context():
+            try:
+                if sent_ids:
+                    db.session.execute(
+                        update(OutboxEmail).where(OutboxEmail.id.in_(sent_ids))
+                        .values(status='sent', sent_at=now, last_error=None)
+                        .execution_options(synchronize_session=False)
+                    )
+                for email, error in outcomes:
+                    if error is not None:
+                        db.session.execute(
+                            update(OutboxEmail).where(OutboxEmail.id == email.id)
+                            .values(**self._failure_values(email, error, now))
+                            .execution_options(synchronize_session=False)
+                        )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        with self._lock:
+            self.counters['sent'] += len(sent_ids)
+        return len(sent_ids)
+
+    def _failure_values(self, email: OutboxEmail, error: Exception, now: datetime) -> Dict[str, Any]:
+        permanent = isinstance(error, PermanentDeliveryError)
+        if permanent or email.attempts >= self.max_attempts:
+            self.app.logger.error(f"Giving up on email {email.id} to {email.recipients} after {email.attempts} attempts: {error}")
+            with self._lock:
+                self.counters['failed'] += 1
+            return {'status': 'failed', 'last_error': str(error)}
+        self.app.logger.warning(f"Email {email.id} failed (attempt {email.attempts}): {error}")
+        with self._lock:
+            self.counters['retried'] += 1
+        delay = self.retry_backoff * (2 ** (email.attempts - 1))
+        return {'status': 'pending', 'last_error': str(error), 'next_attempt_at': now + timedelta(seconds=delay)}
+
+    def _deliver(self, email: OutboxEmail) -> None:
+        sender = email.sender or self.default_sender
+        message, recipients = self.sender.build_message(email.body, sender, email.subject, email.recipients,
+                                                        email.cc, email.bcc, email.is_html)
+        data = message.as_string()
+        for attempt in range(2):
+            reused = self._smtp is not None
+            server = self._connection()
+            try:
+                refused = server.sendmail(sender, recipients, data)
+            except smtplib.SMTPServerDisconnected:
+                # The server closed an idle connection; reconnect once
+                self._disconnect()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except smtplib.SMTPRecipientsRefused as e:
+                if all(code >= 500 for code, _ in e.recipients.values()):
+                    raise PermanentDeliveryError(f'All recipients refused: {e.recipients}') from e
+                raise
+            except smtplib.SMTPResponseException as e:
+                # sendmail has already reset the transaction, the connection carries the next message
+                if e.smtp_code >= 500:
+                    raise PermanentDeliveryError(f'{e.smtp_code} {e.smtp_error!r}') from e
+                raise
+            except Exception:
+                self._disconnect()
+                raise
+            self._smtp_used_at = time.monotonic()
+            if refused:
+                self.app.logger.warning(f"Email {email.id}: recipients refused: {refused}")
+            return
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            self._smtp = self.sender.connect()
+            with self._lock:
+                self.counters['connections_opened'] += 1
+        return self._smtp
+
+    def _disconnect(self) -> None:
+        server, self._smtp = self._smtp, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+_session_events_registered = False
+
+
+def _register_session_events() -> None:
+    global _session_events_registered
+    if _session_events_registered:
+        return
+    event.listen(Session, 'after_commit', _wake_after_commit)
+    event.listen(Session, 'after_rollback', _discard_wake)
+    _session_events_registered = True
+
+
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop(WAKE_KEY, False) and has_app_context():
+        outbox = current_app.extensions.get('email_outbox')
+        if outbox is not None:
+            outbox.wake()
+
+
+def _discard_wake(session: Session) -> None:
+    session.info.pop(WAKE_KEY, None)
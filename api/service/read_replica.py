@@ -0,0 +1,149 @@
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+from flask import Flask, current_app, g
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from database import db, READ_REPLICA_KEY, REPLICA_BIND_KEY, REPLICA_USED_KEY
+
+# Seconds the standby is behind the primary; 0 once it has replayed everything it received
+# (pg_last_xact_replay_timestamp alone keeps growing while the primary is idle)
+POSTGRES_LAG_SQL = '''
+SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+'''
+
+# SQLSTATE of a statement cancelled by statement_timeout: the query is slow, not the replica
+QUERY_CANCELED = '57014'
+
+# flask.g attribute set by read_fresh when the request's replica_reads must use the primary
+PRIMARY_READS_ATTR = 'primary_reads'
+
+
+class ReadReplica:
+    """
+    Health of the read replica bind (DB_REPLICA_URL), used by replica_reads (app.extensions['read_replica']).
+
+    The replica's lag is checked at most every DB_REPLICA_CHECK_SECONDS, by the first request that
+    needs it. While the lag exceeds DB_REPLICA_MAX_LAG_SECONDS reads go to the primary; after a
+    connection or query failure the replica is skipped for DB_REPLICA_RETRY_SECONDS. Requests whose
+    cache key or ETag carries a version bumped within stale_seconds read from the primary (read_fresh).
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.configured = False
+        self.lag_seconds: Optional[float] = None
+        self._healthy = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.counters = {'replica_requests': 0, 'primary_requests': 0, 'fresh_reads': 0, 'checks': 0, 'lagging': 0,
+                         'failures': 0}
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.configured = REPLICA_BIND_KEY in (app.config.get('SQLALCHEMY_BINDS') or {})
+        self.max_lag = app.config['DB_REPLICA_MAX_LAG_SECONDS']
+        self.check_interval = app.config['DB_REPLICA_CHECK_SECONDS']
+        self.retry_after = app.config['DB_REPLICA_RETRY_SECONDS']
+        app.extensions['read_replica'] = self
+
+    @property
+    def stale_seconds(self) -> float:
+        """How far behind the primary a replica still reported healthy may be: the lag bound plus the time to the next check"""
+        return self.max_lag + self.check_interval
+
+    def available(self) -> bool:
+        """Whether reads may use the replica now (checks its lag when the last check is too old)"""
+        if not self.configured:
+            return False
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return self._healthy
+            # Other requests keep the last verdict while this one checks
+            self._next_check = time.monotonic() + self.check_interval
+        return self._check()
+
+    def mark_failed(self, error: Exception) -> None:
+        """Send reads to the primary for DB_REPLICA_RETRY_SECONDS"""
+        current_app.logger.warning(f"Read replica failed, reading from the primary: {error}")
+        with self._lock:
+            self._healthy = False
+            self._next_check = time.monotonic() + self.retry_after
+            self.counters['failures'] += 1
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'configured': self.configured, 'healthy': self._healthy, 'lag_seconds': self.lag_seconds,
+                    'max_lag_seconds': self.max_lag if self.configured else None, **self.counters}
+
+    def _check(self) -> bool:
+        try:
+            engine = db.engines[REPLICA_BIND_KEY]
+            with engine.connect() as connection:
+                lag = float(connection.execute(text(POSTGRES_LAG_SQL)).scalar() or 0) \
+                    if engine.dialect.name == 'postgresql' else 0.0
+        except Exception as e:
+            self.mark_failed(e)
+            return False
+        with self._lock:
+            self.counters['checks'] += 1
+            self.lag_seconds = lag
+            self._healthy = lag <= self.max_lag
+            if not self._healthy:
+                self.counters['lagging'] += 1
+            return self._healthy
+
+
+def read_fresh(scopes: List[str]) -> None:
+    """
+    Send this request's replica_reads to the primary when one of the scopes was bumped within the
+    replica's staleness bound: the replica may not have replayed that write yet, while a cache key
+    or ETag taken from the new version would keep its stale result. Call it where the versions are read.
+    """
+    replica: Optional[ReadReplica] = current_app.extensions.get('read_replica')
+    versions = current_app.extensions.get('change_versions')
+    if replica is None or not replica.configured or versions is None:
+        return
+    if versions.changed_within(scopes, replica.stale_seconds):
+        setattr(g, PRIMARY_READS_ATTR, True)
+
+
+def replica_reads(fn: Callable) -> Callable:
+    """
+    Run a read-only endpoint's SELECTs on the read replica while it is healthy, otherwise on the
+    primary. If the replica fails mid-request the endpoint is run again on the primary.
+    Apply below dashboard_cached, so cache hits need no connection at all.
+    """
+    @wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        replica: Optional[ReadReplica] = current_app.extensions.get('read_replica')
+        if replica is None or not replica.configured:
+            return fn(*args, **kwargs)
+        if g.get(PRIMARY_READS_ATTR):
+            replica.count('fresh_reads')
+            return fn(*args, **kwargs)
+        if not replica.available():
+            replica.count('primary_requests')
+            return fn(*args, **kwargs)
+        replica.count('replica_requests')
+        session = db.session()
+        session.info[READ_REPLICA_KEY] = True
+        try:
+            return fn(*args, **kwargs)
+        except DBAPIError as e:
+            if not session.info.get(REPLICA_USED_KEY) or getattr(e.orig, 'pgcode', None) == QUERY_CANCELED:
+                raise
+            replica.mark_failed(e)
+            session.rollback()
+            session.info[READ_REPLICA_KEY] = False
+            return fn(*args, **kwargs)
+        finally:
+            session.info.pop(READ_REPLICA_KEY, None)
+            session.info.pop(REPLICA_USED_KEY, None)
+    return wrapper
@@ -0,0 +1,52 @@
+from typing import Dict, Iterable, Optional
+from flask import Flask, current_app
+from api.service.dashboard_cache import MemoryCacheBackend
+
+
+class ReadUrlCache:
+    """
+    Short-lived read URLs for stored screenshots (app.extensions['read_urls']).
+
+    The URLs missing from a page are signed in one create_read_urls call on the blob storage
+    backend, and kept per worker until SCREENSHOT_READ_URL_REFRESH_SECONDS before they expire, so
+    a URL handed out is always valid for at least that long and later pages reuse it.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.backend: Optional[MemoryCacheBackend] = None
+        self.ttl = 900
+        self.refresh = 120
+        self.hits = 0
+        self.signed = 0
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.ttl = app.config['SCREENSHOT_READ_URL_TTL_SECONDS']
+        self.refresh = app.config['SCREENSHOT_READ_URL_REFRESH_SECONDS']
+        if self.refresh >= self.ttl:
+            raise ValueError('SCREENSHOT_READ_URL_REFRESH_SECONDS must be less than SCREENSHOT_READ_URL_TTL_SECONDS')
+        self.backend = MemoryCacheBackend(app.config['SCREENSHOT_READ_URL_CACHE_MAX_ENTRIES'])
+        app.extensions['read_urls'] = self
+
+    def urls(self, container_name: str, blob_names: Iterable[str]) -> Dict[str, str]:
+        """Read URL of each blob, signing the ones not cached in a single batch"""
+        urls: Dict[str, str] = {}
+        missing = []
+        for blob_name in dict.fromkeys(blob_names):
+            url = self.backend.get(f'{container_name}/{blob_name}')
+            if url is None:
+                missing.append(blob_name)
+            else:
+                urls[blob_name] = url
+        self.hits += len(urls)
+        if missing:
+            signed = current_app.extensions['blob_storage'].create_read_urls(container_name, missing, self.ttl)
+            for blob_name, url in signed.items():
+                self.backend.set(f'{container_name}/{blob_name}', url, self.ttl - self.refresh)
+            urls.update(signed)
+            self.signed += len(signed)
+        return urls
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'signed': self.signed, 'cached': self.backend.size(), 'evictions': self.backend.evictions}
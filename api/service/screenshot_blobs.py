@@ -0,0 +1,153 @@
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+from flask import current_app
+from sqlalchemy import case, select, update
+from database import db
+from api.models.screenshot_blob import ScreenshotBlob
+
+
+def content_blob_name(employer_id: int, content_hash: str) -> str:
+    """
+    Fresh blob name for storing a tenant's screenshot with this sha256 (processed variants append a
+    suffix). The content hash is only the deduplication key: every registration gets its own names,
+    so purging a released copy of the same bytes never deletes the blobs of a newer one.
+    """
+    return f'{employer_id}/{content_hash}/{uuid.uuid4().hex}'
+
+
+def thumbnail_blob_name(file_path: str, width: str) -> Optional[str]:
+    """Blob name of a processed screenshot's thumbnail (written next to it by ScreenshotProcessor.store)"""
+    if '.' not in file_path:
+        return None
+    base, extension = file_path.rsplit('.', 1)
+    return f'{base}.w{width}.{extension}'
+
+
+def acquire(employer_id: int, content_hash: str) -> Optional[ScreenshotBlob]:
+    """
+    Add a reference to the tenant's stored screenshot with these bytes, if there is one (caller commits).
+    Rows already released to zero are left alone: their blobs are deleted by purge_released.
+    """
+    match = (ScreenshotBlob.employer_id == employer_id, ScreenshotBlob.content_hash == content_hash)
+    result = db.session.execute(
+        update(ScreenshotBlob).where(*match, ScreenshotBlob.ref_count > 0)
+        .values(ref_count=ScreenshotBlob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    return db.session.execute(select(ScreenshotBlob).where(*match)).scalar_one()
+
+
+def register(employer_id: int, content_hash: str, container_name: str, stored: Dict[str, Any], size: int) -> ScreenshotBlob:
+    """
+    Record a newly stored screenshot with one reference (caller commits).
+
+    Raises:
+        IntegrityError: If another worker registered the same bytes for this tenant first
+    """
+    blob = ScreenshotBlob(
+        employer_id=employer_id,
+        content_hash=content_hash,
+        container_name=container_name,
+        file_path=stored['file_path'],
+        image_url=stored['image_url'],
+        thumbnail_urls=stored.get('thumbnail_urls'),
+        perceptual_hash=stored.get('perceptual_hash'),
+        blob_names=stored['blob_names'],
+        size=size,
+        ref_count=1
+    )
+    db.session.add(blob)
+    db.session.flush()
+    return blob
+
+
+# Blob ids per UPDATE/SELECT ... IN (...) when releasing many screenshots (time log retention)
+RELEASE_CHUNK_SIZE = 1000
+
+
+def release(blob_ids: Iterable[Optional[int]]) -> List[int]:
+    """
+    Drop one reference per id, an id once per time log that pointed at it (caller commits).
+
+    The last reference leaves the row at ref_count 0 instead of deleting anything, so a rollback
+    keeps rows and stored blobs consistent. Returns the ids that reached zero: pass them to
+    purge_released after the commit.
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id)
+    by_count: Dict[int, List[int]] = defaultdict(list)
+    for blob_id, count in counts.items():
+        by_count[count].append(blob_id)
+    for count, ids in by_count.items():
+        for start in range(0, len(ids), RELEASE_CHUNK_SIZE):
+            db.session.execute(
+                update(ScreenshotBlob)
+                .where(ScreenshotBlob.id.in_(ids[start:start + RELEASE_CHUNK_SIZE]), ScreenshotBlob.ref_count > 0)
+                .values(ref_count=case((ScreenshotBlob.ref_count > count, ScreenshotBlob.ref_count - count), else_=0))
+                .execution_options(synchronize_session=False)
+            )
+    released: List[int] = []
+    ids = list(counts)
+    for start in range(0, len(ids), RELEASE_CHUNK_SIZE):
+        released.extend(db.session.execute(
+            select(ScreenshotBlob.id).where(ScreenshotBlob.id.in_(ids[start:start + RELEASE_CHUNK_SIZE]),
+                                            ScreenshotBlob.ref_count == 0)
+        ).scalars())
+    return released
+
+
+def released_ids(employer_id: int, content_hash: str) -> List[int]:
+    """Ids of the tenant's released but not yet purged rows for these bytes (left by a failed purge)"""
+    return list(db.session.execute(
+        select(ScreenshotBlob.id).where(ScreenshotBlob.employer_id == employer_id,
+                                        ScreenshotBlob.content_hash == content_hash, ScreenshotBlob.ref_count == 0)
+    ).scalars())
+
+
+def purge_released(blob_ids: Iterable[int]) -> int:
+    """
+    Delete the stored blobs and the rows of released screenshots, one committed transaction each
+    (call outside the releasing transaction, after it committed). Each row stays locked while its
+    blobs are deleted. A concurrent upload of the same bytes stores them under names of its own
+    (content_blob_name) and registers them once the row is gone. Returns the number purged.
+    """
+    blob_ids = list(blob_ids)
+    if not blob_ids:
+        return 0
+    storage = current_app.extensions['blob_storage']
+    purged = 0
+    for blob_id in blob_ids:
+        try:
+            blob = db.session.execute(
+                select(ScreenshotBlob).where(ScreenshotBlob.id == blob_id, ScreenshotBlob.ref_count == 0)
+                .with_for_update()
+            ).scalar_one_or_none()
+            if blob is None:
+                # Already purged by another request
+                db.session.rollback()
+                continue
+            for blob_name in blob.blob_names:
+                try:
+                    storage.delete_file(blob.container_name, blob_name)
+                except FileNotFoundError:
+                    pass
+            db.session.delete(blob)
+            db.session.commit()
+            purged += 1
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Could not purge released screenshot blob {blob_id}: {e}")
+    return purged
+
+
+def delete_unshared(container_name: str, file_path: str, thumbnail_urls: Optional[Dict[str, str]]) -> None:
+    """Delete a screenshot stored under its own name (not content addressed) and its thumbnails"""
+    storage = current_app.extensions['blob_storage']
+    blob_names = [file_path, *(thumbnail_blob_name(file_path, width) for width in thumbnail_urls or ())]
+    for blob_name in filter(None, blob_names):
+        try:
+            storage.delete_file(container_name, blob_name)
+        except FileNotFoundError:
+            pass
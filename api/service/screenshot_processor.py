@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from flask import Flask
+from database import db
+from api.models.time_log import TimeLog
+from api.service import screenshot_transcoding
+from api.service.screenshot_transcoding import IMAGE_FORMATS, process_screenshot_file
+from api.service.similarity_index import to_signed
+
+
+class ProcessedScreenshot:
+    """Transcoded image and thumbnails written next to the source file by a pool process"""
+
+    def __init__(self, image_path: str, content_type: str, extension: str, thumbnails: Dict[int, str],
+                 perceptual_hash: Optional[int] = None):
+        self.image_path = image_path
+        self.content_type = content_type
+        self.extension = extension
+        self.thumbnails = thumbnails
+        # 64-bit dHash of the original image, signed to fit a BIGINT column
+        self.perceptual_hash = perceptual_hash
+
+    def paths(self) -> List[str]:
+        return [self.image_path, *self.thumbnails.values()]
+
+    def remove(self) -> None:
+        for path in self.paths():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class ScreenshotProcessor:
+    """
+    Transcodes screenshots to SCREENSHOT_IMAGE_FORMAT, renders SCREENSHOT_THUMBNAIL_WIDTHS
+    thumbnails and computes the perceptual hash used by the similarity index, in a bounded
+    process pool, off the request workers and out of their GIL.
+
+    The screenshot uploader runs it on spooled files before uploading; direct uploads are
+    processed after their time log is committed (process_stored).
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.app: Optional[Flask] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._stored: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """Create the process pool when SCREENSHOT_PROCESSING_ENABLED is set."""
+        self.app = app
+        if not app.config.get('SCREENSHOT_PROCESSING_ENABLED'):
+            return
+        self.image_format = app.config['SCREENSHOT_IMAGE_FORMAT']
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(f"SCREENSHOT_IMAGE_FORMAT must be one of {', '.join(IMAGE_FORMATS)}")
+        self.quality = app.config['SCREENSHOT_IMAGE_QUALITY']
+        self.widths = sorted({int(width) for width in str(app.config['SCREENSHOT_THUMBNAIL_WIDTHS']).split(',') if width.strip()},
+                             reverse=True)
+        self.timeout = app.config['SCREENSHOT_PROCESSING_TIMEOUT_SECONDS']
+        workers = app.config['SCREENSHOT_PROCESSING_WORKERS']
+        # Never fork this (threaded) process: pool processes start from a fresh interpreter and only import
+        # the transcoding module, which the forkserver loads once and every pool process inherits
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload([screenshot_transcoding.__name__])
+        else:
+            context = multiprocessing.get_context('spawn')
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        # Jobs waiting for a pool process are bounded too, so a burst queues in the callers instead
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._stored = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='screenshot-process')
+        app.extensions['screenshot_processor'] = self
+
+    def shutdown(self) -> None:
+        """Finish the scheduled direct uploads, then stop the pool processes"""
+        if self._stored is not None:
+            self._stored.shutdown(wait=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def process(self, source_path: str) -> Optional[ProcessedScreenshot]:
+        """
+        Transcode a local file and render its thumbnails, blocking the calling (background) thread.
+        Returns None when the image cannot be processed; the caller then keeps the original.
+        """
+        with self._slots:
+            try:
+                result = self._pool.submit(process_screenshot_file, source_path, self.image_format,
+                                           self.quality, self.widths).result(timeout=self.timeout)
+            except Exception as e:
+                self.app.logger.warning(f"Could not process screenshot {os.path.basename(source_path)}: {e}")
+                return None
+        _, content_type = IMAGE_FORMATS[self.image_format]
+        return ProcessedScreenshot(result['image_path'], content_type, result['extension'], result['thumbnails'],
+                                   to_signed(result['perceptual_hash']))
+
+    def store(self, storage, container_name: str, blob_name: str, processed: ProcessedScreenshot) -> Dict[str, object]:
+        """
+        Upload a processed screenshot and its thumbnails next to blob_name.
+        Returns the time log values (file_path, image_url, thumbnail_urls, perceptual_hash) and the blob_names written.
+        """
+        stored_name = f'{blob_name}.{processed.extension}'
+        with open(processed.image_path, 'rb') as data:
+            image_url = storage.upload_file(container_name, stored_name, data, processed.content_type)
+        blob_names = [stored_name]
+        thumbnail_urls = {}
+        for width, path in processed.thumbnails.items():
+            thumbnail_name = f'{blob_name}.w{width}.{processed.extension}'
+            with open(path, 'rb') as data:
+                thumbnail_urls[str(width)] = storage.upload_file(container_name, thumbnail_name, data, processed.content_type)
+            blob_names.append(thumbnail_name)
+        return {'file_path': stored_name, 'image_url': image_url, 'thumbnail_urls': thumbnail_urls,
+                'perceptual_hash': processed.perceptual_hash, 'blob_names': blob_names}
+
+    def process_stored(self, time_log_id: int, container_name: str, blob_name: str) -> None:
+        """Schedule processing of a screenshot that is already in blob storage (direct uploads)."""
+        self._stored.submit(self._process_stored, time_log_id, container_name, blob_name)
+
+    def _process_stored(self, time_log_id: int, container_name: str, blob_name: str) -> None:
+        storage = self.app.extensions['blob_storage']
+        with tempfile.TemporaryDirectory(prefix='screenshot-') as work_dir:
+            source_path = os.path.join(work_dir, 'source')
+            try:
+                with open(source_path, 'wb') as out:
+                    storage.download_file(container_name, blob_name, out)
+                processed = self.process(source_path)
+                if processed is None:
+                    return
+                values = self.store(storage, container_name, blob_name, processed)
+                values.pop('blob_names')
+            except Exception as e:
+                self.app.logger.error(f"Failed to process stored screenshot {blob_name}: {e}")
+                return
+        with self.app.app_context():
+            try:
+                TimeLog.query.filter_by(id=time_log_id).update(values, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Failed to update time log {time_log_id} for screenshot {blob_name}: {e}")
+                return
+        try:
+            storage.delete_file(container_name, blob_name)
+        except Exception as e:
+            self.app.logger.warning(f"Could not delete original screenshot {blob_name}: {e}")
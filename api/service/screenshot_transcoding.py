@@ -0,0 +1,53 @@
+from typing import Dict, List
+import numpy as np
+from PIL import Image
+
+# Image work of the screenshot processor's pool processes. They import only this module, so it must
+# not import Flask, the database or the app.
+
+IMAGE_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg')
+}
+
+# Load every format plugin at import, once per forkserver rather than per image
+Image.init()
+
+
+def difference_hash(image) -> int:
+    """
+    64-bit dHash: shrink to 9x8 grayscale and set one bit per pixel brighter than its right-hand
+    neighbour. Small changes (a clock, a cursor) flip few bits, so near-identical screenshots are
+    a small Hamming distance apart.
+    """
+    pixels = np.asarray(image.convert('L').resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    bits = pixels[:, :-1] > pixels[:, 1:]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def process_screenshot_file(source_path: str, image_format: str, quality: int, widths: List[int]) -> Dict[str, object]:
+    """
+    Transcode source_path to image_format, write thumbnails no wider than each of widths and
+    compute the (unsigned) perceptual hash. Runs in a pool process; only paths cross the process
+    boundary, never image bytes.
+    """
+    pil_format, _ = IMAGE_FORMATS[image_format]
+    extension = image_format
+    with Image.open(source_path) as image:
+        image.load()
+        perceptual_hash = difference_hash(image)
+        if image_format == 'jpeg':
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB')
+        image_path = f'{source_path}.{extension}'
+        image.save(image_path, pil_format, quality=quality)
+        thumbnails = {}
+        for width in widths:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, width * 4), reducing_gap=2.0)
+            thumbnail_path = f'{source_path}.w{width}.{extension}'
+            thumbnail.save(thumbnail_path, pil_format, quality=quality)
+            thumbnails[width] = thumbnail_path
+    return {'image_path': image_path, 'extension': extension, 'thumbnails': thumbnails, 'perceptual_hash': perceptual_hash}
@@ -0,0 +1,353 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from flask import Flask
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import FileStorage
+from database import db
+from api.models.project import Project
+from api.models.time_log import TimeLog
+from api.service.azure_blob import AzureBlobStorage
+from api.service.screenshot_blobs import acquire, content_blob_name, purge_released, register, released_ids
+
+# Read size while copying an upload into the spool (and hashing it)
+SPOOL_CHUNK_BYTES = 64 * 1024
+
+
+class SpoolFullError(Exception):
+    """Raised when too many screenshots are waiting to be uploaded"""
+
+
+class SpooledScreenshot:
+    """A screenshot written to the local spool that has not been uploaded yet"""
+
+    def __init__(self, blob_name: str, container_name: str, content_type: str, captured_at: datetime):
+        self.blob_name = blob_name
+        self.container_name = container_name
+        self.content_type = content_type
+        self.captured_at = captured_at
+        self.time_log_id: Optional[int] = None
+        self.attempts = 0
+        # sha256 of the bytes; None for screenshots spooled before content addressing
+        self.content_hash: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'blob_name': self.blob_name,
+            'container_name': self.container_name,
+            'content_type': self.content_type,
+            'captured_at': self.captured_at.isoformat(),
+            'time_log_id': self.time_log_id,
+            'attempts': self.attempts,
+            'content_hash': self.content_hash
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'SpooledScreenshot':
+        job = SpooledScreenshot(data['blob_name'], data['container_name'], data['content_type'],
+                                datetime.fromisoformat(data['captured_at']))
+        job.time_log_id = data.get('time_log_id')
+        job.attempts = data.get('attempts', 0)
+        job.content_hash = data.get('content_hash')
+        return job
+
+
+class ScreenshotUploader:
+    """
+    Drains spooled screenshots to blob storage with a background worker pool.
+
+    Request handlers call spool() to write the bytes to local disk, persist the time log
+    with screenshot_status='pending', then call submit() with the new time log id. Workers
+    upload the file (transcoded, with thumbnails, when the screenshot processor is enabled),
+    retry with exponential backoff, and fill in image_url, file_path, thumbnail_urls and
+    captured_at on the time log once the upload succeeds.
+
+    Screenshots are content addressed per tenant (the project's employer): when the tenant
+    already stores the same bytes, the time log gets a reference to them and nothing is
+    processed or uploaded.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.app: Optional[Flask] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._storage: Optional[AzureBlobStorage] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.deduplicated = 0
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """Create the spool directory and worker pool, and resume uploads left over from a previous run."""
+        self.app = app
+        self.spool_dir = app.config['SCREENSHOT_SPOOL_DIR']
+        self.max_pending = app.config['SCREENSHOT_SPOOL_MAX_PENDING']
+        self.max_attempts = app.config['SCREENSHOT_UPLOAD_MAX_ATTEMPTS']
+        self.retry_backoff = app.config['SCREENSHOT_UPLOAD_RETRY_BACKOFF_SECONDS']
+        self.orphan_seconds = app.config['SCREENSHOT_SPOOL_ORPHAN_SECONDS']
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=app.config['SCREENSHOT_UPLOAD_WORKERS'],
+                                            thread_name_prefix='screenshot-upload')
+        app.extensions['screenshot_uploader'] = self
+        self._recover()
+
+    @property
+    def pending(self) -> int:
+        """Number of screenshots spooled but not yet uploaded or given up on"""
+        return self._pending
+
+    def spool(self, file: FileStorage, container_name: str, content_type: str) -> SpooledScreenshot:
+        """
+        Write an uploaded file to the spool directory.
+
+        Raises:
+            SpoolFullError: If SCREENSHOT_SPOOL_MAX_PENDING uploads are already waiting
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise SpoolFullError('Screenshot upload queue is full, retry later')
+            self._pending += 1
+        job = SpooledScreenshot(str(uuid.uuid4()), container_name, content_type, datetime.utcnow())
+        try:
+            partial_path = self._data_path(job) + '.part'
+            digest = hashlib.sha256()
+            with open(partial_path, 'wb') as out:
+                for chunk in iter(lambda: file.stream.read(SPOOL_CHUNK_BYTES), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+            job.content_hash = digest.hexdigest()
+            os.replace(partial_path, self._data_path(job))
+        except Exception:
+            self._release()
+            raise
+        return job
+
+    def submit(self, job: SpooledScreenshot, time_log_id: int) -> None:
+        """Attach the committed time log to a spooled screenshot and schedule its upload."""
+        job.time_log_id = time_log_id
+        self._write_meta(job)
+        self._executor.submit(self._upload, job)
+
+    def discard(self, job: SpooledScreenshot) -> None:
+        """Drop a spooled screenshot whose time log could not be stored."""
+        self._remove_files(job)
+        self._release()
+
+    def _upload(self, job: SpooledScreenshot) -> None:
+        job.attempts += 1
+        try:
+            if self._storage is None:
+                self._storage = AzureBlobStorage(self.app.extensions['blob_storage'])
+            if job.content_hash:
+                self._store_deduplicated(job)
+            else:
+                stored = self._store(job, job.blob_name)
+                stored.pop('blob_names')
+                self._update_time_log(job, status='uploaded', stored=stored)
+        except Exception as e:
+            self._on_failure(job, e)
+            return
+        self._remove_files(job)
+        self._release()
+
+    def _store(self, job: SpooledScreenshot, blob_name: str) -> Dict[str, Any]:
+        """Upload the spooled file (processed, when enabled) as blob_name; returns the stored values and blob_names"""
+        processor = self.app.extensions.get('screenshot_processor')
+        processed = processor.process(self._data_path(job)) if processor else None
+        try:
+            if processed:
+                return processor.store(self._storage, job.container_name, blob_name, processed)
+            with open(self._data_path(job), 'rb') as data:
+                image_url = self._storage.upload_file(job.container_name, blob_name, data, job.content_type)
+            return {'file_path': blob_name, 'image_url': image_url, 'blob_names': [blob_name]}
+        finally:
+            if processed:
+                processed.remove()
+
+    def _store_deduplicated(self, job: SpooledScreenshot) -> None:
+        """
+        Point the time log at the tenant's copy of these bytes, storing them first if there is none.
+        Only a time log without a screenshot blob is updated, so a job processed twice (recovered
+        after a crash between the commit and the spool cleanup) rolls back its extra reference.
+        """
+        with self.app.app_context():
+            row = db.session.query(Project.employer_id).join(TimeLog, TimeLog.project_id == Project.id) \
+                .filter(TimeLog.id == job.time_log_id).first()
+            if row is None:
+                # The time log was deleted before its screenshot was uploaded
+                return
+            employer_id = row.employer_id or 0
+            blob = acquire(employer_id, job.content_hash)
+            stored = None
+            if blob is None:
+                db.session.rollback()
+                stored = self._store(job, content_blob_name(employer_id, job.content_hash))
+                try:
+                    blob = register(employer_id, job.content_hash, job.container_name, stored,
+                                    os.path.getsize(self._data_path(job)))
+                except Exception as e:
+                    db.session.rollback()
+                    self._delete_blobs(job.container_name, stored['blob_names'])
+                    if not isinstance(e, IntegrityError):
+                        raise
+                    # Another worker registered the same bytes meanwhile
+                    stored = None
+                    blob = acquire(employer_id, job.content_hash)
+                    if blob is None:
+                        # The row of these bytes was released but is not purged yet: purge it, so the retry can register them
+                        purge_released(released_ids(employer_id, job.content_hash))
+                        raise
+            values: Dict[str, Any] = {'screenshot_status': 'uploaded', 'screenshot_attempts': job.attempts,
+                                      'captured_at': job.captured_at, **blob.time_log_values()}
+            try:
+                updated = TimeLog.query.filter(TimeLog.id == job.time_log_id, TimeLog.screenshot_blob_id.is_(None)) \
+                    .update(values, synchronize_session=False)
+                if not updated:
+                    # Deleted meanwhile, or already attached by an earlier run of this job
+                    db.session.rollback()
+                    if stored:
+                        self._delete_blobs(job.container_name, stored['blob_names'])
+                    return
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                if stored:
+                    self._delete_blobs(job.container_name, stored['blob_names'])
+                raise
+        if stored is None:
+            with self._lock:
+                self.deduplicated += 1
+
+    def _delete_blobs(self, container_name: str, blob_names: List[str]) -> None:
+        for blob_name in blob_names:
+            try:
+                self._storage.delete_file(container_name, blob_name)
+            except Exception as e:
+                self.app.logger.warning(f"Could not delete unreferenced screenshot blob {blob_name}: {e}")
+
+    def _on_failure(self, job: SpooledScreenshot, error: Exception) -> None:
+        if job.attempts >= self.max_attempts:
+            self.app.logger.error(f"Giving up on screenshot {job.blob_name} after {job.attempts} attempts: {error}")
+            self._update_time_log(job, status='failed')
+            self._remove_files(job)
+            self._release()
+            return
+        self.app.logger.warning(f"Screenshot upload {job.blob_name} failed (attempt {job.attempts}): {error}")
+        self._update_time_log(job, status='pending')
+        self._write_meta(job)
+        delay = self.retry_backoff * (2 ** (job.attempts - 1))
+        timer = threading.Timer(delay, self._executor.submit, args=(self._upload, job))
+        timer.daemon = True
+        timer.start()
+
+    def _update_time_log(self, job: SpooledScreenshot, status: str, stored: Optional[Dict[str, Any]] = None) -> None:
+        values: Dict[str, Any] = {'screenshot_status': status, 'screenshot_attempts': job.attempts}
+        if status == 'uploaded':
+            # stored: file_path and image_url, plus thumbnail_urls when the screenshot was processed
+            values.update(stored, captured_at=job.captured_at)
+        with self.app.app_context():
+            try:
+                query = TimeLog.query.filter(TimeLog.id == job.time_log_id)
+                if status != 'uploaded':
+                    # A job processed twice must not take back the screenshot of a run that succeeded
+                    query = query.filter(TimeLog.screenshot_status != 'uploaded')
+                query.update(values, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Failed to update time log {job.time_log_id} for screenshot {job.blob_name}: {e}")
+
+    def _recover(self) -> None:
+        """
+        Re-queue screenshots that were committed but not uploaded by a process that is gone, and
+        delete spooled files left without metadata for SCREENSHOT_SPOOL_ORPHAN_SECONDS (their request
+        died before the time log was committed; younger ones may still belong to a running worker).
+        Jobs of the other workers sharing the spool directory are left to them (see _claim).
+        """
+        names = os.listdir(self.spool_dir)
+        metas = [name for name in names if name.endswith('.json')]
+        jobs = {name.split('.', 1)[0] for name in metas}
+        cutoff = time.time() - self.orphan_seconds
+        for name in names:
+            # Data, .part and processed files all start with the job's blob name (a uuid, without dots)
+            if name.split('.', 1)[0] in jobs:
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError as e:
+                self.app.logger.warning(f"Could not delete orphaned spool file {name}: {e}")
+        for name in metas:
+            path = self._claim(name)
+            if path is None:
+                continue
+            try:
+                with open(path) as meta:
+                    job = SpooledScreenshot.from_dict(json.load(meta))
+            except (OSError, ValueError, KeyError):
+                continue
+            if not os.path.exists(self._data_path(job)):
+                continue
+            with self._lock:
+                self._pending += 1
+            self._executor.submit(self._upload, job)
+
+    def _claim(self, name: str) -> Optional[str]:
+        """
+        Take over a job's metadata file, named <blob name>.<pid>.json after the process working on
+        it, unless that process is still running. The rename is atomic, so when several workers
+        start at once each job is claimed by one of them. Returns the claimed path, or None.
+        The spool directory is local to the host, so the pid identifies the owner.
+        """
+        blob_name, _, owner = name[:-len('.json')].partition('.')
+        if owner.isdigit() and int(owner) != os.getpid() and _process_alive(int(owner)):
+            return None
+        claimed = os.path.join(self.spool_dir, f'{blob_name}.{os.getpid()}.json')
+        try:
+            os.rename(os.path.join(self.spool_dir, name), claimed)
+        except FileNotFoundError:
+            # Claimed by another worker first
+            return None
+        return claimed
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _data_path(self, job: SpooledScreenshot) -> str:
+        return os.path.join(self.spool_dir, job.blob_name)
+
+    def _meta_path(self, job: SpooledScreenshot) -> str:
+        """Metadata of a job, owned by this process"""
+        return os.path.join(self.spool_dir, f'{job.blob_name}.{os.getpid()}.json')
+
+    def _write_meta(self, job: SpooledScreenshot) -> None:
+        partial_path = self._meta_path(job) + '.part'
+        with open(partial_path, 'w') as meta:
+            json.dump(job.to_dict(), meta)
+        os.replace(partial_path, self._meta_path(job))
+
+    def _remove_files(self, job: SpooledScreenshot) -> None:
+        for path in (self._data_path(job), self._meta_path(job)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running as another user
+        return True
+    return True
@@ -0,0 +1,201 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator, List, Optional, Set, Tuple
+from flask import Flask, current_app
+from sqlalchemy import func, or_
+from database import db
+from api.models.time_log import TimeLog
+from api.service.dashboard_cache import MemoryCacheBackend
+
+# (time log id, project id, start_time) of an indexed screenshot
+IndexedScreenshot = Tuple[int, int, datetime]
+
+
+def to_signed(value: int) -> int:
+    """Unsigned 64-bit hash -> value storable in a signed BIGINT column"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def hash_hex(value: Optional[int]) -> Optional[str]:
+    """Stored (signed) perceptual hash as 16 hex digits, as exposed by the API"""
+    return None if value is None else f'{to_unsigned(value):016x}'
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with Hamming distance. A radius search only descends
+    into children whose edge distance is within radius of the query's distance to the node
+    (triangle inequality), so small radii visit a small fraction of the tree.
+    """
+
+    def __init__(self):
+        # node: [hash, items with this hash, {edge distance: child node}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int, item: Any) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = (node[0] ^ value).bit_count()
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> Iterator[Tuple[int, Any]]:
+        """Yield (distance, item) for every item whose hash is within radius of value"""
+        if self._root is None:
+            return
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = (node[0] ^ value).bit_count()
+            if distance <= radius:
+                for item in node[1]:
+                    yield distance, item
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+
+    def items(self) -> Iterator[Tuple[int, Any]]:
+        """Yield (hash, item) for every item in the tree"""
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            for item in node[1]:
+                yield node[0], item
+            stack.extend(node[2].values())
+
+
+class _DayIndex:
+    """Tree of one employee's day and what it takes to bring it up to date"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version: Any = None
+        self.checked_at = 0.0
+        self.reset()
+
+    def reset(self) -> None:
+        self.tree = BKTree()
+        self.last_id = 0
+        # Time logs whose hash may still arrive (upload or processing not done yet)
+        self.pending: Set[int] = set()
+
+
+class SimilarityIndex:
+    """
+    Per employee and day BK-trees of screenshot perceptual hashes (app.extensions['similarity_index']).
+
+    A tree is built on first use and then kept up to date rather than rebuilt: when the employee's
+    change version moves, only time logs newer than the last one seen (and those still waiting for
+    their hash) are read and added. Hashes filled in later by background processing, which do not
+    bump the version, are looked for at most every SIMILARITY_INDEX_TTL_SECONDS. A count check
+    catches deletes and late commits and rebuilds the tree. Trees unused for
+    SIMILARITY_INDEX_IDLE_SECONDS are dropped.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.backend: Optional[MemoryCacheBackend] = None
+        self.ttl: float = 60
+        self.idle_seconds: float = 3600
+        self.rebuilds = 0
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.ttl = app.config['SIMILARITY_INDEX_TTL_SECONDS']
+        self.idle_seconds = app.config['SIMILARITY_INDEX_IDLE_SECONDS']
+        self.backend = MemoryCacheBackend(app.config['SIMILARITY_INDEX_MAX_ENTRIES'])
+        app.extensions['similarity_index'] = self
+
+    def tree(self, employee_id: int, day: date) -> BKTree:
+        return self._day_index(employee_id, day).tree
+
+    def similar(self, time_log: TimeLog, max_distance: int) -> List[Tuple[int, IndexedScreenshot]]:
+        """Screenshots of the same employee and day within max_distance of this one, nearest first"""
+        if time_log.perceptual_hash is None:
+            return []
+        index = self._day_index(time_log.employee_id, time_log.start_time.date())
+        with index.lock:
+            matches = [(distance, item) for distance, item in index.tree.search(to_unsigned(time_log.perceptual_hash), max_distance)
+                       if item[0] != time_log.id]
+        return sorted(matches, key=lambda match: (match[0], match[1][2]))
+
+    def groups(self, employee_id: int, day: date, max_distance: int) -> List[List[Tuple[int, IndexedScreenshot]]]:
+        """
+        Collapse the employee's screenshots of the day into groups of near-identical ones, in time
+        order: each group holds the earliest ungrouped screenshot and everything within max_distance
+        of it, with their distance to that first screenshot.
+        """
+        index = self._day_index(employee_id, day)
+        grouped = set()
+        groups = []
+        with index.lock:
+            tree = index.tree
+            for value, item in sorted(tree.items(), key=lambda entry: (entry[1][2], entry[1][0])):
+                if item[0] in grouped:
+                    continue
+                members = sorted((match for match in tree.search(value, max_distance) if match[1][0] not in grouped),
+                                 key=lambda member: (member[1][2], member[1][0]))
+                grouped.update(member[1][0] for member in members)
+                groups.append(members)
+        return groups
+
+    def _day_index(self, employee_id: int, day: date) -> _DayIndex:
+        key = f'{employee_id}:{day.isoformat()}'
+        index: Optional[_DayIndex] = self.backend.get(key)
+        if index is None:
+            index = _DayIndex()
+        versions = current_app.extensions.get('change_versions')
+        # Read before the rows, so a change committed meanwhile is caught by the next call
+        version = versions.get(f'employee:{employee_id}') if versions is not None else 0
+        with index.lock:
+            now = time.monotonic()
+            if index.version != version or (index.pending and now - index.checked_at >= self.ttl):
+                self._refresh(index, employee_id, day)
+                index.version = version
+                index.checked_at = now
+        self.backend.set(key, index, self.idle_seconds)
+        return index
+
+    def _refresh(self, index: _DayIndex, employee_id: int, day: date) -> None:
+        start = datetime.combine(day, datetime.min.time())
+        of_day = (TimeLog.employee_id == employee_id,
+                  TimeLog.start_time >= start,
+                  TimeLog.start_time < start + timedelta(days=1))
+        built = index.last_id == 0
+        unseen = TimeLog.id > index.last_id
+        if index.pending:
+            unseen = or_(unseen, TimeLog.id.in_(index.pending))
+        rows = db.session.query(
+            TimeLog.id, TimeLog.project_id, TimeLog.start_time, TimeLog.perceptual_hash, TimeLog.screenshot_status
+        ).filter(*of_day, unseen).all()
+        for row in rows:
+            index.last_id = max(index.last_id, row.id)
+            index.pending.discard(row.id)
+            if row.perceptual_hash is not None:
+                index.tree.add(to_unsigned(row.perceptual_hash), (row.id, row.project_id, row.start_time))
+            elif row.screenshot_status in ('pending', 'uploaded'):
+                index.pending.add(row.id)
+        if built:
+            return
+        # Deleted or moved time logs, and ids committed after a higher one was read, change the count
+        hashed = db.session.query(func.count(TimeLog.id)).filter(*of_day, TimeLog.perceptual_hash.isnot(None)).scalar()
+        if hashed != index.tree.size:
+            self.rebuilds += 1
+            index.reset()
+            self._refresh(index, employee_id, day)
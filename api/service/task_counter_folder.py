@@ -0,0 +1,37 @@
+import threading
+from typing import Optional
+from flask import Flask
+from api.models.task import Task
+
+
+class TaskCounterFolder:
+    """
+    Background thread that periodically folds task_time_deltas into tasks.minutes_spent.
+    Only started when TASK_COUNTER_MODE is 'delta'.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.app: Optional[Flask] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.interval = app.config['TASK_COUNTER_FOLD_INTERVAL_SECONDS']
+        app.extensions['task_counter_folder'] = self
+        if app.config['TASK_COUNTER_MODE'] == 'delta':
+            self._thread = threading.Thread(target=self._run, name='task-counter-folder', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    Task.fold_minutes_deltas()
+                except Exception as e:
+                    self.app.logger.error(f"Failed to fold task time deltas: {e}")
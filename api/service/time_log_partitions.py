@@ -0,0 +1,288 @@
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import ColumnElement, TableClause
+from constants import SCREENSHOT_STORAGE_CONTAINER
+from database import db
+from api.models.time_log import TimeLog
+from api.service.screenshot_blobs import delete_unshared, purge_released, release
+
+SCHEMA: str = TimeLog.__table__.schema
+TABLE: str = TimeLog.__tablename__
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+DEFAULT_PARTITION: str = f'{TABLE}_default'
+
+# Lock wait bound for DDL on the parent table, so maintenance never queues behind (and blocks) ingestion for long
+DDL_LOCK_TIMEOUT: str = '5s'
+DDL_LOCK_RETRIES: int = 5
+
+
+def is_partitioning_supported() -> bool:
+    """Partitioning is only used on PostgreSQL; SQLite keeps a plain time_logs table"""
+    return db.engine.dialect.name == 'postgresql'
+
+
+def is_partitioned() -> bool:
+    """Whether time_logs has been converted to a partitioned table"""
+    if not is_partitioning_supported():
+        return False
+    relkind = db.session.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = :schema AND c.relname = :table"
+    ), {'schema': SCHEMA, 'table': TABLE}).scalar()
+    return relkind == 'p'
+
+
+def list_partitions() -> Dict[date, str]:
+    """Return the monthly partitions of time_logs keyed by the first day of their month"""
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE n.nspname = :schema AND p.relname = :table"
+    ), {'schema': SCHEMA, 'table': TABLE}).scalars().all()
+    partitions: Dict[date, str] = {}
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def ensure_time_log_partitions(months_ahead: Optional[int] = None) -> List[str]:
+    """
+    Create the monthly partitions from the current month up to months_ahead months ahead.
+
+    Returns:
+        Names of the partitions that were created
+    """
+    if not is_partitioned():
+        return []
+    if months_ahead is None:
+        months_ahead = current_app.config.get('TIME_LOG_PARTITION_MONTHS_AHEAD', 3)
+    existing = list_partitions()
+    created: List[str] = []
+    current = _month_start(datetime.utcnow().date())
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        if month not in existing:
+            created.append(_create_partition(month))
+    return created
+
+
+def apply_time_log_retention(retain_months: Optional[int] = None, action: Optional[str] = None) -> List[str]:
+    """
+    Remove time logs older than retain_months full months.
+
+    On PostgreSQL whole partitions are detached (and dropped if action is 'drop') under a short
+    lock_timeout, so no long lock is held on time_logs. On SQLite old rows are deleted instead.
+    Rollups and task counters keep their totals either way.
+
+    Deleted or dropped logs release their shared screenshots in the same transaction, and the
+    stored blobs left without references (and screenshots stored under their own name) are
+    deleted after it commits. A detached partition keeps its screenshots: drop it with this
+    function rather than by hand, or its stored blobs are never deleted.
+
+    Returns:
+        Names of the partitions detached or dropped (empty on SQLite)
+    """
+    action = action or current_app.config.get('TIME_LOG_RETENTION_ACTION', 'detach')
+    cutoff = retention_cutoff(retain_months)
+    if cutoff is None:
+        return []
+
+    if not is_partitioned():
+        expired = TimeLog.start_time < cutoff
+        unshared, released = _release_screenshots(TimeLog.__table__, expired)
+        TimeLog.query.filter(expired).delete(synchronize_session=False)
+        db.session.commit()
+        _delete_screenshots(unshared, released)
+        return []
+
+    removed: List[str] = []
+    for month, name in sorted(list_partitions().items()):
+        if month >= cutoff:
+            break
+        _run_ddl(f'ALTER TABLE {SCHEMA}.{TABLE} DETACH PARTITION {SCHEMA}.{name}')
+        if action == 'drop':
+            # The detached table is no longer read or written by the app, so no lock_timeout is needed
+            try:
+                unshared, released = _release_screenshots(_detached_partition(name))
+                db.session.execute(text(f'DROP TABLE {SCHEMA}.{name}'))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            _delete_screenshots(unshared, released)
+        removed.append(name)
+    return removed
+
+
+def _detached_partition(name: str) -> TableClause:
+    """The screenshot columns of a detached partition"""
+    return table(name, *(column(key, TimeLog.__table__.c[key].type)
+                         for key in ('screenshot_blob_id', 'file_path', 'thumbnail_urls')), schema=SCHEMA)
+
+
+def _release_screenshots(logs: TableClause, *where: ColumnElement[bool]) -> Tuple[List[Tuple[str, Optional[Dict[str, str]]]], List[int]]:
+    """
+    Release the shared screenshots of the matching logs in one pass (caller commits).
+
+    Returns:
+        The (file_path, thumbnail_urls) of screenshots stored under their own name, and the ids
+        of shared screenshots left without references
+    """
+    rows = db.session.execute(
+        select(logs.c.screenshot_blob_id, logs.c.file_path, logs.c.thumbnail_urls)
+        .where(*where, or_(logs.c.screenshot_blob_id.is_not(None), logs.c.file_path.is_not(None)))
+    ).all()
+    released = release(row.screenshot_blob_id for row in rows)
+    unshared = [(row.file_path, row.thumbnail_urls) for row in rows if not row.screenshot_blob_id]
+    return unshared, released
+
+
+def _delete_screenshots(unshared: List[Tuple[str, Optional[Dict[str, str]]]], released: List[int]) -> None:
+    """Delete the stored screenshots of removed logs, once their removal is committed"""
+    purge_released(released)
+    container_name = os.environ.get('SCREENSHOT_STORAGE_CONTAINER', SCREENSHOT_STORAGE_CONTAINER)
+    for file_path, thumbnail_urls in unshared:
+        try:
+            delete_unshared(container_name, file_path, thumbnail_urls)
+        except Exception as e:
+            current_app.logger.warning(f"Could not delete expired screenshot {file_path}: {e}")
+
+
+def retention_cutoff(retain_months: Optional[int] = None) -> Optional[date]:
+    """First day of the oldest month kept by retention (TIME_LOG_RETENTION_MONTHS by default), None if everything is kept"""
+    if retain_months is None:
+        retain_months = current_app.config.get('TIME_LOG_RETENTION_MONTHS', 0)
+    if not retain_months:
+        return None
+    return _add_months(_month_start(datetime.utcnow().date()), -retain_months)
+
+
+def convert_time_logs_to_partitioned(months_ahead: Optional[int] = None) -> None:
+    """
+    One-time migration of an existing plain time_logs table into a partitioned one.
+    Takes an exclusive lock on time_logs while rows are copied; run it during a maintenance window.
+    """
+    if not is_partitioning_supported():
+        raise RuntimeError('time_logs partitioning requires PostgreSQL')
+    if is_partitioned():
+        return
+    old_table = f'{TABLE}_unpartitioned'
+    sequence = db.session.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': f'{SCHEMA}.{TABLE}'}
+    ).scalar()
+    bounds = db.session.execute(text(f'SELECT min(start_time) FROM {SCHEMA}.{TABLE}')).scalar()
+    statements = [
+        f'LOCK TABLE {SCHEMA}.{TABLE} IN ACCESS EXCLUSIVE MODE',
+        f'ALTER TABLE {SCHEMA}.{TABLE} RENAME TO {old_table}',
+        f'CREATE TABLE {SCHEMA}.{TABLE} (LIKE {SCHEMA}.{old_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE (start_time)',
+        f'CREATE TABLE {SCHEMA}.{DEFAULT_PARTITION} PARTITION OF {SCHEMA}.{TABLE} DEFAULT',
+    ]
+    if sequence:
+        # Keep the id sequence alive when the old table is dropped
+        statements.append(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    try:
+        for statement in statements:
+            db.session.execute(text(statement))
+        first_month = _month_start(bounds.date()) if bounds else _month_start(datetime.utcnow().date())
+        last_month = _add_months(_month_start(datetime.utcnow().date()), months_ahead
+                                 if months_ahead is not None else current_app.config.get('TIME_LOG_PARTITION_MONTHS_AHEAD', 3))
+        month = first_month
+        while month <= last_month:
+            db.session.execute(text(_create_partition_sql(month)))
+            month = _add_months(month, 1)
+        db.session.execute(text(f'INSERT INTO {SCHEMA}.{TABLE} SELECT * FROM {SCHEMA}.{old_table}'))
+        db.session.execute(text(f'DROP TABLE {SCHEMA}.{old_table}'))
+        # Added after the old table (and its time_logs_pkey index) is gone
+        db.session.execute(text(f'ALTER TABLE {SCHEMA}.{TABLE} ADD PRIMARY KEY (id, start_time)'))
+        if sequence:
+            db.session.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {SCHEMA}.{TABLE}.id'))
+        # Indexes and foreign keys are declared on the parent and propagate to every partition
+        for index in TimeLog.__table__.indexes:
+            index.create(db.session.connection())
+        for constraint in TimeLog.__table__.foreign_key_constraints:
+            column = constraint.column_keys[0]
+            target = constraint.elements[0].target_fullname
+            referenced_table, referenced_column = target.rsplit('.', 1)
+            db.session.execute(text(
+                f'ALTER TABLE {SCHEMA}.{TABLE} ADD FOREIGN KEY ({column}) REFERENCES {referenced_table} ({referenced_column})'
+            ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _create_partition(month: date) -> str:
+    """
+    Create a month's partition. Rows of that month already in the DEFAULT partition would make
+    CREATE TABLE ... PARTITION OF fail, so they are moved into a standalone table that is then attached.
+    """
+    name = _partition_name(month)
+    bounds = {'start': month, 'end': _add_months(month, 1)}
+    in_default = db.session.execute(text(
+        f"SELECT to_regclass(:default) IS NOT NULL AND EXISTS (SELECT 1 FROM {SCHEMA}.{DEFAULT_PARTITION} "
+        f"WHERE start_time >= :start AND start_time < :end)"
+    ), {'default': f'{SCHEMA}.{DEFAULT_PARTITION}', **bounds}).scalar()
+    # Release the lock taken on the default partition, which the DDL below needs exclusively
+    db.session.rollback()
+    if not in_default:
+        _run_ddl(_create_partition_sql(month))
+        return name
+    _run_ddl(
+        # Keeps new rows of the month out of the default while they are moved
+        f'LOCK TABLE {SCHEMA}.{DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE',
+        f'CREATE TABLE {SCHEMA}.{name} (LIKE {SCHEMA}.{TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        f"WITH moved AS (DELETE FROM {SCHEMA}.{DEFAULT_PARTITION} WHERE start_time >= '{bounds['start'].isoformat()}' "
+        f"AND start_time < '{bounds['end'].isoformat()}' RETURNING *) INSERT INTO {SCHEMA}.{name} SELECT * FROM moved",
+        f"ALTER TABLE {SCHEMA}.{TABLE} ATTACH PARTITION {SCHEMA}.{name} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    )
+    current_app.logger.info(f"Moved the {month:%Y-%m} time logs out of {DEFAULT_PARTITION} into {name}")
+    return name
+
+
+def _create_partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA}.{_partition_name(month)} PARTITION OF {SCHEMA}.{TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    )
+
+
+def _partition_name(month: date) -> str:
+    return f'{TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def _run_ddl(*statements: str) -> None:
+    """Run DDL statements in one transaction with a short lock_timeout, retrying if a lock is busy"""
+    for attempt in range(1, DDL_LOCK_RETRIES + 1):
+        with db.engine.connect() as connection:
+            try:
+                with connection.begin():
+                    connection.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+                    for statement in statements:
+                        connection.execute(text(statement))
+                return
+            except OperationalError as e:
+                if 'lock timeout' not in str(e) or attempt == DDL_LOCK_RETRIES:
+                    raise
+        time.sleep(attempt)
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
@@ -0,0 +1,163 @@
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Tuple, Type, Union
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import db
+from api.models.project import Project
+from api.models.time_log import TimeLog
+from api.models.time_rollup import HourlyTimeRollup, DailyTimeRollup
+from api.service.change_versions import mark_changed
+from api.service.time_log_partitions import retention_cutoff
+
+RollupKey = Tuple[int, int, int, Union[datetime, date]]
+
+# Grouped rows upserted per statement while rebuilding (7 bind parameters each, below SQLite's limit)
+REBUILD_CHUNK_SIZE = 2000
+
+
+def record_time_logs(entries: Iterable[Dict[str, Any]]) -> None:
+    """
+    Add newly ingested time logs to the hourly and daily rollups (caller commits).
+
+    Args:
+        entries: Dicts with project_id, task_id, employee_id, start_time (datetime) and duration (seconds)
+    """
+    _apply_time_logs(entries, 1)
+
+
+def forget_time_logs(entries: Iterable[Dict[str, Any]]) -> None:
+    """Subtract deleted time logs from the hourly and daily rollups (caller commits); entries as for record_time_logs"""
+    _apply_time_logs(entries, -1)
+
+
+def _apply_time_logs(entries: Iterable[Dict[str, Any]], sign: int) -> None:
+    entries = list(entries)
+    if not entries:
+        return
+    project_ids = {entry['project_id'] for entry in entries}
+    employers: Dict[int, Optional[int]] = dict(
+        db.session.query(Project.id, Project.employer_id).filter(Project.id.in_(project_ids)).all()
+    )
+    hourly: Dict[RollupKey, list] = {}
+    daily: Dict[RollupKey, list] = {}
+    for entry in entries:
+        seconds = int(round(entry['duration'] or 0)) * sign
+        key = (entry['project_id'], entry['task_id'], entry['employee_id'])
+        start_time: datetime = entry['start_time']
+        _accumulate(hourly, key + (start_time.replace(minute=0, second=0, microsecond=0),), seconds, sign)
+        _accumulate(daily, key + (start_time.date(),), seconds, sign)
+    _upsert(HourlyTimeRollup, 'bucket_start', hourly, employers)
+    _upsert(DailyTimeRollup, 'day', daily, employers)
+    mark_changed(db.session, employers=employers.values(), projects=project_ids,
+                 tasks={entry['task_id'] for entry in entries}, employees={entry['employee_id'] for entry in entries})
+
+
+def rebuild_time_rollups(employer_id: Optional[int] = None, since: Optional[date] = None) -> int:
+    """
+    Recompute the rollups from time_logs and commit.
+
+    Only the retained window is rebuilt: rollups of days before the TIME_LOG_RETENTION_MONTHS cutoff
+    keep their totals, since their time logs are gone. On PostgreSQL the rollup tables are locked in
+    SHARE ROW EXCLUSIVE mode for the whole rebuild, so ingestion (which adds to the rollups in its own
+    transaction) waits instead of being lost or counted twice; run it off-peak.
+
+    Args:
+        employer_id: Only rebuild this employer's projects (all projects if None)
+        since: Only rebuild days from this one on (default: the retention cutoff, or everything)
+
+    Returns:
+        The number of hourly buckets written
+
+    Raises:
+        ValueError: If since is before the retention cutoff
+    """
+    cutoff = retention_cutoff()
+    if since is not None and cutoff is not None and since < cutoff:
+        raise ValueError(f"Time logs before {cutoff.isoformat()} were removed by retention; their rollups cannot be rebuilt")
+    start = since or cutoff
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        hour_bucket = func.date_trunc('hour', TimeLog.start_time)
+    else:
+        hour_bucket = func.strftime('%Y-%m-%d %H:00:00', TimeLog.start_time)
+
+    stmt = (
+        select(TimeLog.project_id, TimeLog.task_id, TimeLog.employee_id, hour_bucket.label('bucket'),
+               Project.employer_id, func.sum(TimeLog.duration), func.count(TimeLog.id))
+        .join(Project, Project.id == TimeLog.project_id)
+        .group_by(TimeLog.project_id, TimeLog.task_id, TimeLog.employee_id, hour_bucket, Project.employer_id)
+    )
+    if employer_id is not None:
+        stmt = stmt.where(Project.employer_id == employer_id)
+    if start is not None:
+        stmt = stmt.where(TimeLog.start_time >= datetime.combine(start, datetime.min.time()))
+
+    buckets = 0
+    try:
+        if dialect == 'postgresql':
+            # Conflicts with the ROW EXCLUSIVE lock of ingestion's upserts, not with reads
+            tables = ', '.join(f'{model.__table__.schema}.{model.__tablename__}' for model in (HourlyTimeRollup, DailyTimeRollup))
+            db.session.execute(text(f'LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE'))
+        for model, bucket_column in ((HourlyTimeRollup, HourlyTimeRollup.bucket_start), (DailyTimeRollup, DailyTimeRollup.day)):
+            delete_query = model.query
+            if employer_id is not None:
+                delete_query = delete_query.filter(model.employer_id == employer_id)
+            if start is not None:
+                delete_query = delete_query.filter(bucket_column >= start)
+            delete_query.delete(synchronize_session=False)
+
+        result = db.session.execute(stmt.execution_options(yield_per=REBUILD_CHUNK_SIZE))
+        for chunk in result.partitions():
+            hourly: Dict[RollupKey, list] = {}
+            daily: Dict[RollupKey, list] = {}
+            employers: Dict[int, Optional[int]] = {}
+            for project_id, task_id, employee_id, bucket, owner_id, seconds, log_count in chunk:
+                if isinstance(bucket, str):
+                    bucket = datetime.strptime(bucket, '%Y-%m-%d %H:%M:%S')
+                employers[project_id] = owner_id
+                key = (project_id, task_id, employee_id)
+                _accumulate(hourly, key + (bucket,), int(seconds or 0), log_count)
+                _accumulate(daily, key + (bucket.date(),), int(seconds or 0), log_count)
+            _upsert(HourlyTimeRollup, 'bucket_start', hourly, employers)
+            _upsert(DailyTimeRollup, 'day', daily, employers)
+            buckets += len(hourly)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return buckets
+
+
+def _accumulate(buckets: Dict[RollupKey, list], key: RollupKey, seconds: int, log_count: int) -> None:
+    totals = buckets.setdefault(key, [0, 0])
+    totals[0] += seconds
+    totals[1] += log_count
+
+
+def _upsert(model: Type[db.Model], bucket_column: str, buckets: Dict[RollupKey, list],
+            employers: Dict[int, Optional[int]]) -> None:
+    """Add bucket totals to existing rollup rows with one INSERT ... ON CONFLICT DO UPDATE"""
+    if not buckets:
+        return
+    rows = [{
+        'project_id': project_id,
+        'task_id': task_id,
+        'employee_id': employee_id,
+        bucket_column: bucket,
+        'employer_id': employers.get(project_id),
+        'seconds': seconds,
+        'log_count': log_count
+    } for (project_id, task_id, employee_id, bucket), (seconds, log_count) in buckets.items()]
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+    stmt = insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['project_id', 'task_id', 'employee_id', bucket_column],
+        set_={
+            'employer_id': stmt.excluded.employer_id,
+            'seconds': model.seconds + stmt.excluded.seconds,
+            'log_count': model.log_count + stmt.excluded.log_count
+        }
+    )
+    db.session.execute(stmt)
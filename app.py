@@ -5,8 +5,20 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 from config import Config
 from database import db, init_db
-from storage import AzureStorage
+from storage import BlobStorage, create_storage
+from api.service.screenshot_uploader import ScreenshotUploader
+from api.service.screenshot_processor import ScreenshotProcessor
+from api.service.task_counter_folder import TaskCounterFolder
+from api.service.change_versions import ChangeVersions
+from api.service.dashboard_cache import DashboardCache
+from api.service.similarity_index import SimilarityIndex
+from api.service.read_urls import ReadUrlCache
+from api.service.device_bindings import DeviceBindingCache
+from api.service.email.outbox import EmailOutbox
+from api.service.read_replica import ReadReplica
+from api.service.time_log_partitions import ensure_time_log_partitions
 from flask_restx import Api
+from api.route_restx.request_memo import init_request_memo
 import sys
 
 # RESTx imports
@@ -54,11 +66,52 @@ def create_app_with_restx() -> Flask:
     restx_api.add_namespace(invite_ns, path='/api/invite')
     restx_api.add_namespace(activation_ns, path='/api/activation')
 
-    # Initialize Azure Storage
-    storage = AzureStorage(app)
-    init_azure_storage(storage)
-    app.extensions['azure_storage'] = storage
+    # Initialize blob storage (Azure or local filesystem, per STORAGE_BACKEND)
+    storage = create_storage(app)
+    init_blob_storage(storage)
+    app.extensions['blob_storage'] = storage
+
+    # Screenshot transcoding/thumbnails in a process pool (app.extensions['screenshot_processor'] when enabled);
+    # created before the uploader, which resumes spooled uploads at startup
+    ScreenshotProcessor(app)
+
+    # Background screenshot uploads (registers itself as app.extensions['screenshot_uploader'])
+    ScreenshotUploader(app)
+
+    # Folds task_time_deltas into tasks.minutes_spent when TASK_COUNTER_MODE is 'delta'
+    TaskCounterFolder(app)
+
+    # Sends queued transactional email over pooled SMTP connections (registers itself as app.extensions['email_outbox'])
+    EmailOutbox(app)
+
+    # Per employer/project/task/employee change versions behind ETags and the dashboard cache
+    ChangeVersions(app)
+
+    # Employer dashboard response cache (registers itself as app.extensions['dashboard_cache'])
+    DashboardCache(app)
+
+    # Perceptual-hash trees behind the similar screenshot queries (registers itself as app.extensions['similarity_index'])
+    SimilarityIndex(app)
+
+    # Batch-signed, cached screenshot read URLs for the gallery (registers itself as app.extensions['read_urls'])
+    ReadUrlCache(app)
+
+    # Employee device bindings checked by check_mac_address (registers itself as app.extensions['device_bindings'])
+    DeviceBindingCache(app)
+
+    # Routes the read-only endpoints to DB_REPLICA_URL while it keeps up (registers itself as app.extensions['read_replica'])
+    ReadReplica(app)
+
+    # Make sure upcoming time_logs partitions exist (no-op unless time_logs is partitioned on PostgreSQL)
+    with app.app_context():
+        try:
+            ensure_time_log_partitions()
+        except Exception as e:
+            app.logger.warning(f"Could not create time_logs partitions: {e}")
     
+    # X-Request-Memo-* debug headers (REQUEST_MEMO_DEBUG_HEADERS)
+    init_request_memo(app)
+
     # Add error handlers
     @app.errorhandler(Exception)
     def handle_error(error: Exception) -> Tuple[Dict[str, str], int]:
@@ -69,14 +122,16 @@ def create_app_with_restx() -> Flask:
 
     return app
 
-def init_azure_storage(storage: AzureStorage) -> None:
+def init_blob_storage(storage: BlobStorage) -> None:
     for container in CONTAINER_NAMES:
         storage.create_container(container)
 
-# Create the app instance
-app = create_app_with_restx()
-app.config['JWT_SECRET_KEY'] = 'super-secret'  # Change this in production
-jwt = JWTManager(app)  # Required initialization
+# Create the app instance, except in screenshot processing pool processes: they re-import the script run
+# with `python app.py` as __mp_main__, but only need api/service/screenshot_transcoding.py
+if __name__ != '__mp_main__':
+    app = create_app_with_restx()
+    app.config['JWT_SECRET_KEY'] = 'super-secret'  # Change this in production
+    jwt = JWTManager(app)  # Required initialization
 
 
 if __name__ == '__main__':
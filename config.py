@@ -39,6 +39,25 @@ class Config:
         basedir: str = os.path.abspath(os.path.dirname(__file__))
         SQLALCHEMY_DATABASE_URI: ClassVar[str] = f'sqlite:///{os.path.join(basedir, "app.db")}'
     
+    # PostgreSQL connection pool per engine and worker: pool_size + max_overflow connections at most,
+    # DB_POOL_TIMEOUT_SECONDS waiting for one; connections are recycled and pinged before reuse
+    DB_POOL_SIZE: ClassVar[int] = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW: ClassVar[int] = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT_SECONDS: ClassVar[float] = float(os.getenv('DB_POOL_TIMEOUT_SECONDS', '10'))
+    DB_POOL_RECYCLE_SECONDS: ClassVar[int] = int(os.getenv('DB_POOL_RECYCLE_SECONDS', '1800'))
+    DB_POOL_PRE_PING: ClassVar[bool] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_CONNECT_TIMEOUT_SECONDS: ClassVar[int] = int(os.getenv('DB_CONNECT_TIMEOUT_SECONDS', '5'))
+    # Limit on each statement run for an HTTP request (PostgreSQL, 0 disables it); background workers are not limited
+    DB_STATEMENT_TIMEOUT_MS: ClassVar[int] = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+
+    # Read replica for the read-only dashboard, listing and report endpoints (optional). Reads go to the
+    # primary while the replica lags more than DB_REPLICA_MAX_LAG_SECONDS, checked every DB_REPLICA_CHECK_SECONDS,
+    # and for DB_REPLICA_RETRY_SECONDS after it fails
+    DB_REPLICA_URL: ClassVar[Optional[str]] = os.getenv('DB_REPLICA_URL')
+    DB_REPLICA_MAX_LAG_SECONDS: ClassVar[float] = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', '5'))
+    DB_REPLICA_CHECK_SECONDS: ClassVar[float] = float(os.getenv('DB_REPLICA_CHECK_SECONDS', '5'))
+    DB_REPLICA_RETRY_SECONDS: ClassVar[float] = float(os.getenv('DB_REPLICA_RETRY_SECONDS', '30'))
+
     AZURE_STORAGE_ACCOUNT: ClassVar[Optional[str]] = os.getenv('AZURE_STORAGE_ACCOUNT')
     AZURE_STORAGE_KEY: ClassVar[Optional[str]] = os.getenv('AZURE_STORAGE_KEY')
     AZURE_CONTAINER_NAME: ClassVar[Optional[str]] = os.getenv('AZURE_CONTAINER_NAME')
@@ -51,6 +70,103 @@ class Config:
         connect_str: str = f"DefaultEndpointsProtocol=https;AccountName={Config.AZURE_STORAGE_ACCOUNT};AccountKey={Config.AZURE_STORAGE_KEY};EndpointSuffix=core.windows.net"
         return BlobServiceClient.from_connection_string(connect_str)
     
+    # Blob storage backend: 'azure' or 'local' (filesystem under LOCAL_STORAGE_DIR, for offline runs and load tests)
+    STORAGE_BACKEND: ClassVar[str] = os.getenv('STORAGE_BACKEND', 'azure')
+    LOCAL_STORAGE_DIR: ClassVar[str] = os.getenv('LOCAL_STORAGE_DIR') or os.path.join(os.path.abspath(os.path.dirname(__file__)), 'var', 'blobs')
+    # URL prefix of local blobs in image_url (e.g. an nginx location aliased to LOCAL_STORAGE_DIR)
+    LOCAL_STORAGE_BASE_URL: ClassVar[str] = os.getenv('LOCAL_STORAGE_BASE_URL', '/blobs')
+    # Signed-upload endpoint of the local backend (target of its direct upload URLs)
+    LOCAL_STORAGE_UPLOAD_URL: ClassVar[str] = os.getenv('LOCAL_STORAGE_UPLOAD_URL', '/api/timelogs/blob-uploads')
+    # Signed-read endpoint of the local backend (target of its gallery read URLs)
+    LOCAL_STORAGE_READ_URL: ClassVar[str] = os.getenv('LOCAL_STORAGE_READ_URL', '/api/timelogs/blob-reads')
+    LOCAL_STORAGE_FSYNC: ClassVar[bool] = os.getenv('LOCAL_STORAGE_FSYNC', 'true').lower() == 'true'
+
+    # Shared blob storage HTTP client: keep-alive pool size (>= SCREENSHOT_UPLOAD_WORKERS) and timeouts in seconds
+    AZURE_STORAGE_POOL_SIZE: ClassVar[int] = int(os.getenv('AZURE_STORAGE_POOL_SIZE', '16'))
+    AZURE_STORAGE_CONNECT_TIMEOUT: ClassVar[float] = float(os.getenv('AZURE_STORAGE_CONNECT_TIMEOUT', '10'))
+    AZURE_STORAGE_READ_TIMEOUT: ClassVar[float] = float(os.getenv('AZURE_STORAGE_READ_TIMEOUT', '60'))
+    # Block size of staged uploads: the most screenshot bytes one upload holds in memory
+    AZURE_STORAGE_BLOCK_BYTES: ClassVar[int] = int(os.getenv('AZURE_STORAGE_BLOCK_BYTES', str(4 * 1024 * 1024)))
+
+    # Lifetime of the direct upload URLs handed to agents, and the largest screenshot accepted (either upload path)
+    SCREENSHOT_UPLOAD_URL_TTL_SECONDS: ClassVar[int] = int(os.getenv('SCREENSHOT_UPLOAD_URL_TTL_SECONDS', '300'))
+    SCREENSHOT_MAX_BYTES: ClassVar[int] = int(os.getenv('SCREENSHOT_MAX_BYTES', str(10 * 1024 * 1024)))
+
+    # Screenshot gallery read URLs: lifetime, how long before expiry a cached URL is re-signed, per-worker cache size
+    SCREENSHOT_READ_URL_TTL_SECONDS: ClassVar[int] = int(os.getenv('SCREENSHOT_READ_URL_TTL_SECONDS', '900'))
+    SCREENSHOT_READ_URL_REFRESH_SECONDS: ClassVar[int] = int(os.getenv('SCREENSHOT_READ_URL_REFRESH_SECONDS', '120'))
+    SCREENSHOT_READ_URL_CACHE_MAX_ENTRIES: ClassVar[int] = int(os.getenv('SCREENSHOT_READ_URL_CACHE_MAX_ENTRIES', '50000'))
+
+    # Screenshot upload pipeline (bytes are spooled locally and drained to blob storage in the background)
+    SCREENSHOT_SPOOL_DIR: ClassVar[str] = os.getenv('SCREENSHOT_SPOOL_DIR', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'spool', 'screenshots'))
+    SCREENSHOT_UPLOAD_WORKERS: ClassVar[int] = int(os.getenv('SCREENSHOT_UPLOAD_WORKERS', '4'))
+    SCREENSHOT_SPOOL_MAX_PENDING: ClassVar[int] = int(os.getenv('SCREENSHOT_SPOOL_MAX_PENDING', '1000'))
+    SCREENSHOT_UPLOAD_MAX_ATTEMPTS: ClassVar[int] = int(os.getenv('SCREENSHOT_UPLOAD_MAX_ATTEMPTS', '5'))
+    SCREENSHOT_UPLOAD_RETRY_BACKOFF_SECONDS: ClassVar[float] = float(os.getenv('SCREENSHOT_UPLOAD_RETRY_BACKOFF_SECONDS', '2'))
+    # Spooled files without metadata (their time log was never committed) older than this are deleted at startup
+    SCREENSHOT_SPOOL_ORPHAN_SECONDS: ClassVar[int] = int(os.getenv('SCREENSHOT_SPOOL_ORPHAN_SECONDS', '3600'))
+
+    # Screenshot processing (needs Pillow): transcode to webp/jpeg and render thumbnails of these widths in a process pool
+    SCREENSHOT_PROCESSING_ENABLED: ClassVar[bool] = os.getenv('SCREENSHOT_PROCESSING_ENABLED', 'false').lower() == 'true'
+    SCREENSHOT_PROCESSING_WORKERS: ClassVar[int] = int(os.getenv('SCREENSHOT_PROCESSING_WORKERS', '2'))
+    SCREENSHOT_PROCESSING_TIMEOUT_SECONDS: ClassVar[float] = float(os.getenv('SCREENSHOT_PROCESSING_TIMEOUT_SECONDS', '60'))
+    SCREENSHOT_IMAGE_FORMAT: ClassVar[str] = os.getenv('SCREENSHOT_IMAGE_FORMAT', 'webp')
+    SCREENSHOT_IMAGE_QUALITY: ClassVar[int] = int(os.getenv('SCREENSHOT_IMAGE_QUALITY', '80'))
+    SCREENSHOT_THUMBNAIL_WIDTHS: ClassVar[str] = os.getenv('SCREENSHOT_THUMBNAIL_WIDTHS', '320,160')
+
+    # Task time counters: 'atomic' (SQL increment of tasks.minutes_spent) or 'delta' (append to task_time_deltas)
+    TASK_COUNTER_MODE: ClassVar[str] = os.getenv('TASK_COUNTER_MODE', 'atomic')
+    TASK_COUNTER_FOLD_INTERVAL_SECONDS: ClassVar[float] = float(os.getenv('TASK_COUNTER_FOLD_INTERVAL_SECONDS', '5'))
+
+    # time_logs partitioning (PostgreSQL only): months of partitions created ahead, and retention (0 keeps everything)
+    TIME_LOG_PARTITION_MONTHS_AHEAD: ClassVar[int] = int(os.getenv('TIME_LOG_PARTITION_MONTHS_AHEAD', '3'))
+    TIME_LOG_RETENTION_MONTHS: ClassVar[int] = int(os.getenv('TIME_LOG_RETENTION_MONTHS', '0'))
+    TIME_LOG_RETENTION_ACTION: ClassVar[str] = os.getenv('TIME_LOG_RETENTION_ACTION', 'detach')  # 'detach' or 'drop'
+
+    # Redis shared by all workers (optional): change versions for ETags/caches, and the 'redis' dashboard cache
+    REDIS_URL: ClassVar[Optional[str]] = os.getenv('REDIS_URL')
+
+    # Employer dashboard response cache: 'memory' (per-worker LRU), 'redis' (shared, needs REDIS_URL) or 'none'
+    DASHBOARD_CACHE_BACKEND: ClassVar[str] = os.getenv('DASHBOARD_CACHE_BACKEND', 'memory')
+    DASHBOARD_CACHE_TTL_SECONDS: ClassVar[float] = float(os.getenv('DASHBOARD_CACHE_TTL_SECONDS', '30'))
+    DASHBOARD_CACHE_MAX_ENTRIES: ClassVar[int] = int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', '1024'))
+
+    # Per-worker BK-trees of an employee's screenshot hashes for one day (similar screenshot queries)
+    # Trees are updated as time logs arrive; the TTL only paces the look for hashes filled in later
+    SIMILARITY_INDEX_TTL_SECONDS: ClassVar[float] = float(os.getenv('SIMILARITY_INDEX_TTL_SECONDS', '60'))
+    SIMILARITY_INDEX_IDLE_SECONDS: ClassVar[float] = float(os.getenv('SIMILARITY_INDEX_IDLE_SECONDS', '3600'))
+    SIMILARITY_INDEX_MAX_ENTRIES: ClassVar[int] = int(os.getenv('SIMILARITY_INDEX_MAX_ENTRIES', '256'))
+
+    # Conditional GETs: ETags also rotate after this many seconds, bounding staleness the version counters miss
+    ETAG_MAX_AGE_SECONDS: ClassVar[float] = float(os.getenv('ETAG_MAX_AGE_SECONDS', '60'))
+
+    # check_mac_address: per-worker cache of employee device bindings (0 disables caching)
+    DEVICE_BINDING_CACHE_TTL_SECONDS: ClassVar[float] = float(os.getenv('DEVICE_BINDING_CACHE_TTL_SECONDS', '30'))
+    DEVICE_BINDING_CACHE_MAX_ENTRIES: ClassVar[int] = int(os.getenv('DEVICE_BINDING_CACHE_MAX_ENTRIES', '10000'))
+
+    # Add X-Request-Memo-Loads / X-Request-Memo-Avoided headers reporting per-request entity memoization
+    REQUEST_MEMO_DEBUG_HEADERS: ClassVar[bool] = os.getenv('REQUEST_MEMO_DEBUG_HEADERS', 'false').lower() == 'true'
+
+    # SMTP server for transactional email; SMTP_SECURITY: 'starttls', 'ssl' or 'none' (local SMTP sinks)
+    SMTP_SERVER: ClassVar[Optional[str]] = os.getenv('SMTP_SERVER')
+    SMTP_PORT: ClassVar[int] = int(os.getenv('SMTP_PORT') or '587')
+    SMTP_USER: ClassVar[Optional[str]] = os.getenv('SMTP_USER')
+    SMTP_PASSWORD: ClassVar[Optional[str]] = os.getenv('SMTP_PASSWORD')
+    SMTP_SECURITY: ClassVar[str] = os.getenv('SMTP_SECURITY') or ('starttls' if os.getenv('SMTP_USE_TLS', 'true').lower() == 'true' else 'ssl')
+    SMTP_TIMEOUT_SECONDS: ClassVar[float] = float(os.getenv('SMTP_TIMEOUT_SECONDS', '30'))
+    # Close the pooled SMTP connection after this long without mail (servers drop idle connections)
+    SMTP_CONNECTION_IDLE_SECONDS: ClassVar[float] = float(os.getenv('SMTP_CONNECTION_IDLE_SECONDS', '60'))
+    EMAIL_FROM: ClassVar[Optional[str]] = os.getenv('EMAIL_FROM')
+
+    # Email outbox: emails are queued in the database and sent by a background thread in each worker
+    EMAIL_OUTBOX_ENABLED: ClassVar[bool] = os.getenv('EMAIL_OUTBOX_ENABLED', 'true').lower() == 'true'
+    EMAIL_OUTBOX_BATCH_SIZE: ClassVar[int] = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+    EMAIL_OUTBOX_POLL_SECONDS: ClassVar[float] = float(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', '5'))
+    EMAIL_OUTBOX_MAX_ATTEMPTS: ClassVar[int] = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+    EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS: ClassVar[float] = float(os.getenv('EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS', '30'))
+    # Emails claimed longer ago than this by a sender that never reported back are sent again
+    EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS: ClassVar[float] = float(os.getenv('EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS', '600'))
+
     @classmethod
     def is_production(cls) -> bool:
         return cls.POSTGRES_SERVER is not None
@@ -17,4 +17,23 @@ ALLOWED_ADMIN_EMAILS: List[str] = [
 SCREENSHOT_STORAGE_CONTAINER: str = 'screenshots'
 
 CONTAINER_NAMES = [ SCREENSHOT_STORAGE_CONTAINER ]
-# Add more constants below as needed
\ No newline at end of file
+# Add more constants below as needed
+
+# Time log ingestion
+TIME_LOG_BATCH_MAX_ITEMS: int = 500  # Maximum intervals accepted by /api/timelogs/batch
+TIME_LOG_FORM_OVERHEAD_BYTES: int = 64 * 1024  # Allowance for the form fields sent with a screenshot upload
+
+# Employee invitations
+ACTIVATION_TOKEN_EXPIRY_HOURS: int = 24
+INVITE_IMPORT_MAX_ROWS: int = 10000  # Maximum people per /api/invite/invite-employees import
+
+# Employee assignments
+ASSIGNMENT_MAX_IDS: int = 1000  # Maximum employee, project or task ids per /api/employees/assignments request
+
+# Screenshot gallery
+SCREENSHOT_GALLERY_DEFAULT_PAGE_SIZE: int = 50
+SCREENSHOT_GALLERY_MAX_PAGE_SIZE: int = 200
+
+# Similar screenshots (Hamming distance between 64-bit perceptual hashes)
+SIMILAR_SCREENSHOT_DEFAULT_DISTANCE: int = 10
+SIMILAR_SCREENSHOT_MAX_DISTANCE: int = 24  # Beyond this most screenshots of a day match each other
@@ -1,11 +1,109 @@
 import os
-from flask import Flask
-from typing import Optional
+import threading
+import time
+from flask import Flask, current_app, has_request_context
+from typing import Any, Dict, Optional
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc as sa_exc
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Bind key of the optional read replica (DB_REPLICA_URL)
+REPLICA_BIND_KEY = 'replica'
+# session.info keys: send this request's SELECTs to the replica / a replica connection was used
+READ_REPLICA_KEY = 'read_replica'
+REPLICA_USED_KEY = 'read_replica_used'
+
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs to the read replica while READ_REPLICA_KEY is set in session.info
+    (see api/service/read_replica.py). Flushes, INSERT/UPDATE/DELETE and SELECT ... FOR UPDATE go to
+    the primary, and after the first write the rest of the request reads from the primary too, so it
+    sees its own writes.
+    """
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, bind: Any = None, **kwargs: Any) -> Any:
+        if bind is None and self.info.get(READ_REPLICA_KEY):
+            if self._flushing or getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None) is not None:
+                self.info[READ_REPLICA_KEY] = False
+            elif getattr(clause, 'is_select', False):
+                engine = self._db.engines.get(REPLICA_BIND_KEY)
+                if engine is not None:
+                    self.info[REPLICA_USED_KEY] = True
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection (a free one, or a new one within max_overflow)"""
+
+    # Checkouts waiting at least this long are counted as slow
+    SLOW_CHECKOUT_SECONDS = 0.05
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats: Dict[str, Any] = {'checkouts': 0, 'slow_checkouts': 0, 'timeouts': 0,
+                                               'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                stats = self.checkout_stats
+                stats['checkouts'] += 1
+                stats['timeouts'] += timed_out
+                stats['slow_checkouts'] += wait >= self.SLOW_CHECKOUT_SECONDS
+                stats['wait_seconds_total'] += wait
+                stats['wait_seconds_max'] = max(stats['wait_seconds_max'], wait)
+
 
 # Create a global SQLAlchemy instance
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def engine_options(config: Any, url: str) -> Dict[str, Any]:
+    """
+    Pool options of a PostgreSQL engine from the DB_* settings (SQLite keeps SQLAlchemy's defaults).
+
+    :param config: Flask config
+    :param url: Database URL the options are for
+    """
+    if not url.startswith('postgresql'):
+        return {}
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT_SECONDS'],
+        'pool_recycle': config['DB_POOL_RECYCLE_SECONDS'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'connect_args': {'connect_timeout': config['DB_CONNECT_TIMEOUT_SECONDS']}
+    }
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Connection pool state and checkout waits of every engine of this worker (needs an app context)"""
+    stats = {}
+    for bind_key, engine in db.engines.items():
+        pool = engine.pool
+        entry: Dict[str, Any] = {'pool': type(pool).__name__, 'status': pool.status()}
+        if isinstance(pool, TimedQueuePool):
+            with pool._stats_lock:
+                checkouts = dict(pool.checkout_stats)
+            checkouts['wait_seconds_avg'] = checkouts['wait_seconds_total'] / checkouts['checkouts'] if checkouts['checkouts'] else None
+            entry.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow(), **checkouts)
+        stats[bind_key or 'primary'] = entry
+    return stats
 
 def init_db(app: Flask) -> SQLAlchemy:
     """
@@ -39,5 +137,59 @@ def init_db(app: Flask) -> SQLAlchemy:
         basedir: str = os.path.abspath(os.path.dirname(__file__))
         app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "app.db")}'
     
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI']))
+    replica_url: Optional[str] = app.config.get('DB_REPLICA_URL')
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND_KEY] = {'url': replica_url, **engine_options(app.config, replica_url)}
+    
     db.init_app(app)
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        register_sqlite_schema(app)
+    register_statement_timeout()
     return db
+
+def register_sqlite_schema(app: Flask, schema: str = 'mercor') -> None:
+    """
+    Attach an in-file database named after the schema to every SQLite connection,
+    so models declared with {'schema': 'mercor'} also work in local development.
+    
+    :param app: Flask application instance already initialized with db
+    :param schema: Schema name used by the models
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                _attach_schema(engine, schema)
+
+
+def _attach_schema(engine: Engine, schema: str) -> None:
+    database_path: Optional[str] = engine.url.database
+    schema_path: str = ':memory:' if not database_path or database_path == ':memory:' else f'{database_path}.{schema}'
+
+    @event.listens_for(engine, 'connect')
+    def attach_schema(dbapi_connection, connection_record) -> None:
+        dbapi_connection.execute(f"ATTACH DATABASE '{schema_path}' AS {schema}")
+
+
+_statement_timeout_registered = False
+
+
+def register_statement_timeout() -> None:
+    """
+    Limit each statement run for an HTTP request to DB_STATEMENT_TIMEOUT_MS (PostgreSQL, 0 disables it)
+    with SET LOCAL at the start of every request transaction, on the primary and the replica.
+    Background workers (uploads, outbox, counter folding) have no request context and no limit.
+    """
+    global _statement_timeout_registered
+    if _statement_timeout_registered:
+        return
+    event.listen(RoutingSession, 'after_begin', _set_statement_timeout)
+    _statement_timeout_registered = True
+
+
+def _set_statement_timeout(session: Session, transaction: Any, connection: Any) -> None:
+    if not has_request_context() or connection.dialect.name != 'postgresql':
+        return
+    timeout_ms = int(current_app.config.get('DB_STATEMENT_TIMEOUT_MS') or 0)
+    if timeout_ms > 0:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {timeout_ms}')
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+import argparse
+import os
+import sys
+
+# Add project root to path so we can import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app_with_restx
+from api.service.time_log_partitions import (
+    apply_time_log_retention, convert_time_logs_to_partitioned, ensure_time_log_partitions, is_partitioning_supported
+)
+
+def main() -> int:
+    """
+    Maintain the monthly time_logs partitions (schedule 'maintain' daily, e.g. from cron).
+
+      convert   one-time migration of a plain time_logs table to a partitioned one (PostgreSQL)
+      maintain  create upcoming partitions and apply TIME_LOG_RETENTION_MONTHS
+    """
+    parser = argparse.ArgumentParser(description='Maintain the monthly time_logs partitions')
+    parser.add_argument('command', choices=['convert', 'maintain'])
+    parser.add_argument('--months-ahead', type=int, default=None, help='Partitions to create ahead (default: TIME_LOG_PARTITION_MONTHS_AHEAD)')
+    parser.add_argument('--retain-months', type=int, default=None, help='Months of logs to keep (default: TIME_LOG_RETENTION_MONTHS)')
+    parser.add_argument('--action', choices=['detach', 'drop'], default=None, help='What to do with expired partitions (default: TIME_LOG_RETENTION_ACTION)')
+    args = parser.parse_args()
+
+    app = create_app_with_restx()
+    with app.app_context():
+        if args.command == 'convert':
+            if not is_partitioning_supported():
+                print("time_logs partitioning requires PostgreSQL; SQLite keeps a plain table.")
+                return 1
+            convert_time_logs_to_partitioned(args.months_ahead)
+            print("time_logs is partitioned by start_time month.")
+            return 0
+        created = ensure_time_log_partitions(args.months_ahead)
+        removed = apply_time_log_retention(args.retain_months, args.action)
+        print(f"Created partitions: {', '.join(created) or 'none'}")
+        print(f"Expired partitions: {', '.join(removed) or 'none'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
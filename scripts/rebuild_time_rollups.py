@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+import argparse
+import os
+import sys
+from datetime import date
+from typing import Optional
+
+# Add project root to path so we can import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app_with_restx
+from api.service.time_rollups import rebuild_time_rollups
+
+def main() -> int:
+    """Rebuild (or backfill) the hourly/daily time rollups from time_logs"""
+    parser = argparse.ArgumentParser(description='Rebuild the hourly and daily time rollup tables from time_logs')
+    parser.add_argument('--employer-id', type=int, default=None, help='Only rebuild this employer (default: all)')
+    parser.add_argument('--since', type=date.fromisoformat, default=None,
+                        help='Only rebuild days from this YYYY-MM-DD on (default: the TIME_LOG_RETENTION_MONTHS cutoff)')
+    args = parser.parse_args()
+    employer_id: Optional[int] = args.employer_id
+
+    app = create_app_with_restx()
+    with app.app_context():
+        try:
+            buckets = rebuild_time_rollups(employer_id, args.since)
+        except ValueError as e:
+            print(e)
+            return 1
+    scope = f"employer {employer_id}" if employer_id is not None else "all employers"
+    print(f"Rebuilt time rollups for {scope}: {buckets} hourly buckets written.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
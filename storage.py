@@ -1,72 +1,659 @@
-from azure.storage.blob import BlobServiceClient
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobBlock, BlobSasPermissions, BlobServiceClient, ContentSettings, generate_blob_sas
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from flask import Response, current_app, send_file
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from urllib.parse import quote
+import base64
+import mmap
 import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+STORAGE_BACKENDS = ('azure', 'local')
+
+# Lifetime of the user delegation key that signs read URLs when Azure is reached with a token credential
+USER_DELEGATION_KEY_LIFETIME = timedelta(hours=12)
+
+
+class StorageCounters:
+    """Thread-safe counters for blob storage calls"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {
+            'uploads': 0,
+            'upload_failures': 0,
+            'upload_seconds_total': 0.0,
+            'upload_seconds_max': 0.0,
+            'blocks_staged': 0,
+            'container_checks': 0,
+            'containers_created': 0,
+            'connections_opened': 0,
+            'read_urls_signed': 0,
+            'signing_keys_fetched': 0
+        }
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.values[name] += amount
+
+    def observe_upload(self, seconds):
+        with self._lock:
+            self.values['uploads'] += 1
+            self.values['upload_seconds_total'] += seconds
+            self.values['upload_seconds_max'] = max(self.values['upload_seconds_max'], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self.values)
+        values['upload_seconds_avg'] = values['upload_seconds_total'] / values['uploads'] if values['uploads'] else None
+        return values
+
+
+def _counting_pool(pool_class, counters):
+    """Connection pool class that counts the connections it opens"""
+    class CountingPool(pool_class):
+        def _new_conn(self):
+            counters.add('connections_opened')
+            return super()._new_conn()
+    return CountingPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTP adapter with a sized keep-alive pool; retries are left to the Azure SDK pipeline"""
+
+    def __init__(self, counters, pool_size):
+        self.counters = counters
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size,
+                         max_retries=Retry(total=False, redirect=False, raise_on_status=False))
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.counters),
+            'https': _counting_pool(HTTPSConnectionPool, self.counters)
+        }
+
+
+class BlobStorage:
+    """
+    Blob storage backend interface (app.extensions['blob_storage']).
+
+    Blobs are addressed by container and blob name; upload_file and blob_url return the URL stored
+    on the time log. Missing blobs raise FileNotFoundError from send_blob and delete_file.
+    """
+
+    backend = None
+
+    def create_container(self, container_name):
+        raise NotImplementedError
+
+    def ensure_container(self, container_name):
+        raise NotImplementedError
+
+    def upload_file(self, container_name, blob_name, file_data, content_type=None):
+        raise NotImplementedError
+
+    def delete_file(self, container_name, blob_name):
+        raise NotImplementedError
+
+    def send_blob(self, container_name, blob_name):
+        """Flask response streaming the blob's bytes"""
+        raise NotImplementedError
+
+    def create_upload_url(self, container_name, blob_name, expires_in, content_type=None, max_bytes=None):
+        """
+        Short-lived URL a client can PUT the blob's bytes to without going through the API.
+        Returns {'url', 'method', 'headers'}; headers must be sent with the PUT.
+        """
+        raise NotImplementedError
+
+    def create_read_urls(self, container_name, blob_names, expires_in):
+        """
+        Short-lived read-only URLs for many blobs of one container, signed in one call.
+        Returns {blob_name: url}.
+        """
+        raise NotImplementedError
+
+    def blob_size(self, container_name, blob_name):
+        """Size in bytes of a stored blob, or None when it does not exist"""
+        raise NotImplementedError
+
+    def download_file(self, container_name, blob_name, out):
+        """Write a blob's bytes to the binary file object out"""
+        raise NotImplementedError
+
+    def copy_blob(self, container_name, source_blob_name, blob_name):
+        """
+        Copy a blob, with its content type, to a new name in the same container and return its URL.
+        Raises FileNotFoundError when the source does not exist.
+        """
+        raise NotImplementedError
+
+    def blob_url(self, container_name, blob_name):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class AzureStorage(BlobStorage):
+    """
+    Process-wide Azure Blob Storage client.
+
+    One BlobServiceClient with a pooled HTTP session is shared by every request and background
+    upload. Containers are checked once (at startup or on first use) and again only after a
+    ContainerNotFound error, not before every upload. File uploads larger than one block are
+    staged in AZURE_STORAGE_BLOCK_BYTES blocks, so an upload holds at most one block in memory.
+    """
+
+    backend = 'azure'
+    # Lifetime of the read SAS through which copy_blob's source is fetched by the service
+    COPY_SOURCE_URL_SECONDS = 300
 
-class AzureStorage:
     def __init__(self, app=None):
         self.blob_service_client = None
+        self.block_size = 4 * 1024 * 1024
+        self.counters = StorageCounters()
+        self._known_containers = set()
+        self._containers_lock = threading.Lock()
+        self._delegation_key = None
+        self._delegation_key_expiry = None
+        self._delegation_key_lock = threading.Lock()
         if app:
             self.init_app(app)
 
     def init_app(self, app):
         """Initialize Azure Blob Storage with Flask app configuration."""
+        self.block_size = app.config.get('AZURE_STORAGE_BLOCK_BYTES', self.block_size)
         connection_string = app.config.get('AZURE_STORAGE_CONNECTION_STRING')
-        if connection_string:
-            self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-        else:
+        if not connection_string:
             account_name = app.config.get('AZURE_STORAGE_ACCOUNT')
             account_key = app.config.get('AZURE_STORAGE_KEY')
             if account_name and account_key:
-                conn_str = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
-                self.blob_service_client = BlobServiceClient.from_connection_string(conn_str)
+                connection_string = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
+        if connection_string:
+            self.blob_service_client = BlobServiceClient.from_connection_string(
+                connection_string, transport=self._create_transport(app)
+            )
+
+    def _create_transport(self, app):
+        session = Session()
+        adapter = PooledHTTPAdapter(self.counters, app.config.get('AZURE_STORAGE_POOL_SIZE', 16))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return RequestsTransport(
+            session=session,
+            session_owner=False,
+            connection_timeout=app.config.get('AZURE_STORAGE_CONNECT_TIMEOUT', 10),
+            read_timeout=app.config.get('AZURE_STORAGE_READ_TIMEOUT', 60)
+        )
 
     def create_container(self, container_name):
         """Create a container in Azure Blob Storage."""
         if not self.blob_service_client:
             raise Exception("Azure Storage not configured")
         container_client = self.blob_service_client.get_container_client(container_name)
+        self.counters.add('container_checks')
         # check if container exists
         try:
             container_client.get_container_properties()
             print(f"Container '{container_name}' already exists.")
-            return
-        except Exception as e:
-            if "404" not in str(e):
-                print(f"Error checking container: {e}")
+        except ResourceNotFoundError:
+            try:
+                container_client.create_container()
+                self.counters.add('containers_created')
+            except ResourceExistsError:
+                pass
+            except Exception as e:
+                print(f"Error creating container: {e}")
                 raise
-        try:
-            container_client.create_container()
         except Exception as e:
-            print(f"Error creating container: {e}")
+            print(f"Error checking container: {e}")
             raise
-    
-    def get_container_client(self, container_name):
-        """Get a container client for the specified container."""
-        # Create the container if it doesn't exist
-        container_client = self.blob_service_client.get_container_client(container_name)
-        return container_client
-    
-    def upload_file(self, container_name, blob_name, data):
-        """Upload a file to Azure Blob Storage."""
-        
-        container_client = self.get_container_client(container_name)
-        # Upload the file
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.upload_blob(data, overwrite=True)
-        return blob_client.url
+        with self._containers_lock:
+            self._known_containers.add(container_name)
 
-    def download_file(self, container_name, blob_name):
-        """Download a file from Azure Blob Storage."""
-        container_client = self.get_container_client(container_name)
+    def ensure_container(self, container_name):
+        """Create the container unless it is already known to exist."""
+        if container_name not in self._known_containers:
+            self.create_container(container_name)
 
-        container_client = self.blob_service_client.get_container_client(container_name)
-        blob_client = container_client.get_blob_client(blob_name)
-        return blob_client.download_blob().readall()
+    def upload_file(self, container_name, blob_name, file_data, content_type=None):
+        """
+        Upload a blob and return its URL, creating the container once if it is missing.
+        file_data can be bytes or a readable file object.
+        """
+        if not self.blob_service_client:
+            raise Exception("Azure Storage not configured")
+        self.ensure_container(container_name)
+        blob_client = self.blob_service_client.get_blob_client(container_name, blob_name)
+        content_settings = ContentSettings(content_type=content_type) if content_type else None
+        started = time.perf_counter()
+        try:
+            try:
+                self._put_blob(blob_client, file_data, content_settings)
+            except ResourceNotFoundError as e:
+                if e.error_code != 'ContainerNotFound':
+                    raise
+                # The container was deleted behind our back: check it again and retry once
+                with self._containers_lock:
+                    self._known_containers.discard(container_name)
+                self.ensure_container(container_name)
+                if hasattr(file_data, 'seek'):
+                    file_data.seek(0)
+                self._put_blob(blob_client, file_data, content_settings)
+        except Exception:
+            self.counters.add('upload_failures')
+            raise
+        self.counters.observe_upload(time.perf_counter() - started)
+        return blob_client.url
+
+    def _put_blob(self, blob_client, file_data, content_settings):
+        """
+        Upload bytes in one request; read file objects one block at a time, staging the blocks
+        and committing the block list when the data does not fit in a single block.
+        """
+        if isinstance(file_data, (bytes, bytearray, memoryview)):
+            blob_client.upload_blob(file_data, overwrite=True, content_settings=content_settings)
+            return
+        block = file_data.read(self.block_size)
+        if len(block) < self.block_size:
+            blob_client.upload_blob(block, overwrite=True, content_settings=content_settings)
+            return
+        block_list = []
+        while block:
+            block_id = base64.b64encode(f'{len(block_list):08d}'.encode()).decode()
+            blob_client.stage_block(block_id, block, length=len(block))
+            self.counters.add('blocks_staged')
+            block_list.append(BlobBlock(block_id=block_id))
+            block = file_data.read(self.block_size)
+        blob_client.commit_block_list(block_list, content_settings=content_settings)
 
     def delete_file(self, container_name, blob_name):
-        """Delete a file from Azure Blob Storage."""
+        """Delete a blob."""
+        try:
+            self.blob_service_client.get_blob_client(container_name, blob_name).delete_blob()
+        except ResourceNotFoundError as e:
+            raise FileNotFoundError(f"{container_name}/{blob_name}") from e
+
+    def send_blob(self, container_name, blob_name):
+        """Stream a blob through this worker in chunks."""
         if not self.blob_service_client:
             raise Exception("Azure Storage not configured")
-        
-        container_client = self.blob_service_client.get_container_client(container_name)
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.delete_blob()
+        try:
+            download = self.blob_service_client.get_blob_client(container_name, blob_name).download_blob()
+        except ResourceNotFoundError as e:
+            raise FileNotFoundError(f"{container_name}/{blob_name}") from e
+        content_type = download.properties.content_settings.content_type or 'application/octet-stream'
+        return Response(download.chunks(), mimetype=content_type, headers={'Content-Length': str(download.size)})
+
+    def create_upload_url(self, container_name, blob_name, expires_in, content_type=None, max_bytes=None):
+        """
+        Blob SAS URL allowing only create/write of this one blob until it expires.
+        Azure cannot cap the size of a SAS upload; callers check blob_size afterwards.
+        """
+        if not self.blob_service_client:
+            raise Exception("Azure Storage not configured")
+        credential = self.blob_service_client.credential
+        if not getattr(credential, 'account_key', None):
+            raise Exception("Upload URLs need an account key credential")
+        self.ensure_container(container_name)
+        blob_client = self.blob_service_client.get_blob_client(container_name, blob_name)
+        sas = generate_blob_sas(
+            account_name=credential.account_name,
+            container_name=container_name,
+            blob_name=blob_name,
+            account_key=credential.account_key,
+            permission=BlobSasPermissions(create=True, write=True),
+            expiry=datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+        )
+        headers = {'x-ms-blob-type': 'BlockBlob'}
+        if content_type:
+            headers['x-ms-blob-content-type'] = content_type
+        return {'url': f"{blob_client.url}?{sas}", 'method': 'PUT', 'headers': headers}
+
+    def create_read_urls(self, container_name, blob_names, expires_in):
+        """
+        Read-only blob SAS URLs, signed locally with one key: the account key, or a user delegation
+        key fetched once and reused until it would expire before the URLs do. No request per blob.
+        """
+        if not self.blob_service_client:
+            raise Exception("Azure Storage not configured")
+        expiry = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+        credential = self.blob_service_client.credential
+        if getattr(credential, 'account_key', None):
+            signing_key = {'account_key': credential.account_key}
+        else:
+            signing_key = {'user_delegation_key': self._user_delegation_key(expiry)}
+        permission = BlobSasPermissions(read=True)
+        container_url = self.blob_service_client.get_container_client(container_name).url
+        urls = {}
+        for blob_name in blob_names:
+            sas = generate_blob_sas(
+                account_name=self.blob_service_client.account_name,
+                container_name=container_name,
+                blob_name=blob_name,
+                permission=permission,
+                expiry=expiry,
+                **signing_key
+            )
+            urls[blob_name] = f"{container_url}/{quote(blob_name, safe='/~')}?{sas}"
+        self.counters.add('read_urls_signed', len(urls))
+        return urls
+
+    def _user_delegation_key(self, valid_until):
+        """User delegation key valid until at least valid_until (one request per USER_DELEGATION_KEY_LIFETIME)"""
+        with self._delegation_key_lock:
+            if self._delegation_key is None or self._delegation_key_expiry <= valid_until:
+                start = datetime.now(timezone.utc) - timedelta(minutes=5)
+                expiry = max(start + USER_DELEGATION_KEY_LIFETIME, valid_until + timedelta(minutes=5))
+                self._delegation_key = self.blob_service_client.get_user_delegation_key(start, expiry)
+                self._delegation_key_expiry = expiry
+                self.counters.add('signing_keys_fetched')
+            return self._delegation_key
+
+    def blob_size(self, container_name, blob_name):
+        """Size of a blob from its properties (one HEAD request)."""
+        if not self.blob_service_client:
+            raise Exception("Azure Storage not configured")
+        try:
+            return self.blob_service_client.get_blob_client(container_name, blob_name).get_blob_properties().size
+        except ResourceNotFoundError:
+            return None
+
+    def download_file(self, container_name, blob_name, out):
+        """Stream a blob into out chunk by chunk."""
+        if not self.blob_service_client:
+            raise Exception("Azure Storage not configured")
+        try:
+            self.blob_service_client.get_blob_client(container_name, blob_name).download_blob().readinto(out)
+        except ResourceNotFoundError as e:
+            raise FileNotFoundError(f"{container_name}/{blob_name}") from e
+
+    def copy_blob(self, container_name, source_blob_name, blob_name):
+        """
+        Server-side copy with Put Blob From URL, which completes before it returns (unlike Copy Blob).
+        The source is read through a read SAS valid for COPY_SOURCE_URL_SECONDS.
+        """
+        if not self.blob_service_client:
+            raise Exception("Azure Storage not configured")
+        source_url = self.create_read_urls(container_name, [source_blob_name], self.COPY_SOURCE_URL_SECONDS)[source_blob_name]
+        blob_client = self.blob_service_client.get_blob_client(container_name, blob_name)
+        try:
+            blob_client.upload_blob_from_url(source_url, overwrite=True)
+        except ResourceNotFoundError as e:
+            raise FileNotFoundError(f"{container_name}/{source_blob_name}") from e
+        return blob_client.url
+
+    def blob_url(self, container_name, blob_name):
+        return self.blob_service_client.get_blob_client(container_name, blob_name).url
+
+    def stats(self):
+        """Upload latency, container check and connection counters"""
+        return {'backend': self.backend, **self.counters.snapshot()}
+
+
+class LocalStorage(BlobStorage):
+    """
+    Blob storage on the local filesystem, for offline runs, load tests and single-node deployments.
+
+    Blobs live under LOCAL_STORAGE_DIR/<container>/<ab>/<cd>/<blob name>, sharded by the first
+    characters of the blob name so no directory grows unbounded. Writes go to a temporary file in
+    the target directory that is fsynced and renamed into place, so readers never see a partial
+    blob. Reads are served with send_file (sendfile through the WSGI server's file wrapper, or
+    X-Sendfile when USE_X_SENDFILE is set) or memory mapped with map_blob.
+    """
+
+    backend = 'local'
+    CONTENT_TYPE_SUFFIX = '.content-type'
+    UPLOAD_TOKEN_SALT = 'local-blob-upload'
+    READ_TOKEN_SALT = 'local-blob-read'
+
+    def __init__(self, app=None):
+        self.root = None
+        self.base_url = None
+        self.upload_url = None
+        self.read_url = None
+        self.fsync = True
+        self.counters = StorageCounters()
+        self._known_dirs = set()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create the storage root from Flask app configuration."""
+        self.root = os.path.abspath(app.config['LOCAL_STORAGE_DIR'])
+        self.base_url = app.config.get('LOCAL_STORAGE_BASE_URL', '/blobs').rstrip('/')
+        self.upload_url = app.config.get('LOCAL_STORAGE_UPLOAD_URL', '/api/timelogs/blob-uploads').rstrip('/')
+        self.read_url = app.config.get('LOCAL_STORAGE_READ_URL', '/api/timelogs/blob-reads').rstrip('/')
+        self.fsync = app.config.get('LOCAL_STORAGE_FSYNC', True)
+        os.makedirs(self.root, exist_ok=True)
+
+    def create_container(self, container_name):
+        """Create the container directory."""
+        self.counters.add('container_checks')
+        path = self._container_path(container_name)
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+            self.counters.add('containers_created')
+        self._known_dirs.add(path)
+
+    def ensure_container(self, container_name):
+        """Create the container unless it is already known to exist."""
+        if self._container_path(container_name) not in self._known_dirs:
+            self.create_container(container_name)
+
+    def upload_file(self, container_name, blob_name, file_data, content_type=None):
+        """
+        Atomically write a blob and return its URL.
+        file_data can be bytes or a readable file object.
+        """
+        self.ensure_container(container_name)
+        path = self.blob_path(container_name, blob_name)
+        directory = os.path.dirname(path)
+        if directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+        started = time.perf_counter()
+        try:
+            if content_type:
+                self._write_atomically(path + self.CONTENT_TYPE_SUFFIX, content_type.encode())
+            self._write_atomically(path, file_data)
+        except Exception:
+            self.counters.add('upload_failures')
+            raise
+        self.counters.observe_upload(time.perf_counter() - started)
+        return self.blob_url(container_name, blob_name)
+
+    def delete_file(self, container_name, blob_name):
+        """Delete a blob."""
+        path = self.blob_path(container_name, blob_name)
+        os.remove(path)
+        try:
+            os.remove(path + self.CONTENT_TYPE_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def send_blob(self, container_name, blob_name):
+        """Serve a blob with send_file, which hands the open file to the server's sendfile path."""
+        path = self.blob_path(container_name, blob_name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"{container_name}/{blob_name}")
+        return send_file(path, mimetype=self.content_type(container_name, blob_name), conditional=True)
+
+    def create_upload_url(self, container_name, blob_name, expires_in, content_type=None, max_bytes=None):
+        """
+        URL of this app's signed-upload endpoint (LOCAL_STORAGE_UPLOAD_URL) for one blob.
+        The token in the URL is signed with SECRET_KEY and carries the expiry and size cap.
+        """
+        self.blob_path(container_name, blob_name)
+        serializer = URLSafeTimedSerializer(current_app.secret_key, salt=self.UPLOAD_TOKEN_SALT)
+        token = serializer.dumps([container_name, blob_name, content_type, max_bytes, expires_in])
+        headers = {'Content-Type': content_type} if content_type else {}
+        return {'url': f"{self.upload_url}/{container_name}/{blob_name}?token={token}", 'method': 'PUT', 'headers': headers}
+
+    def verify_upload_token(self, container_name, blob_name, token):
+        """
+        Check a token issued by create_upload_url for this blob and return (content_type, max_bytes).
+
+        Raises:
+            ValueError: If the token is invalid, expired or issued for another blob
+        """
+        _, _, content_type, max_bytes, _ = self._load_token(self.UPLOAD_TOKEN_SALT, container_name, blob_name, token)
+        return content_type, max_bytes
+
+    def create_read_urls(self, container_name, blob_names, expires_in):
+        """
+        URLs of this app's signed-read endpoint (LOCAL_STORAGE_READ_URL), each carrying a token
+        signed with SECRET_KEY for one blob and its expiry.
+        """
+        serializer = URLSafeTimedSerializer(current_app.secret_key, salt=self.READ_TOKEN_SALT)
+        urls = {}
+        for blob_name in blob_names:
+            self.blob_path(container_name, blob_name)
+            token = serializer.dumps([container_name, blob_name, expires_in])
+            urls[blob_name] = f"{self.read_url}/{container_name}/{blob_name}?token={token}"
+        self.counters.add('read_urls_signed', len(urls))
+        return urls
+
+    def verify_read_token(self, container_name, blob_name, token):
+        """
+        Check a token issued by create_read_urls for this blob.
+
+        Raises:
+            ValueError: If the token is invalid, expired or issued for another blob
+        """
+        self._load_token(self.READ_TOKEN_SALT, container_name, blob_name, token)
+
+    def _load_token(self, salt, container_name, blob_name, token):
+        """Payload of a token signed for this blob, whose last item is its lifetime in seconds"""
+        serializer = URLSafeTimedSerializer(current_app.secret_key, salt=salt)
+        try:
+            payload = serializer.loads(token or '')
+            if tuple(payload[:2]) != (container_name, blob_name):
+                raise ValueError('Token was issued for another blob')
+            serializer.loads(token, max_age=payload[-1])
+        except BadSignature as e:
+            raise ValueError('Invalid or expired token') from e
+        return payload
+
+    def blob_size(self, container_name, blob_name):
+        try:
+            return os.stat(self.blob_path(container_name, blob_name)).st_size
+        except FileNotFoundError:
+            return None
+
+    def download_file(self, container_name, blob_name, out):
+        with open(self.blob_path(container_name, blob_name), 'rb') as source:
+            _copy_file(source, out)
+
+    def copy_blob(self, container_name, source_blob_name, blob_name):
+        """Atomically write a copy of the bytes the source holds when it is opened."""
+        with open(self.blob_path(container_name, source_blob_name), 'rb') as source:
+            return self.upload_file(container_name, blob_name, source, self.content_type(container_name, source_blob_name))
+
+    def blob_url(self, container_name, blob_name):
+        """URL under LOCAL_STORAGE_BASE_URL mirroring the on-disk layout"""
+        path = self.blob_path(container_name, blob_name)
+        return f"{self.base_url}/{os.path.relpath(path, self.root).replace(os.sep, '/')}"
+
+    @contextmanager
+    def map_blob(self, container_name, blob_name):
+        """Read-only memoryview of a blob's bytes backed by a memory map (no copy into the heap)."""
+        with open(self.blob_path(container_name, blob_name), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield memoryview(b'')
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def content_type(self, container_name, blob_name):
+        """Content type given at upload, or application/octet-stream."""
+        try:
+            with open(self.blob_path(container_name, blob_name) + self.CONTENT_TYPE_SUFFIX) as f:
+                return f.read().strip() or 'application/octet-stream'
+        except FileNotFoundError:
+            return 'application/octet-stream'
+
+    def blob_path(self, container_name, blob_name):
+        """Filesystem path of a blob, rejecting names that would escape the container."""
+        parts = blob_name.split('/') if blob_name else []
+        if not parts or any(part in ('', '.', '..') for part in parts) or '\\' in blob_name or '\0' in blob_name \
+                or blob_name.endswith(self.CONTENT_TYPE_SUFFIX):
+            raise ValueError(f"Invalid blob name: {blob_name!r}")
+        prefix = re.sub(r'[^A-Za-z0-9]', '_', parts[-1]).ljust(4, '_')
+        return os.path.join(self._container_path(container_name), prefix[:2], prefix[2:4], *parts)
+
+    def stats(self):
+        """Upload latency and container counters"""
+        return {'backend': self.backend, **self.counters.snapshot()}
+
+    def _container_path(self, container_name):
+        if not re.fullmatch(r'[a-z0-9][a-z0-9-]{1,62}', container_name or ''):
+            raise ValueError(f"Invalid container name: {container_name!r}")
+        return os.path.join(self.root, container_name)
+
+    def _write_atomically(self, path, file_data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if isinstance(file_data, (bytes, bytearray, memoryview)):
+                    out.write(file_data)
+                else:
+                    _copy_file(file_data, out)
+                out.flush()
+                if self.fsync:
+                    os.fsync(out.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+def _copy_file(source, out):
+    """Copy a file object into out, in-kernel with sendfile when both ends are real files."""
+    try:
+        in_fd = source.fileno()
+        offset = source.tell()
+    except (AttributeError, OSError, ValueError):
+        shutil.copyfileobj(source, out)
+        return
+    out.flush()
+    try:
+        while True:
+            sent = os.sendfile(out.fileno(), in_fd, offset, 1 << 20)
+            if sent == 0:
+                break
+            offset += sent
+    except (AttributeError, OSError):
+        # sendfile between these file types is not supported here: fall back to a buffered copy
+        source.seek(offset)
+        shutil.copyfileobj(source, out)
+
+
+def create_storage(app):
+    """Blob storage backend selected by STORAGE_BACKEND ('azure' or 'local')."""
+    backend = app.config.get('STORAGE_BACKEND', 'azure')
+    if backend == 'azure':
+        return AzureStorage(app)
+    if backend == 'local':
+        return LocalStorage(app)
+    raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(STORAGE_BACKENDS)}, got {backend!r}")
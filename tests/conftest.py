@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restx import Api, Namespace
+from database import db, register_sqlite_schema, REPLICA_BIND_KEY
+from storage import LocalStorage
+from api.models import Employee, Employer, Project, Task
+from api.service.email.outbox import EmailOutbox
+from api.service.read_replica import ReadReplica
+
+
+@pytest.fixture
+def app_factory() -> Iterator[Callable[..., Flask]]:
+    """
+    Factory of minimal apps serving only the given namespaces, backed by in-memory SQLite databases
+    with the tables already created; every database is dropped after the test.
+
+    factory(namespace, path, ..., smtp_port=None, replica=False, **config):
+        smtp_port: Add an email outbox sending to a local SMTP server on this port (drained by the test)
+        replica: Add a second in-memory database as the read replica
+        config: Extra app.config values
+    """
+    apps: List[Flask] = []
+
+    def factory(*namespaces: object, smtp_port: Optional[int] = None, replica: bool = False, **config: object) -> Flask:
+        app = Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['JWT_SECRET_KEY'] = 'test-secret-key-with-enough-length'
+        app.config['SECRET_KEY'] = 'test-secret-key'
+        if smtp_port is not None:
+            app.config.update(
+                SMTP_SERVER='127.0.0.1', SMTP_PORT=smtp_port, SMTP_SECURITY='none', SMTP_TIMEOUT_SECONDS=5,
+                SMTP_CONNECTION_IDLE_SECONDS=60, EMAIL_FROM='noreply@example.com',
+                EMAIL_OUTBOX_ENABLED=False, EMAIL_OUTBOX_BATCH_SIZE=2, EMAIL_OUTBOX_POLL_SECONDS=1,
+                EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS=30, EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS=600
+            )
+        if replica:
+            app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND_KEY: 'sqlite://'}
+            app.config.update(DB_REPLICA_MAX_LAG_SECONDS=5, DB_REPLICA_CHECK_SECONDS=0, DB_REPLICA_RETRY_SECONDS=60)
+        app.config.update(config)
+        db.init_app(app)
+        register_sqlite_schema(app)
+        restx_api = Api(app)
+        for namespace, path in zip(namespaces[::2], namespaces[1::2]):
+            assert isinstance(namespace, Namespace)
+            restx_api.add_namespace(namespace, path=path)
+        JWTManager(app)
+        if smtp_port is not None:
+            EmailOutbox(app)
+        if replica:
+            ReadReplica(app)
+        with app.app_context():
+            # Only the primary: the replica's metadata stays registered on db after a replica=True app
+            db.create_all(bind_key=None)
+            if replica:
+                db.metadata.create_all(db.engines[REPLICA_BIND_KEY])
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def app(app_factory: Callable[..., Flask]) -> Flask:
+    """The app under test; test modules override this fixture to serve their namespaces with their config"""
+    return app_factory()
+
+
+@pytest.fixture
+def client(app: Flask) -> FlaskClient:
+    return app.test_client()
+
+
+@pytest.fixture
+def app_context(app: Flask) -> Iterator[None]:
+    """Run the test inside an app context (for service-level tests that make no requests)"""
+    with app.app_context():
+        yield
+
+
+@pytest.fixture
+def auth_headers(app: Flask) -> Callable[..., Dict[str, str]]:
+    """auth_headers(user_id, role, **claims): Authorization header with an access token for these claims"""
+
+    def headers(user_id: int, role: str, **claims: object) -> Dict[str, str]:
+        with app.app_context():
+            token = create_access_token(identity=str(user_id), additional_claims={'id': user_id, 'role': role, **claims})
+        return {'Authorization': f'Bearer {token}'}
+
+    return headers
+
+
+@pytest.fixture
+def local_storage(app: Flask, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> LocalStorage:
+    """LocalStorage in a temporary directory as the app's blob storage, screenshots in the default container"""
+    monkeypatch.delenv('SCREENSHOT_STORAGE_CONTAINER', raising=False)
+    app.config['LOCAL_STORAGE_DIR'] = str(tmp_path / 'blobs')
+    storage = LocalStorage(app)
+    app.extensions['blob_storage'] = storage
+    return storage
+
+
+@dataclass
+class Seed:
+    """Ids of the rows created by the seed fixture, and Authorization headers of each user"""
+    employer_id: int
+    other_employer_id: int
+    project_id: int
+    other_project_id: int
+    task_id: int
+    other_task_id: int
+    employee_id: int
+    other_employee_id: int
+    headers: Dict[str, Dict[str, str]]
+
+
+@pytest.fixture
+def seed(app: Flask, auth_headers: Callable[..., Dict[str, str]]) -> Seed:
+    """
+    Two employers ('mine' and 'other'), each with a project holding one task, and two employees
+    bound to the device aa:bb. headers has the keys employer, other_employer, employee and other_employee.
+    """
+    with app.app_context():
+        employers = [Employer(company_name=name, contact_name=name, email=f'{name}@example.com', password_hash='-')
+                     for name in ('mine', 'other')]
+        employees = [Employee(name=name, email=f'{name}@example.com', latest_mac_address='aa:bb')
+                     for name in ('employee', 'other-employee')]
+        db.session.add_all([*employers, *employees])
+        db.session.flush()
+        projects = [Project(name=employer.company_name, employer_id=employer.id) for employer in employers]
+        db.session.add_all(projects)
+        db.session.flush()
+        tasks = [Task(name=project.name, project_id=project.id, minutes_spent=0) for project in projects]
+        db.session.add_all(tasks)
+        db.session.commit()
+        ids = [row.id for row in (*employers, *projects, *tasks, *employees)]
+    return Seed(*ids, headers={
+        'employer': auth_headers(ids[0], 'employer'),
+        'other_employer': auth_headers(ids[1], 'employer'),
+        'employee': auth_headers(ids[6], 'employee', mac_address='aa:bb'),
+        'other_employee': auth_headers(ids[7], 'employee', mac_address='aa:bb')
+    })
@@ -0,0 +1,119 @@
+import base64
+import io
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+from storage import AzureStorage
+
+BLOCK = 1024
+
+
+class FakeBlobClient:
+    """Records what a blob client is asked to upload, and assembles the blob the service would store"""
+
+    def __init__(self, fail_first_with=None):
+        self.url = 'https://account.blob.core.windows.net/screenshots/blob'
+        self.calls = []
+        self.staged = {}
+        self.blob = None
+        self.fail_first_with = fail_first_with
+
+    def _maybe_fail(self):
+        if self.fail_first_with is not None:
+            error, self.fail_first_with = self.fail_first_with, None
+            raise error
+
+    def upload_blob(self, data, overwrite, content_settings):
+        self._maybe_fail()
+        self.calls.append(('upload_blob', len(data)))
+        self.blob = bytes(data)
+
+    def stage_block(self, block_id, data, length):
+        self._maybe_fail()
+        assert len(data) == length
+        self.calls.append(('stage_block', length))
+        self.staged[block_id] = bytes(data)
+
+    def commit_block_list(self, block_list, content_settings):
+        self.calls.append(('commit_block_list', len(block_list)))
+        self.blob = b''.join(self.staged[block.id] for block in block_list)
+
+
+class FakeServiceClient:
+    def __init__(self, blob_client):
+        self.blob_client = blob_client
+        self.container_checks = 0
+
+    def get_blob_client(self, container_name, blob_name):
+        return self.blob_client
+
+    def get_container_client(self, container_name):
+        service = self
+
+        class ContainerClient:
+            def get_container_properties(self):
+                service.container_checks += 1
+
+        return ContainerClient()
+
+
+class Reader(io.BytesIO):
+    """File object that remembers the largest read, i.e. the most it held in memory at once"""
+    largest_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.largest_read = max(self.largest_read, len(data))
+        return data
+
+
+@pytest.fixture
+def storage():
+    storage = AzureStorage()
+    storage.block_size = BLOCK
+    return storage
+
+
+def data(size):
+    return bytes(i % 251 for i in range(size))
+
+
+@pytest.mark.parametrize('file_data', [data(BLOCK * 3), Reader(data(BLOCK - 1))])
+def test_bytes_and_small_files_are_uploaded_in_one_request(storage, file_data):
+    client = FakeBlobClient()
+
+    storage._put_blob(client, file_data, None)
+
+    assert [name for name, _ in client.calls] == ['upload_blob']
+    assert storage.counters.snapshot()['blocks_staged'] == 0
+
+
+@pytest.mark.parametrize('size, blocks', [(BLOCK * 2, [BLOCK, BLOCK]), (BLOCK * 2 + BLOCK // 2, [BLOCK, BLOCK, BLOCK // 2])])
+def test_large_files_are_staged_one_block_at_a_time(storage, size, blocks):
+    client = FakeBlobClient()
+    reader = Reader(data(size))
+
+    storage._put_blob(client, reader, None)
+
+    assert client.calls == [('stage_block', length) for length in blocks] + [('commit_block_list', len(blocks))]
+    assert client.blob == data(size)
+    assert reader.largest_read == BLOCK
+    # Block ids have one length and sort in upload order
+    block_ids = list(client.staged)
+    assert len({len(base64.b64decode(block_id)) for block_id in block_ids}) == 1
+    assert block_ids == sorted(block_ids)
+    assert storage.counters.snapshot()['blocks_staged'] == len(blocks)
+
+
+def test_upload_restarts_from_the_first_block_after_the_container_is_recreated(storage):
+    missing = ResourceNotFoundError('The specified container does not exist.')
+    missing.error_code = 'ContainerNotFound'
+    client = FakeBlobClient(fail_first_with=missing)
+    storage.blob_service_client = FakeServiceClient(client)
+
+    url = storage.upload_file('screenshots', 'blob', Reader(data(BLOCK * 2 + 1)), 'image/png')
+
+    assert url == client.url
+    assert client.blob == data(BLOCK * 2 + 1)
+    # Checked at first use and again after the error
+    assert storage.blob_service_client.container_checks == 2
+    assert storage.counters.snapshot()['uploads'] == 1
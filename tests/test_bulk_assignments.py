@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from typing import Dict, List
+import pytest
+from sqlalchemy import event, select
+from database import db
+from api.models import Employee, Employer, Project, Task
+from api.models.base import project_employee, task_employee
+from api.route_restx.employee_routes import api as employee_ns
+
+
+@dataclass
+class Rows:
+    """Three projects (the last one another employer's) of three tasks each, and four unassigned employees"""
+    project_ids: List[int]
+    task_ids: Dict[str, int]
+    employee_ids: List[int]
+    headers: Dict[str, str]
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(employee_ns, '/api/employees')
+
+
+@pytest.fixture
+def rows(app, auth_headers):
+    with app.app_context():
+        employers = [Employer(company_name=name, contact_name=name, email=f'{name}@example.com', password_hash='x')
+                     for name in ('mine', 'other')]
+        db.session.add_all(employers)
+        db.session.flush()
+        projects = [Project(name='a', employer_id=employers[0].id), Project(name='b', employer_id=employers[0].id),
+                    Project(name='foreign', employer_id=employers[1].id)]
+        db.session.add_all(projects)
+        db.session.flush()
+        tasks = [Task(name=f'{project.name}{i}', project_id=project.id) for project in projects for i in range(3)]
+        employees = [Employee(name=f'e{i}', email=f'e{i}@example.com') for i in range(4)]
+        db.session.add_all(tasks + employees)
+        db.session.commit()
+        return Rows([project.id for project in projects], {task.name: task.id for task in tasks},
+                    [employee.id for employee in employees], auth_headers(employers[0].id, 'employer'))
+
+
+def pairs(app, table):
+    with app.app_context():
+        return set(db.session.execute(select(table)).all())
+
+
+def test_assigns_projects_with_their_tasks_in_constant_statements(app, client, rows):
+    statements = []
+    with app.app_context():
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.post('/api/employees/assignments', headers=rows.headers, json={
+                'employee_ids': rows.employee_ids, 'project_ids': rows.project_ids[:2]})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert response.status_code == 200
+    assert response.json == {'project_assignments': 8, 'task_assignments': 24, 'tasks': 6}
+    # Three lookups and one insert per association table
+    assert len([sql for sql in statements if not sql.startswith(('BEGIN', 'COMMIT'))]) <= 5
+    assert len(pairs(app, task_employee)) == 24
+
+    # Assigning again only adds what is missing
+    response = client.post('/api/employees/assignments', headers=rows.headers, json={
+        'employee_ids': rows.employee_ids, 'task_ids': [rows.task_ids['a0']]})
+    assert response.json['task_assignments'] == 0
+
+
+def test_task_assignment_adds_its_project(app, client, rows):
+    employee_id = rows.employee_ids[0]
+    response = client.post('/api/employees/assignments', headers=rows.headers, json={
+        'employee_ids': [employee_id], 'task_ids': [rows.task_ids['b1']]})
+
+    assert response.json == {'project_assignments': 1, 'task_assignments': 1, 'tasks': 1}
+    assert pairs(app, project_employee) == {(rows.project_ids[1], employee_id)}
+
+
+def test_unassign_is_set_based(app, client, rows):
+    client.post('/api/employees/assignments', headers=rows.headers, json={
+        'employee_ids': rows.employee_ids, 'project_ids': rows.project_ids[:2]})
+
+    response = client.delete('/api/employees/assignments', headers=rows.headers, json={
+        'employee_ids': rows.employee_ids[:2], 'project_ids': [rows.project_ids[0]],
+        'task_ids': [rows.task_ids['b0']]})
+
+    assert response.json == {'project_assignments': 2, 'task_assignments': 8}
+    assert len(pairs(app, project_employee)) == 6
+    assert len(pairs(app, task_employee)) == 16
+
+    # The single-employee endpoint removes the project's tasks too
+    response = client.delete(f'/api/employees/{rows.employee_ids[2]}/projects', headers=rows.headers,
+                             json={'project_id': rows.project_ids[1]})
+    assert response.status_code == 204
+    assert rows.employee_ids[2] not in {employee for task, employee in pairs(app, task_employee)
+                                        if task in (rows.task_ids['b0'], rows.task_ids['b1'])}
+
+
+def test_employer_cannot_touch_other_employers_projects(app, client, rows):
+    response = client.post('/api/employees/assignments', headers=rows.headers, json={
+        'employee_ids': rows.employee_ids, 'project_ids': [rows.project_ids[2]]})
+
+    assert response.status_code == 400
+    assert str(rows.project_ids[2]) in response.json['message']
+    assert pairs(app, project_employee) == set()
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import event
+from database import db
+from api.models import Employee, OutboxEmail
+from api.route_restx.invite_routes import invite_ns
+
+
+@pytest.fixture
+def app(app_factory):
+    app = app_factory(invite_ns, '/api/invite')
+    with app.app_context():
+        db.session.add_all([
+            Employee(name='Active', email='active@example.com', is_active=True),
+            Employee(name='Pending', email='pending@example.com', is_active=False, activation_token='old-token')
+        ])
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def headers(auth_headers):
+    return auth_headers(1, 'employer')
+
+
+def test_json_import_reports_every_row(app, client, headers):
+    response = client.post('/api/invite/invite-employees', headers=headers, json={'employees': [
+        {'email': 'New@Example.com', 'name': 'New'},
+        {'email': 'active@example.com', 'name': 'Active'},
+        {'email': 'pending@example.com'},
+        {'email': 'new@example.com', 'name': 'Again'},
+        {'email': 'not-an-email', 'name': 'Bad'}
+    ]})
+
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['results']] \
+        == ['invited', 'already_registered', 'reinvited', 'duplicate', 'invalid']
+    assert response.json['summary']['invited'] == 1
+    with app.app_context():
+        new = Employee.query.filter_by(email='new@example.com').one()
+        assert (new.name, new.is_active) == ('New', False)
+        pending = Employee.query.filter_by(email='pending@example.com').one()
+        assert pending.activation_token != 'old-token'
+        queued = sorted(email.recipients[0] for email in OutboxEmail.query.all())
+        assert queued == ['new@example.com', 'pending@example.com']
+
+
+def test_csv_import_uses_a_constant_number_of_statements(app, client, headers):
+    rows = '\n'.join(f'person{i}@example.com,Person {i}' for i in range(500))
+    statements = []
+    with app.app_context():
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.post('/api/invite/invite-employees', headers=headers,
+                                   data=f'Email,Name\n{rows}\n', content_type='text/csv')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert response.status_code == 200
+    assert response.json['summary']['invited'] == 500
+    # Lookup, employee insert and outbox insert (executemany), whatever the number of rows
+    assert len(statements) <= 5
+    with app.app_context():
+        assert Employee.query.count() == 502
+        assert OutboxEmail.query.count() == 500
+
+
+def test_requires_employer_or_admin(client):
+    response = client.post('/api/invite/invite-employees', json=[{'email': 'a@example.com'}])
+    assert response.status_code == 401
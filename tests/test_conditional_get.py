@@ -0,0 +1,56 @@
+from unittest import mock
+import pytest
+from database import db
+from api.models import Task
+from api.route_restx.employer_routes import api as employer_ns
+from api.route_restx.task_routes import api as task_ns
+from api.service.change_versions import ChangeVersions
+
+
+@pytest.fixture
+def app(app_factory):
+    app = app_factory(employer_ns, '/api/employers', task_ns, '/api/tasks', ETAG_MAX_AGE_SECONDS=3600)
+    ChangeVersions(app)
+    return app
+
+
+def get(client, seed, path, who='employer', etag=None):
+    headers = {**seed.headers[who], **({'If-None-Match': etag} if etag else {})}
+    return client.get(path, headers=headers)
+
+
+def test_unchanged_resource_answers_304(client, seed):
+    for path in (f'/api/tasks/{seed.task_id}', f'/api/employers/projects/{seed.project_id}'):
+        first = get(client, seed, path)
+        assert first.status_code == 200
+        assert first.headers['ETag'].startswith('W/')
+
+        second = get(client, seed, path, etag=first.headers['ETag'])
+        assert second.status_code == 304
+        assert second.headers['ETag'] == first.headers['ETag']
+        assert second.data == b''
+
+
+def test_etag_changes_after_a_write(app, client, seed):
+    path = f'/api/tasks/{seed.task_id}'
+    etag = get(client, seed, path).headers['ETag']
+
+    with app.app_context():
+        db.session.get(Task, seed.task_id).name = 'Renamed'
+        db.session.commit()
+
+    response = get(client, seed, path, etag=etag)
+    assert response.status_code == 200
+    assert response.json['name'] == 'Renamed'
+    assert response.headers['ETag'] != etag
+
+
+def test_ownership_is_checked_before_304(client, seed):
+    # Even a matching tag must not answer 304 to a caller who may not read the resource
+    guessed = 'W/"guessed"'
+    with mock.patch('api.route_restx.conditional_get._etag', return_value='guessed'):
+        assert get(client, seed, f'/api/employers/projects/{seed.project_id}', 'other_employer', guessed).status_code == 404
+        assert get(client, seed, f'/api/employers/projects/{seed.project_id}/tasks', 'other_employer', guessed).status_code == 404
+        assert get(client, seed, f'/api/tasks/{seed.task_id}', 'other_employer', guessed).status_code == 403
+        assert get(client, seed, f'/api/tasks/{seed.task_id}', 'employee', guessed).status_code == 403
+        assert get(client, seed, f'/api/tasks/{seed.task_id}', etag=guessed).status_code == 304
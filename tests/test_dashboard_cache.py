@@ -0,0 +1,78 @@
+import time
+import pytest
+from database import db
+from api.models import Project
+from api.route_restx.employer_routes import api as employer_ns
+from api.service.change_versions import ChangeVersions
+from api.service.dashboard_cache import DashboardCache, MemoryCacheBackend
+
+
+@pytest.fixture
+def app(app_factory):
+    app = app_factory(employer_ns, '/api/employers', DASHBOARD_CACHE_BACKEND='memory', DASHBOARD_CACHE_TTL_SECONDS=30,
+                      DASHBOARD_CACHE_MAX_ENTRIES=100)
+    ChangeVersions(app)
+    DashboardCache(app)
+    return app
+
+
+@pytest.fixture
+def cache(app):
+    return app.extensions['dashboard_cache']
+
+
+def projects(client, seed, who='employer'):
+    response = client.get('/api/employers/projects', headers=seed.headers[who])
+    assert response.status_code == 200
+    return response.headers['X-Cache'], sorted(project['name'] for project in response.json)
+
+
+def test_repeated_reads_are_served_from_the_cache(client, seed, cache):
+    assert projects(client, seed) == ('MISS', ['mine'])
+    assert projects(client, seed) == ('HIT', ['mine'])
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_a_write_invalidates_only_that_employers_entries(app, client, seed, cache):
+    projects(client, seed)
+    projects(client, seed, 'other_employer')
+    invalidations = cache.stats()['invalidations']
+
+    with app.app_context():
+        db.session.add(Project(name='new', employer_id=seed.employer_id))
+        db.session.commit()
+
+    assert projects(client, seed) == ('MISS', ['mine', 'new'])
+    assert projects(client, seed, 'other_employer') == ('HIT', ['other'])
+    assert cache.stats()['invalidations'] == invalidations + 1
+
+
+def test_a_rolled_back_write_keeps_the_entries(app, client, seed):
+    projects(client, seed)
+
+    with app.app_context():
+        db.session.add(Project(name='new', employer_id=seed.employer_id))
+        db.session.flush()
+        db.session.rollback()
+
+    assert projects(client, seed) == ('HIT', ['mine'])
+
+
+def test_memory_backend_expires_and_evicts():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set('a', 1, ttl=30)
+    backend.set('b', 2, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('b') is None
+
+    backend.set('b', 2, ttl=30)
+    assert backend.get('a') == 1
+    backend.set('c', 3, ttl=30)
+    # 'b' was the least recently used
+    assert (backend.get('a'), backend.get('b'), backend.get('c')) == (1, None, 3)
+    assert backend.evictions == 1
+
+    backend.drop_prefix('a')
+    assert backend.size() == 1
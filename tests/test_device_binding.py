@@ -0,0 +1,72 @@
+from unittest import mock
+import pytest
+from database import db
+from api.models import Employee
+from api.route_restx.auth_routes import api as auth_ns
+from api.route_restx.time_tracking_routes import api as timelog_ns
+from api.service.device_bindings import DeviceBindingCache
+
+
+@pytest.fixture
+def app(app_factory):
+    app = app_factory(auth_ns, '/api/auth', timelog_ns, '/api/timelogs',
+                      DEVICE_BINDING_CACHE_TTL_SECONDS=30, DEVICE_BINDING_CACHE_MAX_ENTRIES=100)
+    DeviceBindingCache(app)
+    return app
+
+
+@pytest.fixture
+def login(client):
+    def login(mac_address):
+        # Passwords are not what is tested here
+        with mock.patch.object(Employee, 'check_password', return_value=True):
+            response = client.post('/api/auth/employee/login', json={
+                'email': 'employee@example.com', 'password': 'secret', 'mac_address': mac_address})
+        assert response.status_code == 200
+        return {'Authorization': f"Bearer {response.json['access_token']}"}
+    return login
+
+
+def check(client, headers):
+    """Status of a device-checked request: 400 (empty batch) once the device check passed"""
+    return client.post('/api/timelogs/batch', headers=headers, json={'time_logs': []})
+
+
+def test_login_on_another_device_requires_relogin(client, seed, login):
+    laptop = login('aa:aa')
+    assert check(client, laptop).status_code == 400
+
+    desktop = login('bb:bb')
+    response = check(client, laptop)
+    assert response.status_code == 401
+    assert response.json['code'] == 'Re-login'
+    assert check(client, desktop).status_code == 400
+
+    # Logging in again on the first device switches back
+    laptop = login('aa:aa')
+    assert check(client, laptop).status_code == 400
+    assert check(client, desktop).status_code == 401
+
+
+def test_newer_token_from_another_worker_refreshes_the_cache(app, client, seed, login, auth_headers):
+    desktop = login('bb:bb')
+    assert check(client, desktop).status_code == 400
+
+    # A login handled by another worker: the database changes, this worker's cache does not
+    with app.app_context():
+        employee = db.session.get(Employee, seed.employee_id)
+        employee.latest_mac_address = 'cc:cc'
+        employee.device_generation += 1
+        db.session.commit()
+        generation = employee.device_generation
+    assert check(client, desktop).status_code == 400
+
+    headers = auth_headers(seed.employee_id, 'employee', mac_address='cc:cc', device_generation=generation)
+    assert check(client, headers).status_code == 400
+    assert check(client, desktop).status_code == 401
+
+
+def test_token_of_an_unbound_device_is_rejected(client, seed, auth_headers):
+    # The seed binds the employee to aa:bb
+    assert check(client, seed.headers['employee']).status_code == 400
+    assert check(client, auth_headers(seed.employee_id, 'employee', mac_address='dd:dd')).status_code == 401
@@ -0,0 +1,117 @@
+import os
+import pytest
+from database import db
+from api.models import ScreenshotUploadClaim, TimeLog
+from api.route_restx.time_tracking_routes import api as timelog_ns
+from api.service.direct_uploads import DirectUploadError, UploadAlreadyClaimedError, claim_upload, issue_upload
+from constants import SCREENSHOT_STORAGE_CONTAINER as CONTAINER
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(timelog_ns, '/api/timelogs', SCREENSHOT_MAX_BYTES=10, SCREENSHOT_UPLOAD_URL_TTL_SECONDS=60)
+
+
+@pytest.fixture
+def upload(app, client, seed, local_storage):
+    """upload(data, size=None): issue an upload and PUT data to its URL, as the agent does"""
+    def upload(data, size=None):
+        with app.app_context():
+            issued = issue_upload(seed.employee_id, 'image/png', size)
+        if data is not None:
+            put(client, issued, data)
+        return issued
+    return upload
+
+
+def claimed_copies(storage):
+    return [name for directory, _, names in os.walk(storage.root) if os.path.basename(directory) == 'claimed'
+            for name in names if not name.endswith(storage.CONTENT_TYPE_SUFFIX)]
+
+
+def put(client, issued, data):
+    """PUT to the upload URL, served by this app with the local backend"""
+    return client.put(issued['url'], headers=issued['headers'], data=data).status_code
+
+
+def stored(storage, blob_name):
+    path = storage.blob_path(CONTAINER, blob_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_claims_a_copy_of_the_upload_once(app, seed, upload, local_storage):
+    issued = upload(b'png', size=3)
+
+    with app.app_context():
+        claimed = claim_upload(seed.employee_id, issued['upload_token'])
+        db.session.commit()
+        assert claimed.size == 3
+        assert claimed.blob_name != issued['blob_name']
+        assert stored(local_storage, claimed.blob_name) == b'png'
+        assert db.session.get(ScreenshotUploadClaim, issued['blob_name']) is not None
+
+        with pytest.raises(UploadAlreadyClaimedError):
+            claim_upload(seed.employee_id, issued['upload_token'])
+
+
+def test_writes_after_the_claim_do_not_reach_the_time_log(app, client, seed, upload, local_storage):
+    issued = upload(b'png', size=3)
+    response = client.post('/api/timelogs/', headers=seed.headers['employee'], data={
+        'task_id': seed.task_id, 'project_id': seed.project_id, 'start_time': 1700000000, 'end_time': 1700000060,
+        'duration': 60, 'upload_token': issued['upload_token']})
+    assert response.status_code == 201
+    with app.app_context():
+        file_path = TimeLog.find(response.json['id']).file_path
+    # The agent's upload is deleted once the time log is committed
+    assert stored(local_storage, issued['blob_name']) is None
+
+    # The write URL is still valid, but the time log points at the server-owned copy
+    assert put(client, issued, b'evil') == 201
+    assert put(client, issued, b'x' * 11) == 413
+    assert stored(local_storage, issued['blob_name']) == b'evil'
+    assert stored(local_storage, file_path) == b'png'
+
+
+def test_rejects_a_token_issued_to_another_employee(app, seed, upload):
+    issued = upload(b'png')
+
+    with app.app_context():
+        with pytest.raises(DirectUploadError, match='another employee'):
+            claim_upload(seed.other_employee_id, issued['upload_token'])
+        with pytest.raises(DirectUploadError, match='Invalid'):
+            claim_upload(seed.employee_id, issued['upload_token'] + 'x')
+        assert db.session.get(ScreenshotUploadClaim, issued['blob_name']) is None
+
+
+def test_rejects_a_missing_blob(app, seed, upload):
+    issued = upload(None)
+
+    with app.app_context():
+        with pytest.raises(DirectUploadError, match='not been uploaded'):
+            claim_upload(seed.employee_id, issued['upload_token'])
+
+
+def test_checks_the_size(app, seed, upload, local_storage):
+    with app.app_context():
+        with pytest.raises(DirectUploadError):
+            issue_upload(seed.employee_id, 'image/png', 11)
+
+    # Not the size declared at phase one: neither claimed nor copied
+    issued = upload(b'png', size=4)
+    with app.app_context():
+        with pytest.raises(DirectUploadError, match='expected 4'):
+            claim_upload(seed.employee_id, issued['upload_token'])
+    assert claimed_copies(local_storage) == []
+
+    # Over SCREENSHOT_MAX_BYTES (written behind the upload URL's back): rejected and deleted
+    issued = upload(None)
+    with app.app_context():
+        local_storage.upload_file(CONTAINER, issued['blob_name'], b'x' * 11)
+        with pytest.raises(DirectUploadError, match='exceeds 10 bytes'):
+            claim_upload(seed.employee_id, issued['upload_token'])
+        assert ScreenshotUploadClaim.query.count() == 0
+    assert stored(local_storage, issued['blob_name']) is None
+    assert claimed_copies(local_storage) == []
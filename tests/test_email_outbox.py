@@ -0,0 +1,156 @@
+import socketserver
+import threading
+import pytest
+from datetime import datetime
+from email import message_from_string
+from database import db
+from api.models import OutboxEmail
+from api.route_restx.invite_routes import invite_ns
+from api.service.email.outbox import enqueue_email
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Local SMTP server that records messages instead of delivering them"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SmtpSinkHandler)
+        self.messages = []
+        self.connections = 0
+        # Recipient -> reply to RCPT TO, e.g. '451 Try again later'
+        self.rejections = {}
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        self.reply('220 sink ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 sink')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 ok')
+            elif command == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                rejection = self.server.rejections.get(address)
+                if rejection:
+                    self.reply(rejection)
+                else:
+                    recipients.append(address)
+                    self.reply('250 ok')
+            elif command == 'DATA':
+                self.reply('354 go ahead')
+                data = []
+                for raw in iter(self.rfile.readline, b''):
+                    if raw in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(raw)
+                self.server.messages.append((recipients, b''.join(data).decode()))
+                self.reply('250 queued')
+            elif command in ('RSET', 'NOOP'):
+                self.reply('250 ok')
+            else:
+                self.reply('502 not implemented')
+
+
+@pytest.fixture
+def sink():
+    sink = SmtpSink()
+    yield sink
+    sink.close()
+
+
+@pytest.fixture
+def app(app_factory, sink):
+    return app_factory(invite_ns, '/api/invite', smtp_port=sink.server_address[1])
+
+
+@pytest.fixture
+def outbox(app):
+    outbox = app.extensions['email_outbox']
+    yield outbox
+    outbox._disconnect()
+
+
+def enqueue(app, *addresses: str) -> None:
+    with app.app_context():
+        for address in addresses:
+            enqueue_email([address], 'Hello', f'Hello {address}')
+        db.session.commit()
+
+
+def statuses(app):
+    with app.app_context():
+        return {email.recipients[0]: email for email in OutboxEmail.query.all()}
+
+
+def test_sends_batches_over_one_connection(app, sink, outbox):
+    enqueue(app, 'a@example.com', 'b@example.com', 'c@example.com')
+
+    assert outbox.drain() == 3
+
+    assert sorted(recipients[0] for recipients, _ in sink.messages) == ['a@example.com', 'b@example.com', 'c@example.com']
+    assert sink.connections == 1
+    assert all(email.status == 'sent' and email.sent_at for email in statuses(app).values())
+
+    # The connection is reused for mail queued later
+    enqueue(app, 'd@example.com')
+    assert outbox.drain() == 1
+    assert sink.connections == 1
+
+
+def test_temporary_failure_is_retried_later(app, sink, outbox):
+    sink.rejections['busy@example.com'] = '451 Try again later'
+    enqueue(app, 'busy@example.com', 'ok@example.com')
+
+    assert outbox.drain() == 1
+
+    emails = statuses(app)
+    assert emails['ok@example.com'].status == 'sent'
+    busy = emails['busy@example.com']
+    assert (busy.status, busy.attempts) == ('pending', 1)
+    assert busy.next_attempt_at > datetime.utcnow()
+    assert '451' in busy.last_error
+    # Not due yet
+    assert outbox.drain() == 0
+
+
+def test_permanent_rejection_is_not_retried(app, sink, outbox):
+    sink.rejections['nobody@example.com'] = '550 No such user'
+    enqueue(app, 'nobody@example.com')
+
+    assert outbox.drain() == 0
+
+    nobody = statuses(app)['nobody@example.com']
+    assert (nobody.status, nobody.attempts) == ('failed', 1)
+
+
+def test_invite_only_enqueues(app, client, sink, outbox):
+    response = client.post('/api/invite/invite-employee', json={'email': 'New@Example.com', 'name': 'New'})
+
+    assert response.status_code == 201
+    assert sink.messages == []
+    invite = statuses(app)['new@example.com']
+    assert (invite.status, invite.kind) == ('pending', 'activation')
+
+    assert outbox.drain() == 1
+    message = message_from_string(sink.messages[0][1])
+    body = message.get_payload()[0].get_payload(decode=True).decode()
+    assert f"/activate/{response.json['activation_token']}" in body
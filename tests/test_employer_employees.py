@@ -0,0 +1,83 @@
+import pytest
+from database import db
+from api.models import Employee, Project, Task
+from api.models.base import project_employee, task_employee
+from api.models.task_time_delta import TaskTimeDelta
+from api.route_restx.employer_routes import api as employer_ns
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(employer_ns, '/api/employers')
+
+
+@pytest.fixture(autouse=True)
+def roster(app, seed):
+    """
+    On the seeded project (10/hour): 'employee' on its task and a second one, 'other-employee' on its
+    task (and on the other employer's), and 'adam' on no task.
+    """
+    with app.app_context():
+        adam = Employee(name='adam', email='adam@example.com')
+        second = Task(name='second', project_id=seed.project_id, minutes_spent=0)
+        db.session.add_all([adam, second])
+        db.session.flush()
+        db.session.get(Project, seed.project_id).hourly_rate = 10
+        db.session.get(Task, seed.task_id).minutes_spent = 7260
+        db.session.get(Task, seed.other_task_id).minutes_spent = 99999
+        # Not folded yet, still part of the task's total
+        db.session.add(TaskTimeDelta(task_id=second.id, seconds=3600))
+        db.session.execute(project_employee.insert(), [
+            {'project_id': seed.project_id, 'employee_id': employee_id}
+            for employee_id in (seed.employee_id, seed.other_employee_id, adam.id)
+        ] + [{'project_id': seed.other_project_id, 'employee_id': seed.other_employee_id}])
+        db.session.execute(task_employee.insert(), [
+            {'task_id': seed.task_id, 'employee_id': seed.employee_id},
+            {'task_id': second.id, 'employee_id': seed.employee_id},
+            {'task_id': seed.task_id, 'employee_id': seed.other_employee_id},
+            {'task_id': seed.other_task_id, 'employee_id': seed.other_employee_id}
+        ])
+        db.session.commit()
+        return second.id
+
+
+def employees(client, seed, **params):
+    response = client.get('/api/employers/employees', headers=seed.headers['employer'], query_string=params)
+    assert response.status_code == 200
+    return response.json
+
+
+def names(page):
+    return [employee['name'] for employee in page['employees']]
+
+
+def test_totals_add_up_the_lifetime_seconds_of_the_employers_tasks(client, seed, roster):
+    listed = {employee['name']: employee for employee in employees(client, seed)['employees']}
+
+    assert (listed['employee']['total_seconds'], listed['employee']['total_cost']) == (10860, 30.0)
+    assert [(task['id'], task['total_seconds']) for task in listed['employee']['tasks']] == \
+        [(seed.task_id, 7260), (roster, 3600)]
+    # Only this employer's tasks are listed and counted
+    assert (listed['other-employee']['total_seconds'], listed['other-employee']['total_cost']) == (7260, 20.0)
+    assert [task['id'] for task in listed['other-employee']['tasks']] == [seed.task_id]
+    assert (listed['adam']['total_seconds'], listed['adam']['total_cost'], listed['adam']['tasks']) == (0, 0.0, [])
+
+
+def test_sorts_by_name_or_totals(client, seed):
+    assert names(employees(client, seed)) == ['adam', 'employee', 'other-employee']
+    assert names(employees(client, seed, sort_by='total_seconds')) == ['employee', 'other-employee', 'adam']
+    assert names(employees(client, seed, sort_by='total_cost', order='asc')) == ['adam', 'other-employee', 'employee']
+    response = client.get('/api/employers/employees', headers=seed.headers['employer'], query_string={'sort_by': 'email'})
+    assert response.status_code == 400
+
+
+def test_pages_through_the_roster(client, seed):
+    first = employees(client, seed, page_size=2)
+    second = employees(client, seed, page_size=2, page=2)
+
+    assert (first['total'], first['page'], first['page_size']) == (3, 1, 2)
+    assert names(first) + names(second) == ['adam', 'employee', 'other-employee']
+    assert names(employees(client, seed, page_size=2, page=3)) == []
+    # The other employer sees only their own roster
+    response = client.get('/api/employers/employees', headers=seed.headers['other_employer'])
+    assert [employee['name'] for employee in response.json['employees']] == ['other-employee']
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from database import db
+from api.models import Employee, Employer, Project, Task, TimeLog
+from api.route_restx.employer_routes import api as employer_ns
+from api.service.time_rollups import record_time_logs
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(employer_ns, '/api/employers')
+
+
+@pytest.fixture
+def employer(app, auth_headers):
+    """(employer id, its Authorization header), with no projects yet"""
+    with app.app_context():
+        employer = Employer(company_name='Acme', contact_name='Acme', email='acme@example.com', password_hash='-')
+        db.session.add(employer)
+        db.session.commit()
+        employer_id = employer.id
+    return employer_id, auth_headers(employer_id, 'employer')
+
+
+def add_projects(app, employer_id, count):
+    """Add projects, each with two tasks, an assigned employee and a logged hour"""
+    with app.app_context():
+        start = datetime(2024, 1, 1, 9)
+        entries = []
+        for _ in range(count):
+            project = Project(name='Project', hourly_rate=30, employer_id=employer_id)
+            employee = Employee(name='Employee', email=f'employee-{Employee.query.count()}@example.com')
+            db.session.add_all([project, employee])
+            db.session.flush()
+            for _ in range(2):
+                task = Task(name='Task', project_id=project.id)
+                task.employees.append(employee)
+                db.session.add(task)
+                db.session.flush()
+                db.session.add(TimeLog(employee_id=employee.id, project_id=project.id, task_id=task.id,
+                                       start_time=start, end_time=start + timedelta(minutes=30), duration=1800))
+                entries.append({'project_id': project.id, 'task_id': task.id, 'employee_id': employee.id,
+                                'start_time': start, 'duration': 1800})
+        record_time_logs(entries)
+        db.session.commit()
+
+
+def get_summary(app, client, headers):
+    """Return the summary response and the number of SQL statements it issued"""
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        response = client.get('/api/employers/summary', headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+    return response, len(statements)
+
+
+def test_summary_totals(app, client, employer):
+    employer_id, headers = employer
+    add_projects(app, employer_id, 3)
+
+    response, _ = get_summary(app, client, headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['projects_count'], data['tasks_count'], data['employees_count']) == (3, 6, 3)
+    assert (data['total_time'], data['total_cost']) == (3 * 3600, 3 * 30)
+    assert len(data['recent_activities']) == 5
+
+
+def test_summary_query_count_does_not_grow_with_data(app, client, employer):
+    employer_id, headers = employer
+    add_projects(app, employer_id, 2)
+    _, small_count = get_summary(app, client, headers)
+    add_projects(app, employer_id, 20)
+    _, large_count = get_summary(app, client, headers)
+
+    assert small_count == large_count
+    assert large_count <= 3
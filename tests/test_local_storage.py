@@ -0,0 +1,86 @@
+import io
+import os
+from urllib.parse import urlsplit
+import pytest
+from api.route_restx.time_tracking_routes import api as timelog_ns
+from constants import SCREENSHOT_STORAGE_CONTAINER as CONTAINER
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(timelog_ns, '/api/timelogs')
+
+
+def relative(url):
+    """Path and query of a signed URL, as the test client requests it"""
+    parts = urlsplit(url)
+    return f'{parts.path}?{parts.query}'
+
+
+def test_stores_blobs_sharded_and_atomically(app_context, local_storage):
+    url = local_storage.upload_file(CONTAINER, 'employer/abcd.png', io.BytesIO(b'png'), 'image/png')
+
+    path = local_storage.blob_path(CONTAINER, 'employer/abcd.png')
+    assert path == os.path.join(local_storage.root, CONTAINER, 'ab', 'cd', 'employer', 'abcd.png')
+    assert url == f'/blobs/{CONTAINER}/ab/cd/employer/abcd.png'
+    assert (local_storage.blob_size(CONTAINER, 'employer/abcd.png'), local_storage.content_type(CONTAINER, 'employer/abcd.png')) \
+        == (3, 'image/png')
+    # No temporary files are left next to the blob
+    assert sorted(os.listdir(os.path.dirname(path))) == ['abcd.png', f'abcd.png{local_storage.CONTENT_TYPE_SUFFIX}']
+    with local_storage.map_blob(CONTAINER, 'employer/abcd.png') as view:
+        assert bytes(view) == b'png'
+    out = io.BytesIO()
+    local_storage.download_file(CONTAINER, 'employer/abcd.png', out)
+    assert out.getvalue() == b'png'
+
+    local_storage.delete_file(CONTAINER, 'employer/abcd.png')
+    assert local_storage.blob_size(CONTAINER, 'employer/abcd.png') is None
+    assert os.listdir(os.path.dirname(path)) == []
+
+
+@pytest.mark.parametrize('blob_name', ['../escape', 'a/../../b', '/absolute', 'a\\b', 'a//b', '',
+                                       'x.png.content-type'])
+def test_rejects_names_outside_the_container(local_storage, blob_name):
+    with pytest.raises(ValueError):
+        local_storage.blob_path(CONTAINER, blob_name)
+
+
+def test_rejects_invalid_container_names(local_storage):
+    with pytest.raises(ValueError):
+        local_storage.blob_path('../up', 'blob')
+
+
+def test_signed_upload_url_accepts_only_its_blob(app, client, local_storage):
+    with app.app_context():
+        upload = local_storage.create_upload_url(CONTAINER, 'upload', 60, 'image/png', max_bytes=5)
+        other = local_storage.create_upload_url(CONTAINER, 'other', 60)
+        expired = local_storage.create_upload_url(CONTAINER, 'upload', -1)
+    url = relative(upload['url'])
+
+    assert client.put(url, data=b'x' * 6, headers=upload['headers']).status_code == 413
+    assert client.put(url, data=b'png', headers=upload['headers']).status_code == 201
+    with app.app_context():
+        assert local_storage.content_type(CONTAINER, 'upload') == 'image/png'
+    # Another blob's token, a tampered token and an expired one
+    token = urlsplit(other['url']).query
+    assert client.put(f'{urlsplit(upload["url"]).path}?{token}', data=b'png').status_code == 403
+    assert client.put(url + 'x', data=b'png').status_code == 403
+    assert client.put(relative(expired['url']), data=b'png').status_code == 403
+
+
+def test_signed_read_url_serves_only_its_blob(app, client, local_storage):
+    with app.app_context():
+        local_storage.upload_file(CONTAINER, 'shot', b'png', 'image/png')
+        urls = local_storage.create_read_urls(CONTAINER, ['shot', 'missing'], 60)
+        expired = local_storage.create_read_urls(CONTAINER, ['shot'], -1)
+
+    response = client.get(relative(urls['shot']))
+    assert (response.status_code, response.data, response.mimetype) == (200, b'png', 'image/png')
+    assert client.get(relative(urls['missing'])).status_code == 404
+    token = urlsplit(urls['shot']).query
+    assert client.get(f'{urlsplit(urls["missing"]).path}?{token}').status_code == 403
+    assert client.get(relative(expired['shot'])).status_code == 403
+    # An upload token does not read
+    with app.app_context():
+        upload = local_storage.create_upload_url(CONTAINER, 'shot', 60)
+    assert client.get(f'{urlsplit(urls["shot"]).path}?{urlsplit(upload["url"]).query}').status_code == 403
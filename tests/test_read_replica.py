@@ -0,0 +1,131 @@
+import os
+import pytest
+from sqlalchemy import create_engine, exc as sa_exc
+from database import db, READ_REPLICA_KEY, TimedQueuePool
+from api.models import Employer, Project
+from api.route_restx.employer_routes import api as employer_ns
+from api.service.change_versions import ChangeVersions
+from api.service.dashboard_cache import DashboardCache
+
+
+@pytest.fixture
+def app(app_factory, request):
+    """The employer routes on a replica; with param 'cached', behind change versions, ETags and the dashboard cache"""
+    if getattr(request, 'param', None) != 'cached':
+        return app_factory(employer_ns, '/api/employers', replica=True)
+    app = app_factory(employer_ns, '/api/employers', replica=True, ETAG_MAX_AGE_SECONDS=3600,
+                      DASHBOARD_CACHE_BACKEND='memory', DASHBOARD_CACHE_TTL_SECONDS=30, DASHBOARD_CACHE_MAX_ENTRIES=100)
+    ChangeVersions(app)
+    DashboardCache(app)
+    return app
+
+
+@pytest.fixture
+def replica(app):
+    return app.extensions['read_replica']
+
+
+@pytest.fixture
+def employer(app, auth_headers):
+    """(employer id, headers) of an employer whose project is named after the database it is read from"""
+    with app.app_context():
+        for name, bind in (('primary', db.engine), ('replica', db.engines['replica'])):
+            with db.Session(bind=bind) as session:
+                row = Employer(company_name='Acme', contact_name='Acme', email='acme@example.com', password_hash='-')
+                session.add(row)
+                session.flush()
+                session.add(Project(name=name, hourly_rate=10, employer_id=row.id))
+                session.commit()
+                employer_id = row.id
+    return employer_id, auth_headers(employer_id, 'employer')
+
+
+def project_names(client, employer):
+    response = client.get('/api/employers/projects', headers=employer[1])
+    assert response.status_code == 200
+    return sorted(project['name'] for project in response.json)
+
+
+def test_read_only_endpoints_use_the_replica(client, replica, employer):
+    assert project_names(client, employer) == ['replica']
+    assert replica.stats()['replica_requests'] == 1
+
+
+def test_falls_back_to_the_primary_when_the_replica_fails(app, client, replica, employer):
+    with app.app_context():
+        Project.__table__.drop(db.engines['replica'])
+
+    assert project_names(client, employer) == ['primary']
+    assert replica.stats()['failures'] == 1
+
+    # The replica is skipped until DB_REPLICA_RETRY_SECONDS have passed
+    assert project_names(client, employer) == ['primary']
+    stats = replica.stats()
+    assert (stats['failures'], stats['primary_requests']) == (1, 1)
+
+
+def test_lagging_replica_is_skipped(client, replica, employer):
+    replica.max_lag = -1
+
+    assert project_names(client, employer) == ['primary']
+    assert replica.stats()['lagging'] == 1
+
+
+def test_reads_after_a_write_use_the_primary(app, employer):
+    with app.test_request_context():
+        db.session.info[READ_REPLICA_KEY] = True
+        assert Project.query.one().name == 'replica'
+        db.session.add(Employer(company_name='New', contact_name='New', email='new@example.com', password_hash='-'))
+        db.session.flush()
+        assert Project.query.one().name == 'primary'
+        db.session.rollback()
+
+
+@pytest.mark.parametrize('app', ['cached'], indirect=True)
+def test_cache_is_not_filled_from_the_replica_after_a_write(app, client, replica, employer):
+    # As if the seed's writes were older than the lag bound
+    replica.max_lag = 0
+    assert project_names(client, employer) == ['replica']
+    replica.max_lag = 5
+
+    # Not replayed on the replica yet: the new version must not cache the replica's rows
+    with app.app_context():
+        db.session.add(Project(name='new', hourly_rate=10, employer_id=employer[0]))
+        db.session.commit()
+    response = client.get('/api/employers/projects', headers=employer[1])
+    assert response.headers['X-Cache'] == 'MISS'
+    assert project_names(client, employer) == ['new', 'primary']
+    assert replica.stats()['fresh_reads'] == 1
+
+
+@pytest.mark.parametrize('app', ['cached'], indirect=True)
+def test_etag_is_not_taken_from_the_replica_after_a_write(app, client, replica, employer):
+    replica.max_lag = 0
+    first = client.get('/api/employers/projects', headers=employer[1])
+    assert [project['name'] for project in first.json] == ['replica']
+    replica.max_lag = 5
+
+    with app.app_context():
+        db.session.add(Project(name='new', hourly_rate=10, employer_id=employer[0]))
+        db.session.commit()
+    second = client.get('/api/employers/projects', headers={**employer[1], 'If-None-Match': first.headers['ETag']})
+
+    # The new ETag is only ever sent with the primary's rows
+    assert second.status_code == 200
+    assert sorted(project['name'] for project in second.json) == ['new', 'primary']
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert replica.stats()['fresh_reads'] == 1
+
+
+def test_pool_records_checkout_waits_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'pool.db')}", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.1)
+    connection = engine.connect()
+    with pytest.raises(sa_exc.TimeoutError):
+        engine.connect()
+    connection.close()
+    stats = dict(engine.pool.checkout_stats)
+    engine.dispose()
+
+    assert (stats['checkouts'], stats['timeouts'], stats['slow_checkouts']) == (2, 1, 1)
+    assert stats['wait_seconds_max'] >= 0.1
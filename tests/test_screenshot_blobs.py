@@ -0,0 +1,113 @@
+import os
+import pytest
+from database import db
+from api.models import ScreenshotBlob
+from api.service.screenshot_blobs import acquire, content_blob_name, purge_released, register, release
+from constants import SCREENSHOT_STORAGE_CONTAINER as CONTAINER
+
+CONTENT_HASH = 'ab' * 32
+
+
+@pytest.fixture
+def store(local_storage, app_context):
+    """store(): put an image and its thumbnail under fresh names for CONTENT_HASH and register them"""
+    def store():
+        base = content_blob_name(1, CONTENT_HASH)
+        blob_names = [f'{base}.png', f'{base}.w160.png']
+        for blob_name in blob_names:
+            local_storage.upload_file(CONTAINER, blob_name, b'png')
+        stored = {'file_path': blob_names[0], 'image_url': '/blobs/x', 'blob_names': blob_names}
+        blob = register(1, CONTENT_HASH, CONTAINER, stored, size=3)
+        db.session.commit()
+        return blob.id, blob_names
+    return store
+
+
+def ref_count(blob_id):
+    return db.session.execute(db.select(ScreenshotBlob.ref_count).filter_by(id=blob_id)).scalar_one_or_none()
+
+
+def exists(storage, blob_names):
+    return [os.path.exists(storage.blob_path(CONTAINER, blob_name)) for blob_name in blob_names]
+
+
+def test_names_are_unique_per_registration():
+    assert content_blob_name(1, CONTENT_HASH) != content_blob_name(1, CONTENT_HASH)
+    assert content_blob_name(1, CONTENT_HASH).startswith(f'1/{CONTENT_HASH}/')
+
+
+def test_acquire_adds_references(store):
+    blob_id, _ = store()
+
+    assert acquire(1, CONTENT_HASH).id == blob_id
+    assert acquire(1, CONTENT_HASH).id == blob_id
+    db.session.commit()
+
+    assert ref_count(blob_id) == 3
+    # Another tenant's bytes are never shared
+    assert acquire(2, CONTENT_HASH) is None
+
+
+def test_release_counts_each_time_log(store, local_storage):
+    blob_id, blob_names = store()
+    acquire(1, CONTENT_HASH)
+    acquire(1, CONTENT_HASH)
+
+    assert release([blob_id, None, blob_id]) == []
+    db.session.commit()
+    assert ref_count(blob_id) == 1
+    assert exists(local_storage, blob_names) == [True, True]
+
+
+def test_last_release_deletes_the_blobs_only_after_the_commit(store, local_storage):
+    blob_id, blob_names = store()
+    released = release([blob_id])
+
+    assert released == [blob_id]
+    assert ref_count(blob_id) == 0
+    assert exists(local_storage, blob_names) == [True, True]
+    # A released row is not referenced again
+    assert acquire(1, CONTENT_HASH) is None
+    db.session.commit()
+
+    assert purge_released(released) == 1
+    assert ref_count(blob_id) is None
+    assert exists(local_storage, blob_names) == [False, False]
+    assert purge_released(released) == 0
+
+
+def test_rolled_back_release_keeps_the_reference(store, local_storage):
+    blob_id, blob_names = store()
+    release([blob_id])
+    db.session.rollback()
+
+    assert ref_count(blob_id) == 1
+    assert purge_released([blob_id]) == 0
+    assert exists(local_storage, blob_names) == [True, True]
+
+
+def test_release_never_goes_below_zero(store):
+    blob_id, _ = store()
+
+    assert release([blob_id] * 3) == [blob_id]
+    db.session.commit()
+    assert ref_count(blob_id) == 0
+
+
+def test_purge_never_deletes_the_bytes_stored_again(store, local_storage):
+    blob_id, old_names = store()
+    released = release([blob_id])
+    db.session.commit()
+
+    # An upload of the same bytes stores them while the released row is still there
+    base = content_blob_name(1, CONTENT_HASH)
+    new_names = [f'{base}.png', f'{base}.w160.png']
+    for blob_name in new_names:
+        local_storage.upload_file(CONTAINER, blob_name, b'png')
+    assert purge_released(released) == 1
+
+    assert exists(local_storage, old_names) == [False, False]
+    assert exists(local_storage, new_names) == [True, True]
+    register(1, CONTENT_HASH, CONTAINER, {'file_path': new_names[0], 'image_url': '/blobs/y', 'blob_names': new_names}, size=3)
+    db.session.commit()
+    assert acquire(1, CONTENT_HASH).file_path == new_names[0]
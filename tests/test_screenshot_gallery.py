@@ -0,0 +1,64 @@
+import pytest
+from datetime import datetime, timedelta
+from database import db
+from api.models import TimeLog
+from api.route_restx.time_tracking_routes import api as timelog_ns
+from api.service.read_urls import ReadUrlCache
+
+
+@pytest.fixture
+def app(app_factory):
+    app = app_factory(timelog_ns, '/api/timelogs', SCREENSHOT_READ_URL_TTL_SECONDS=900,
+                      SCREENSHOT_READ_URL_REFRESH_SECONDS=120, SCREENSHOT_READ_URL_CACHE_MAX_ENTRIES=100)
+    ReadUrlCache(app)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def screenshots(app, seed, local_storage):
+    """One time log per employee and project with an uploaded screenshot, and one still pending"""
+    with app.app_context():
+        tasks = {seed.project_id: seed.task_id, seed.other_project_id: seed.other_task_id}
+        start = datetime(2024, 1, 1, 9)
+        for i, (employee_id, project_id, status) in enumerate([
+                (seed.employee_id, seed.project_id, 'uploaded'), (seed.other_employee_id, seed.project_id, 'uploaded'),
+                (seed.employee_id, seed.other_project_id, 'uploaded'),
+                (seed.other_employee_id, seed.other_project_id, 'uploaded'), (seed.employee_id, seed.project_id, 'pending')]):
+            db.session.add(TimeLog(employee_id=employee_id, project_id=project_id, task_id=tasks[project_id],
+                                   start_time=start + timedelta(minutes=i), end_time=start + timedelta(minutes=i + 1),
+                                   duration=60, screenshot_status=status, file_path=f'shot-{i}'))
+        db.session.commit()
+
+
+def gallery(client, seed, who, **params):
+    return client.get('/api/timelogs/screenshots', headers=seed.headers[who], query_string=params)
+
+
+def listed(response):
+    assert response.status_code == 200
+    return sorted((screenshot['employee_id'], screenshot['project_id']) for screenshot in response.json['screenshots'])
+
+
+def test_employee_sees_only_their_own_screenshots(client, seed):
+    expected = [(seed.employee_id, seed.project_id), (seed.employee_id, seed.other_project_id)]
+
+    assert listed(gallery(client, seed, 'employee')) == expected
+    assert listed(gallery(client, seed, 'employee', employee_id=seed.employee_id)) == expected
+    assert gallery(client, seed, 'employee', employee_id=seed.other_employee_id).status_code == 403
+
+
+def test_employer_sees_only_their_own_projects(client, seed):
+    expected = [(seed.employee_id, seed.project_id), (seed.other_employee_id, seed.project_id)]
+
+    assert listed(gallery(client, seed, 'employer')) == expected
+    assert listed(gallery(client, seed, 'employer', project_id=seed.project_id)) == expected
+    assert gallery(client, seed, 'employer', project_id=seed.other_project_id).status_code == 403
+    assert gallery(client, seed, 'employer', project_id=seed.other_project_id,
+                   employee_id=seed.employee_id).status_code == 403
+
+
+def test_urls_are_signed_for_listed_screenshots(client, seed):
+    screenshots = gallery(client, seed, 'employer', employee_id=seed.employee_id).json['screenshots']
+
+    assert len(screenshots) == 1
+    assert '/api/timelogs/blob-reads/screenshots/shot-0?token=' in screenshots[0]['image_url']
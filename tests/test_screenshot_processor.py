@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+import pytest
+from PIL import Image, ImageDraw
+from database import db
+from api.models import TimeLog
+from api.service.screenshot_processor import ScreenshotProcessor
+from api.service.screenshot_transcoding import difference_hash, process_screenshot_file
+from api.service.similarity_index import to_unsigned
+from constants import SCREENSHOT_STORAGE_CONTAINER as CONTAINER
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(SCREENSHOT_PROCESSING_ENABLED=True, SCREENSHOT_PROCESSING_WORKERS=1,
+                       SCREENSHOT_PROCESSING_TIMEOUT_SECONDS=30, SCREENSHOT_IMAGE_FORMAT='webp',
+                       SCREENSHOT_IMAGE_QUALITY=80, SCREENSHOT_THUMBNAIL_WIDTHS='160,320')
+
+
+@pytest.fixture
+def processor(app):
+    processor = ScreenshotProcessor(app)
+    yield processor
+    processor.shutdown()
+
+
+def screen(path, clock='09:00', size=(800, 600)):
+    """A fake screenshot: a window and a clock, saved as PNG"""
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((50, 50, 500, 400), fill='navy')
+    draw.rectangle((600, 100, 750, 500), fill='gray')
+    draw.text((720, 580), clock, fill='black')
+    image.save(path, 'PNG')
+    return path
+
+
+def test_near_identical_screenshots_are_a_few_bits_apart(tmp_path):
+    with Image.open(screen(tmp_path / 'a.png')) as first, Image.open(screen(tmp_path / 'b.png', clock='09:01')) as second:
+        near = (difference_hash(first) ^ difference_hash(second)).bit_count()
+        other = Image.new('RGB', (800, 600), 'white')
+        ImageDraw.Draw(other).rectangle((300, 0, 800, 300), fill='darkred')
+        far = (difference_hash(first) ^ difference_hash(other)).bit_count()
+
+    assert near <= 2
+    assert far > 10
+
+
+@pytest.mark.parametrize('image_format, pil_format', [('webp', 'WEBP'), ('jpeg', 'JPEG')])
+def test_transcodes_and_renders_thumbnails(tmp_path, image_format, pil_format):
+    source = str(screen(tmp_path / 'source'))
+
+    result = process_screenshot_file(source, image_format, 80, [320, 160])
+
+    assert result['extension'] == image_format
+    with Image.open(result['image_path']) as image:
+        assert (image.format, image.size) == (pil_format, (800, 600))
+    for width, path in result['thumbnails'].items():
+        with Image.open(path) as thumbnail:
+            assert (thumbnail.format, thumbnail.size) == (pil_format, (width, width * 3 // 4))
+    assert 0 <= result['perceptual_hash'] < 1 << 64
+
+
+def test_pool_processes_never_import_the_app():
+    # What a forkserver or spawned pool process imports to run a job
+    code = ('import sys, api.service.screenshot_transcoding; '
+            'print(sorted(name for name in ("app", "flask", "database") if name in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(__file__))).stdout
+
+    assert output.strip() == '[]'
+
+
+def test_processes_in_a_pool_that_is_not_forked(processor, tmp_path):
+    processed = processor.process(str(screen(tmp_path / 'source')))
+
+    assert processor._pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+    assert processed.content_type == 'image/webp'
+    assert sorted(processed.thumbnails) == [160, 320]
+    assert all(os.path.exists(path) for path in processed.paths())
+    with Image.open(tmp_path / 'source') as image:
+        assert to_unsigned(processed.perceptual_hash) == difference_hash(image)
+
+    (tmp_path / 'broken').write_bytes(b'not an image')
+    assert processor.process(str(tmp_path / 'broken')) is None
+
+
+def test_processes_a_stored_screenshot_after_its_time_log(app, processor, seed, local_storage, tmp_path):
+    with open(screen(tmp_path / 'source'), 'rb') as data:
+        local_storage.upload_file(CONTAINER, 'upload', data, 'image/png')
+    with app.app_context():
+        time_log = TimeLog(employee_id=seed.employee_id, project_id=seed.project_id, task_id=seed.task_id,
+                           start_time=datetime(2024, 1, 1, 9), end_time=datetime(2024, 1, 1, 9, 1), duration=60,
+                           screenshot_status='uploaded', file_path='upload')
+        db.session.add(time_log)
+        db.session.commit()
+        time_log_id = time_log.id
+
+    processor.process_stored(time_log_id, CONTAINER, 'upload')
+    processor.shutdown()
+
+    with app.app_context():
+        time_log = TimeLog.find(time_log_id)
+        assert time_log.file_path == 'upload.webp'
+        assert sorted(time_log.thumbnail_urls) == ['160', '320']
+        assert time_log.perceptual_hash is not None
+    assert os.path.exists(local_storage.blob_path(CONTAINER, 'upload.w160.webp'))
+    # The original is replaced by the transcoded copy
+    assert not os.path.exists(local_storage.blob_path(CONTAINER, 'upload'))
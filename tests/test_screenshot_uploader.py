@@ -0,0 +1,200 @@
+import io
+import json
+import os
+import time
+import pytest
+from datetime import datetime
+from werkzeug.datastructures import FileStorage
+from database import db
+from storage import LocalStorage
+from api.models import ScreenshotBlob, TimeLog
+from api.service.screenshot_uploader import ScreenshotUploader, SpoolFullError
+from constants import SCREENSHOT_STORAGE_CONTAINER as CONTAINER
+
+
+class FlakyStorage(LocalStorage):
+    """Local storage whose next `failures` uploads fail"""
+    failures = 0
+
+    def upload_file(self, container_name, blob_name, file_data, content_type=None):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('Storage unavailable')
+        return super().upload_file(container_name, blob_name, file_data, content_type)
+
+
+@pytest.fixture
+def app(app_factory, tmp_path):
+    return app_factory(SCREENSHOT_SPOOL_DIR=str(tmp_path / 'spool'), SCREENSHOT_UPLOAD_WORKERS=2,
+                       SCREENSHOT_SPOOL_MAX_PENDING=10, SCREENSHOT_UPLOAD_MAX_ATTEMPTS=3,
+                       SCREENSHOT_UPLOAD_RETRY_BACKOFF_SECONDS=0.01, SCREENSHOT_SPOOL_ORPHAN_SECONDS=3600)
+
+
+@pytest.fixture
+def time_log(app, seed):
+    """time_log(): id of a new time log of the seeded employee waiting for its screenshot"""
+    def time_log():
+        with app.app_context():
+            row = TimeLog(employee_id=seed.employee_id, project_id=seed.project_id, task_id=seed.task_id,
+                          start_time=datetime(2024, 1, 1, 9), end_time=datetime(2024, 1, 1, 9, 1), duration=60,
+                          screenshot_status='pending')
+            db.session.add(row)
+            db.session.commit()
+            return row.id
+    return time_log
+
+
+@pytest.fixture
+def flaky_storage(app, local_storage):
+    storage = FlakyStorage(app)
+    app.extensions['blob_storage'] = storage
+    return storage
+
+
+def spool(uploader, data=b'png'):
+    return uploader.spool(FileStorage(io.BytesIO(data), filename='screen.png'), CONTAINER, 'image/png')
+
+
+def drain(uploader, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while uploader.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert uploader.pending == 0
+
+
+def stored_names(storage):
+    root = os.path.join(storage.root, CONTAINER)
+    return sorted(os.path.relpath(os.path.join(directory, name), root).split(os.sep, 2)[2]
+                  for directory, _, names in os.walk(root) for name in names
+                  if not name.endswith(storage.CONTENT_TYPE_SUFFIX))
+
+
+def screenshot(app, time_log_id):
+    with app.app_context():
+        row = TimeLog.find(time_log_id)
+        blob = db.session.get(ScreenshotBlob, row.screenshot_blob_id) if row.screenshot_blob_id else None
+        return row.screenshot_status, row.file_path, blob.ref_count if blob else None
+
+
+def attempts(app, time_log_id):
+    with app.app_context():
+        return TimeLog.find(time_log_id).screenshot_attempts
+
+
+def test_retries_until_the_upload_succeeds(app, flaky_storage, time_log):
+    uploader = ScreenshotUploader(app)
+    time_log_id = time_log()
+    flaky_storage.failures = 2
+
+    uploader.submit(spool(uploader), time_log_id)
+    drain(uploader)
+
+    assert screenshot(app, time_log_id)[0] == 'uploaded'
+    assert attempts(app, time_log_id) == 3
+    assert os.listdir(uploader.spool_dir) == []
+
+
+def test_gives_up_after_the_last_attempt(app, flaky_storage, time_log):
+    uploader = ScreenshotUploader(app)
+    time_log_id = time_log()
+    flaky_storage.failures = 5
+
+    uploader.submit(spool(uploader), time_log_id)
+    drain(uploader)
+
+    assert screenshot(app, time_log_id) == ('failed', None, None)
+    assert attempts(app, time_log_id) == 3
+    assert os.listdir(uploader.spool_dir) == []
+    with app.app_context():
+        assert ScreenshotBlob.query.count() == 0
+
+
+def test_a_full_spool_turns_uploads_away(app, local_storage):
+    uploader = ScreenshotUploader(app)
+    jobs = [spool(uploader) for _ in range(10)]
+
+    with pytest.raises(SpoolFullError):
+        spool(uploader)
+    uploader.discard(jobs.pop())
+    jobs.append(spool(uploader))
+    assert uploader.pending == 10
+
+
+def test_same_bytes_are_stored_once(app, local_storage, time_log):
+    uploader = ScreenshotUploader(app)
+    first, second = time_log(), time_log()
+    for time_log_id in (first, second):
+        uploader.submit(spool(uploader), time_log_id)
+        drain(uploader)
+
+    assert screenshot(app, first) == screenshot(app, second)
+    status, file_path, ref_count = screenshot(app, first)
+    assert (status, ref_count) == ('uploaded', 2)
+    assert uploader.deduplicated == 1
+    assert os.listdir(uploader.spool_dir) == []
+
+
+def test_a_job_processed_twice_adds_one_reference(app, local_storage, time_log):
+    uploader = ScreenshotUploader(app)
+    time_log_id = time_log()
+    job = spool(uploader)
+    uploader.submit(job, time_log_id)
+    drain(uploader)
+    assert screenshot(app, time_log_id)[0] == 'uploaded'
+
+    # A crash between the commit and the removal of the spool files leaves them behind
+    with open(os.path.join(uploader.spool_dir, job.blob_name), 'wb') as data:
+        data.write(b'png')
+    with open(os.path.join(uploader.spool_dir, f'{job.blob_name}.json'), 'w') as meta:
+        json.dump(job.to_dict(), meta)
+    restarted = ScreenshotUploader(app)
+    drain(restarted)
+
+    assert screenshot(app, time_log_id)[2] == 1
+    with app.app_context():
+        assert ScreenshotBlob.query.count() == 1
+    assert os.listdir(uploader.spool_dir) == []
+    # Nothing but the registered copy is left in storage
+    with app.app_context():
+        blob_names = ScreenshotBlob.query.one().blob_names
+    assert stored_names(local_storage) == blob_names
+
+
+def test_recovery_claims_only_jobs_without_a_live_owner(app, local_storage, time_log):
+    spool_dir = app.config['SCREENSHOT_SPOOL_DIR']
+    os.makedirs(spool_dir)
+    # Jobs left by an older version, by a process that is gone, and by a running worker (pid 1)
+    jobs = {}
+    for owner in ('', '.999999999', '.1'):
+        time_log_id = time_log()
+        blob_name = f'job{len(jobs)}'
+        with open(os.path.join(spool_dir, blob_name), 'wb') as data:
+            data.write(f'png{len(jobs)}'.encode())
+        with open(os.path.join(spool_dir, f'{blob_name}{owner}.json'), 'w') as meta:
+            json.dump({'blob_name': blob_name, 'container_name': CONTAINER, 'content_type': 'image/png',
+                       'captured_at': '2024-01-01T09:00:00', 'time_log_id': time_log_id, 'content_hash': None}, meta)
+        jobs[owner] = time_log_id
+
+    uploader = ScreenshotUploader(app)
+    drain(uploader)
+
+    assert screenshot(app, jobs[''])[0] == 'uploaded'
+    assert screenshot(app, jobs['.999999999'])[0] == 'uploaded'
+    assert screenshot(app, jobs['.1'])[0] == 'pending'
+    assert sorted(os.listdir(spool_dir)) == ['job2', 'job2.1.json']
+
+
+def test_recovery_deletes_only_old_files_without_metadata(app, local_storage):
+    spool_dir = app.config['SCREENSHOT_SPOOL_DIR']
+    os.makedirs(spool_dir)
+    # Requests that died before their time log was committed: one long ago, one that may still be running
+    for name, age in (('old', 7200), ('old.part', 7200), ('young', 60)):
+        path = os.path.join(spool_dir, name)
+        with open(path, 'wb') as data:
+            data.write(b'png')
+        os.utime(path, (time.time() - age, time.time() - age))
+
+    uploader = ScreenshotUploader(app)
+
+    assert os.listdir(spool_dir) == ['young']
+    assert uploader.pending == 0
@@ -0,0 +1,137 @@
+import random
+from datetime import date, datetime, timedelta
+import pytest
+from database import db
+from api.models import TimeLog
+from api.service.change_versions import ChangeVersions
+from api.service.similarity_index import BKTree, SimilarityIndex, hash_hex, to_signed, to_unsigned
+
+DAY = date(2024, 1, 1)
+
+
+@pytest.fixture
+def hashes():
+    """Clusters of near-identical hashes, as consecutive screenshots of one screen produce"""
+    rng = random.Random(7)
+    hashes = []
+    for _ in range(40):
+        base = rng.getrandbits(64)
+        for _ in range(rng.randint(1, 8)):
+            value = base
+            for bit in rng.sample(range(64), rng.randint(0, 6)):
+                value ^= 1 << bit
+            hashes.append(value)
+    return hashes + hashes[:5]
+
+
+@pytest.fixture
+def app(app_factory):
+    app = app_factory(SIMILARITY_INDEX_TTL_SECONDS=3600, SIMILARITY_INDEX_IDLE_SECONDS=3600,
+                      SIMILARITY_INDEX_MAX_ENTRIES=16)
+    ChangeVersions(app)
+    SimilarityIndex(app)
+    return app
+
+
+@pytest.fixture
+def index(app, app_context):
+    return app.extensions['similarity_index']
+
+
+@pytest.fixture
+def time_log(seed, app_context):
+    """time_log(minute, value=None, status='uploaded'): a new time log of the seeded employee on DAY"""
+    def time_log(minute, value=None, status='uploaded'):
+        start_time = datetime.combine(DAY, datetime.min.time()) + timedelta(hours=9, minutes=minute)
+        row = TimeLog(employee_id=seed.employee_id, project_id=seed.project_id, task_id=seed.task_id,
+                      start_time=start_time, end_time=start_time + timedelta(minutes=1), duration=60,
+                      screenshot_status=status, perceptual_hash=None if value is None else to_signed(value))
+        db.session.add(row)
+        db.session.commit()
+        return row
+    return time_log
+
+
+def similar_ids(index, row, max_distance=4):
+    return [item[0] for _, item in index.similar(row, max_distance)]
+
+
+def test_search_matches_a_linear_scan(hashes):
+    tree = BKTree()
+    for item, value in enumerate(hashes):
+        tree.add(value, item)
+    rng = random.Random(11)
+    for query in hashes[::9] + [rng.getrandbits(64) for _ in range(10)]:
+        for radius in (0, 3, 8, 20):
+            expected = sorted(((value ^ query).bit_count(), item) for item, value in enumerate(hashes)
+                              if (value ^ query).bit_count() <= radius)
+            assert sorted(tree.search(query, radius)) == expected
+
+
+def test_items_yields_every_hash(hashes):
+    tree = BKTree()
+    for item, value in enumerate(hashes):
+        tree.add(value, item)
+
+    assert tree.size == len(hashes)
+    assert sorted(tree.items(), key=lambda entry: entry[1]) == list(zip(hashes, range(len(hashes))))
+    assert list(BKTree().search(0, 64)) == []
+
+
+def test_signed_storage_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        stored = to_signed(value)
+        assert -(1 << 63) <= stored < 1 << 63
+        assert to_unsigned(stored) == value
+        assert int(hash_hex(stored), 16) == value
+    assert hash_hex(None) is None
+
+
+def test_new_time_logs_are_added_to_the_cached_tree(index, seed, time_log):
+    first = time_log(0, 0b1111)
+    tree = index.tree(seed.employee_id, DAY)
+    assert similar_ids(index, first) == []
+
+    # Every new time log bumps the employee's version; the tree is kept and only the new row is read
+    second = time_log(1, 0b0111)
+    time_log(2, 1 << 40)
+    assert index.tree(seed.employee_id, DAY) is tree
+    assert tree.size == 3
+    assert similar_ids(index, first) == [second.id]
+    assert index.rebuilds == 0
+
+
+def test_hashes_filled_in_later_are_picked_up(index, seed, time_log):
+    first = time_log(0, 0b1111)
+    waiting = time_log(1, status='pending')
+    assert index.tree(seed.employee_id, DAY).size == 1
+
+    # Background processing writes the hash without bumping the version
+    TimeLog.query.filter_by(id=waiting.id).update({'perceptual_hash': to_signed(0b1110)})
+    db.session.commit()
+    assert index.tree(seed.employee_id, DAY).size == 1
+
+    index.ttl = 0
+    assert similar_ids(index, first) == [waiting.id]
+    assert index.rebuilds == 0
+
+
+def test_deleted_time_logs_leave_the_tree(index, seed, time_log):
+    first = time_log(0, 0b1111)
+    second = time_log(1, 0b0111)
+    assert similar_ids(index, first) == [second.id]
+
+    db.session.delete(second)
+    db.session.commit()
+
+    assert similar_ids(index, first) == []
+    assert index.rebuilds == 1
+
+
+def test_groups_follow_time_order(index, seed, time_log):
+    rows = [time_log(0, 0b1111), time_log(1, 1 << 40), time_log(2, 0b0111), time_log(3, (1 << 40) | 1)]
+
+    groups = index.groups(seed.employee_id, DAY, 2)
+
+    assert [[(distance, item[0]) for distance, item in group] for group in groups] == \
+        [[(0, rows[0].id), (1, rows[2].id)], [(0, rows[1].id), (1, rows[3].id)]]
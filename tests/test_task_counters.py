@@ -0,0 +1,53 @@
+import pytest
+from database import db
+from api.models import Task
+from api.models.task_time_delta import TaskTimeDelta
+
+
+@pytest.fixture
+def app(request, app_factory):
+    """App with the TASK_COUNTER_MODE given by indirect parametrization"""
+    return app_factory(TASK_COUNTER_MODE=request.param)
+
+
+@pytest.fixture
+def task_ids(app, seed):
+    with app.app_context():
+        for task_id in (seed.task_id, seed.other_task_id):
+            db.session.get(Task, task_id).minutes_spent = 100
+        db.session.commit()
+    return [seed.task_id, seed.other_task_id]
+
+
+def totals(app, task_ids):
+    with app.app_context():
+        return [(task.minutes_spent, task.total_minutes_spent) for task in (db.session.get(Task, task_id) for task_id in task_ids)]
+
+
+@pytest.mark.parametrize('app', ['atomic'], indirect=True)
+def test_atomic_mode_adds_and_subtracts(app, task_ids):
+    first, second = task_ids
+    with app.app_context():
+        Task.apply_minutes_deltas({first: 90, second: 30.4})
+        Task.apply_minutes_deltas({first: -60, second: 0})
+        db.session.commit()
+
+    assert totals(app, task_ids) == [(130, 130), (130, 130)]
+
+
+@pytest.mark.parametrize('app', ['delta'], indirect=True)
+def test_delta_mode_keeps_the_sign_through_the_fold(app, task_ids):
+    first, second = task_ids
+    with app.app_context():
+        Task.apply_minutes_deltas({first: 90, second: 30})
+        Task.apply_minutes_deltas({first: -60, second: -130})
+        db.session.commit()
+
+    # Not folded yet: the counter is unchanged but the exact total includes the deltas
+    assert totals(app, task_ids) == [(100, 130), (100, 0)]
+
+    with app.app_context():
+        assert Task.fold_minutes_deltas(limit=3) == 3
+        assert Task.fold_minutes_deltas() == 1
+        assert TaskTimeDelta.query.count() == 0
+    assert totals(app, task_ids) == [(130, 130), (0, 0)]
@@ -0,0 +1,72 @@
+import pytest
+from database import db
+from api.models import Task, TimeLog
+from api.route_restx.time_tracking_routes import api as timelog_ns
+from constants import TIME_LOG_BATCH_MAX_ITEMS
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(timelog_ns, '/api/timelogs', SCREENSHOT_MAX_BYTES=1 << 20)
+
+
+@pytest.fixture
+def item(seed):
+    def item(**overrides):
+        return {'task_id': seed.task_id, 'project_id': seed.project_id, 'start_time': 1700000000,
+                'end_time': 1700000060, 'duration': 60, **overrides}
+    return item
+
+
+def post_batch(client, seed, items):
+    return client.post('/api/timelogs/batch', headers=seed.headers['employee'], json={'time_logs': items})
+
+
+def test_all_created(app, client, seed, item):
+    response = post_batch(client, seed, [item(), item(start_time=1700000060, end_time=1700000120)])
+
+    assert response.status_code == 201
+    assert response.json['created'] == 2
+    assert [result['status'] for result in response.json['results']] == ['created', 'created']
+    with app.app_context():
+        assert TimeLog.query.count() == 2
+        assert db.session.get(Task, seed.task_id).minutes_spent == 120
+
+
+def test_rejected_items_get_their_own_results(app, client, seed, item):
+    response = post_batch(client, seed, [
+        item(),
+        item(task_id=999),
+        item(project_id=seed.other_project_id),
+        'not an object',
+        item(end_time=1699999999),
+        item(duration=-1),
+        item(start_time=1700000060, end_time=1700000120)
+    ])
+
+    assert response.status_code == 207
+    assert (response.json['created'], response.json['duplicates'], response.json['failed']) == (2, 0, 5)
+    results = response.json['results']
+    assert [result['index'] for result in results] == list(range(7))
+    assert [result['status'] for result in results] == ['created', 'failed', 'failed', 'failed', 'failed', 'failed', 'created']
+    assert results[1]['message'] == 'Task 999 not found'
+    assert 'does not belong to project' in results[2]['message']
+    assert results[3]['message'] == 'Item must be an object'
+    with app.app_context():
+        assert sorted(time_log.id for time_log in TimeLog.query) == [results[0]['id'], results[6]['id']]
+        assert db.session.get(Task, seed.task_id).minutes_spent == 120
+
+
+def test_screenshot_permission_defaults_to_enabled(app, client, seed, item):
+    post_batch(client, seed, [item(), item(is_screenshot_permission_enabled=False)])
+    client.post('/api/timelogs/', headers=seed.headers['employee'], data=item())
+    client.post('/api/timelogs/', headers=seed.headers['employee'], data=item(is_screenshot_permission_enabled='false'))
+
+    with app.app_context():
+        flags = [time_log.is_screenshot_permission_enabled for time_log in TimeLog.query.order_by(TimeLog.id)]
+    assert flags == [True, False, True, False]
+
+
+def test_rejects_an_empty_or_oversized_batch(client, seed, item):
+    assert post_batch(client, seed, []).status_code == 400
+    assert post_batch(client, seed, [item()] * (TIME_LOG_BATCH_MAX_ITEMS + 1)).status_code == 400
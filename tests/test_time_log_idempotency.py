@@ -0,0 +1,65 @@
+import pytest
+from database import db
+from api.models import Task, TimeLog
+from api.route_restx.time_tracking_routes import api as timelog_ns
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(timelog_ns, '/api/timelogs', SCREENSHOT_MAX_BYTES=1 << 20)
+
+
+@pytest.fixture
+def item(seed):
+    def item(idempotency_key, **overrides):
+        return {'task_id': seed.task_id, 'project_id': seed.project_id, 'start_time': 1700000000,
+                'end_time': 1700000060, 'duration': 60, 'idempotency_key': idempotency_key, **overrides}
+    return item
+
+
+def minutes_spent(app, seed):
+    with app.app_context():
+        return db.session.get(Task, seed.task_id).minutes_spent
+
+
+def test_retry_returns_the_stored_row(app, client, seed, item):
+    first = client.post('/api/timelogs/', headers=seed.headers['employee'], data=item('device-1:1'))
+    retry = client.post('/api/timelogs/', headers=seed.headers['employee'], data=item('device-1:1'))
+
+    assert (first.status_code, retry.status_code) == (201, 200)
+    assert retry.json == first.json
+    assert minutes_spent(app, seed) == 60
+    with app.app_context():
+        assert TimeLog.query.count() == 1
+
+
+def test_keys_are_per_employee(app, client, seed, item):
+    client.post('/api/timelogs/', headers=seed.headers['employee'], data=item('device-1:1'))
+    response = client.post('/api/timelogs/', headers=seed.headers['other_employee'], data=item('device-1:1'))
+
+    assert response.status_code == 201
+    assert minutes_spent(app, seed) == 120
+
+
+def test_batch_reports_duplicates_with_the_stored_ids(app, client, seed, item):
+    headers = seed.headers['employee']
+    single = client.post('/api/timelogs/', headers=headers, data=item('device-1:1'))
+    response = client.post('/api/timelogs/batch', headers=headers, json={'time_logs': [
+        item('device-1:1'),
+        item('device-1:2', start_time=1700000060, end_time=1700000120),
+        item('device-1:2', start_time=1700000060, end_time=1700000120)
+    ]})
+
+    assert response.status_code == 201
+    assert (response.json['created'], response.json['duplicates']) == (1, 2)
+    results = response.json['results']
+    assert [result['status'] for result in results] == ['duplicate', 'created', 'duplicate']
+    assert results[0]['id'] == single.json['id']
+    assert results[2]['id'] == results[1]['id']
+    assert minutes_spent(app, seed) == 120
+
+    # Retrying the whole batch stores nothing new
+    retry = client.post('/api/timelogs/batch', headers=headers, json={'time_logs': [
+        item('device-1:1'), item('device-1:2', start_time=1700000060, end_time=1700000120)]})
+    assert [result['id'] for result in retry.json['results']] == [results[0]['id'], results[1]['id']]
+    assert minutes_spent(app, seed) == 120
@@ -0,0 +1,63 @@
+import pytest
+from datetime import datetime, timedelta
+from database import db
+from api.models import Task, TimeLog
+from api.route_restx.time_tracking_routes import api as timelog_ns
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(timelog_ns, '/api/timelogs')
+
+
+@pytest.fixture
+def expected(app, seed):
+    """(id, task id) of eleven time logs over two tasks, newest first, and the id of the second task"""
+    with app.app_context():
+        task = Task(name='second', project_id=seed.project_id)
+        db.session.add(task)
+        db.session.flush()
+        task_ids = [seed.task_id, task.id]
+        # Start times repeat, so the id has to break ties; ids do not follow start_time
+        start = datetime(2024, 1, 1, 9)
+        for i in range(11):
+            start_time = start + timedelta(minutes=(i * 7) % 4)
+            db.session.add(TimeLog(employee_id=seed.employee_id, project_id=seed.project_id, task_id=task_ids[i % 2],
+                                   start_time=start_time, end_time=start_time + timedelta(minutes=1), duration=60))
+        db.session.commit()
+        time_logs = sorted(TimeLog.query, key=lambda time_log: (time_log.start_time, time_log.id), reverse=True)
+        return [(time_log.id, time_log.task_id) for time_log in time_logs], task.id
+
+
+def pages(client, seed, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get('/api/timelogs/', headers=seed.headers['employer'],
+                              query_string={**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([time_log['id'] for time_log in response.json['time_logs']])
+        cursor = response.json['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_pages_follow_start_time_then_id_descending(client, seed, expected):
+    time_logs, _ = expected
+    result = pages(client, seed, project_id=seed.project_id, page_size=3)
+
+    assert [len(page) for page in result] == [3, 3, 3, 2]
+    assert [time_log_id for page in result for time_log_id in page] == [time_log_id for time_log_id, _ in time_logs]
+
+
+def test_filters_apply_to_every_page(client, seed, expected):
+    time_logs, task_id = expected
+    result = pages(client, seed, project_id=seed.project_id, task_id=task_id, page_size=2)
+
+    assert [time_log_id for page in result for time_log_id in page] == \
+        [time_log_id for time_log_id, time_log_task_id in time_logs if time_log_task_id == task_id]
+
+
+def test_rejects_a_malformed_cursor(client, seed):
+    response = client.get('/api/timelogs/', headers=seed.headers['employer'], query_string={'cursor': 'not-a-cursor'})
+
+    assert response.status_code == 400
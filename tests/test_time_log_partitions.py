@@ -0,0 +1,73 @@
+import os
+from datetime import date, datetime, timedelta
+import pytest
+from database import db
+from api.models import ScreenshotBlob, TimeLog
+from api.service.screenshot_blobs import content_blob_name, register
+from api.service.time_log_partitions import (
+    _add_months, apply_time_log_retention, ensure_time_log_partitions, retention_cutoff
+)
+from constants import SCREENSHOT_STORAGE_CONTAINER as CONTAINER
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory(TIME_LOG_RETENTION_MONTHS=6, TIME_LOG_RETENTION_ACTION='drop', TIME_LOG_PARTITION_MONTHS_AHEAD=3)
+
+
+@pytest.fixture
+def log(seed, app_context):
+    """log(start_time, **screenshot): a time log of the seeded employee"""
+    def log(start_time, **screenshot):
+        row = TimeLog(employee_id=seed.employee_id, project_id=seed.project_id, task_id=seed.task_id,
+                      start_time=start_time, end_time=start_time + timedelta(minutes=1), duration=60, **screenshot)
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+    return log
+
+
+def stored(storage, blob_name):
+    return os.path.exists(storage.blob_path(CONTAINER, blob_name))
+
+
+def test_months_and_cutoff(app_context):
+    assert _add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert _add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert retention_cutoff() == _add_months(date.today().replace(day=1), -6)
+    assert retention_cutoff(0) is None
+
+
+def test_sqlite_time_logs_are_not_partitioned(app_context):
+    assert ensure_time_log_partitions() == []
+
+
+def test_retention_deletes_old_time_logs_and_their_screenshots(seed, log, local_storage):
+    cutoff = datetime.combine(retention_cutoff(), datetime.min.time())
+    # A screenshot stored under its own name, and one shared by an old and a recent log
+    local_storage.upload_file(CONTAINER, 'own', b'png')
+    base = content_blob_name(seed.employer_id, 'ab' * 32)
+    local_storage.upload_file(CONTAINER, f'{base}.png', b'png')
+    shared = register(seed.employer_id, 'ab' * 32, CONTAINER,
+                      {'file_path': f'{base}.png', 'image_url': '/x', 'blob_names': [f'{base}.png']}, size=3)
+    shared.ref_count = 2
+    db.session.commit()
+    old = log(cutoff - timedelta(days=1), file_path='own')
+    old_shared = log(cutoff - timedelta(days=40), screenshot_blob_id=shared.id, file_path=f'{base}.png')
+    kept = log(cutoff, screenshot_blob_id=shared.id, file_path=f'{base}.png')
+
+    assert apply_time_log_retention() == []
+
+    assert [row.id for row in TimeLog.query] == [kept]
+    assert TimeLog.find(old) is None and TimeLog.find(old_shared) is None
+    assert not stored(local_storage, 'own')
+    # Still referenced by the recent log
+    assert db.session.get(ScreenshotBlob, shared.id).ref_count == 1
+    assert stored(local_storage, f'{base}.png')
+
+
+def test_retention_keeps_everything_without_a_limit(log):
+    log(datetime(2000, 1, 1))
+
+    assert apply_time_log_retention(retain_months=0) == []
+    assert TimeLog.query.count() == 1
@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta
+import pytest
+from database import db
+from api.models import TimeLog
+from api.models.time_rollup import DailyTimeRollup, HourlyTimeRollup
+from api.service.time_rollups import forget_time_logs, rebuild_time_rollups, record_time_logs
+
+
+@pytest.fixture
+def log(seed, app_context):
+    """log(start_time, duration, other=False): add a time log to seed's (or the other employer's) task and its rollups"""
+    def log(start_time, duration, other=False):
+        entry = {'project_id': seed.other_project_id if other else seed.project_id,
+                 'task_id': seed.other_task_id if other else seed.task_id,
+                 'employee_id': seed.employee_id, 'start_time': start_time, 'duration': duration}
+        db.session.add(TimeLog(**entry, end_time=start_time + timedelta(seconds=duration)))
+        record_time_logs([entry])
+        db.session.commit()
+        return entry
+    return log
+
+
+def hourly():
+    return {(row.project_id, row.bucket_start): (row.seconds, row.log_count) for row in HourlyTimeRollup.query}
+
+
+def daily():
+    return {(row.project_id, row.day): (row.seconds, row.log_count, row.employer_id) for row in DailyTimeRollup.query}
+
+
+def test_records_time_logs_per_hour_and_day(seed, log):
+    log(datetime(2024, 1, 1, 9, 10), 600)
+    log(datetime(2024, 1, 1, 9, 50), 300)
+    log(datetime(2024, 1, 1, 11, 0), 60)
+
+    assert hourly() == {(seed.project_id, datetime(2024, 1, 1, 9)): (900, 2),
+                        (seed.project_id, datetime(2024, 1, 1, 11)): (60, 1)}
+    assert daily() == {(seed.project_id, date(2024, 1, 1)): (960, 3, seed.employer_id)}
+
+
+def test_forget_takes_deleted_time_logs_off(seed, log):
+    entry = log(datetime(2024, 1, 1, 9, 10), 600)
+    log(datetime(2024, 1, 1, 9, 50), 300)
+
+    forget_time_logs([entry])
+    db.session.commit()
+
+    assert hourly() == {(seed.project_id, datetime(2024, 1, 1, 9)): (300, 1)}
+    assert daily() == {(seed.project_id, date(2024, 1, 1)): (300, 1, seed.employer_id)}
+
+
+def test_rebuild_recomputes_from_time_logs(seed, log):
+    log(datetime(2024, 1, 1, 9, 10), 600)
+    log(datetime(2024, 1, 2, 9, 0), 60, other=True)
+    expected = hourly(), daily()
+    HourlyTimeRollup.query.update({'seconds': 1})
+    DailyTimeRollup.query.delete()
+    db.session.commit()
+
+    assert rebuild_time_rollups() == 2
+    assert (hourly(), daily()) == expected
+
+
+def test_rebuild_of_one_employer_leaves_the_others(seed, log):
+    log(datetime(2024, 1, 1, 9, 10), 600)
+    log(datetime(2024, 1, 2, 9, 0), 60, other=True)
+    DailyTimeRollup.query.update({'seconds': 1})
+    db.session.commit()
+
+    assert rebuild_time_rollups(employer_id=seed.employer_id) == 1
+    assert daily()[(seed.project_id, date(2024, 1, 1))][0] == 600
+    assert daily()[(seed.other_project_id, date(2024, 1, 2))][0] == 1
+
+
+def test_rebuild_keeps_the_rollups_of_removed_time_logs(app, seed, log):
+    old = datetime.combine(date.today().replace(day=1) - timedelta(days=400), datetime.min.time())
+    log(old, 600)
+    recent = log(datetime.combine(date.today(), datetime.min.time()), 60)
+    app.config['TIME_LOG_RETENTION_MONTHS'] = 6
+    # Retention removed the old log; its rollups stay
+    TimeLog.query.filter(TimeLog.start_time < recent['start_time'] - timedelta(days=200)).delete()
+    db.session.commit()
+
+    rebuild_time_rollups()
+
+    assert daily()[(seed.project_id, old.date())][0] == 600
+    assert daily()[(seed.project_id, recent['start_time'].date())][0] == 60
+    with pytest.raises(ValueError, match='removed by retention'):
+        rebuild_time_rollups(since=old.date())